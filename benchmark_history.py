@@ -0,0 +1,148 @@
+import os
+import sys
+import csv
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from utils.synthetic_history import generate_history
+from utils.follower_registry import sync_roster
+from utils import stats_queries
+
+# How ingestion and the dashboard queries scale with history. A synthetic
+# history (utils/synthetic_history.py) is fed to log_manager a slice at a
+# time, like daily runs would, and after each slice every dashboard query is
+# timed on the database built so far. Runs fully offline, in a scratch
+# directory laid out like the repository.
+ALL_TIME = "Todos os Tempos"
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def ingest(workdir):
+    # log_manager as production runs it, on the scratch directory
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "utils.log_manager"], cwd=workdir, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def get_query_cases():
+    # Every dashboard query, with the arguments the page uses
+    dates = stats_queries.get_available_dates()
+    latest = dates[1]
+    top = stats_queries.get_top_players(ALL_TIME, "kills", limit=1)
+    player = str(top.iloc[0, 0])
+    prefix = player[:2]
+    substring = player[1:6]
+    return [
+        ("get_available_dates", ()),
+        ("get_daily_summary", (latest,)),
+        ("search_players", (ALL_TIME, "")),
+        ("search_players", (latest, "")),
+        ("search_players", (ALL_TIME, "", 20)),
+        ("search_players", (ALL_TIME, prefix)),
+        ("search_players", (ALL_TIME, substring)),
+        ("search_players", (latest, substring)),
+        ("get_player_count", (ALL_TIME,)),
+        ("get_player_count", (latest,)),
+        ("player_played", (latest, player)),
+        ("get_top_players", (ALL_TIME, "kills")),
+        ("get_top_players", (latest, "kills")),
+        ("get_player_stats", (ALL_TIME, player)),
+        ("get_player_stats", (latest, player)),
+        ("get_rivals", (ALL_TIME, player)),
+        ("get_rivals", (latest, player)),
+        ("get_top_rivalries", ()),
+        ("get_pipeline_runs", ()),
+        ("get_player_rank", (latest, player)),
+        ("get_player_time", (latest, player)),
+        ("get_all_winners", ()),
+        ("get_wins_leaderboard", ()),
+        ("get_wins", (player,)),
+        ("get_top_ratings", (ALL_TIME,)),
+        ("get_top_ratings", (latest,)),
+        ("get_rating_history", (player,)),
+    ]
+
+def time_queries(repeats):
+    results = []
+    for name, args in get_query_cases():
+        func = getattr(stats_queries, name)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - start)
+        label = ", ".join(repr(a) if isinstance(a, str) and len(a) < 20 else str(a) for a in args)
+        results.append((f"{name}({label})", statistics.median(timings) * 1000, max(timings) * 1000))
+    return results
+
+
+def run_benchmark(sizes, players, repeats=5, output=None, workdir=None, seed=0):
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="lutafoda_bench_")
+    staging = os.path.join(workdir, "staging")
+    sims_dir = os.path.join(workdir, "simulations")
+    export_dir = os.path.join(workdir, "followers_info")
+    os.makedirs(sims_dir, exist_ok=True)
+    os.makedirs(export_dir, exist_ok=True)
+    stats_queries.DB_PATH = os.path.join(workdir, "data", "daily_stats.db")
+
+    try:
+        print(f"Generating {max(sizes)} days with up to {players} players in {staging}")
+        logs = generate_history(staging, max(sizes), players, seed=seed)
+        exports = sorted(os.listdir(os.path.join(staging, "followers_info")))
+
+        rows = []
+        done = 0
+        for size in sorted(sizes):
+            # Hand over the next slice of days, like that many daily runs
+            new_logs = logs[done:size]
+            last_day = os.path.basename(new_logs[-1])[:8]
+            for path in new_logs:
+                shutil.move(path, sims_dir)
+            for name in exports:
+                day = name[len("IGExportTool_All"):len("IGExportTool_All") + 10].replace("-", "")
+                if day <= last_day and not os.path.exists(os.path.join(export_dir, name)):
+                    shutil.copy(os.path.join(staging, "followers_info", name), export_dir)
+
+            start = time.perf_counter()
+            roster = sync_roster(export_dir, path=os.path.join(workdir, "data", "followers.db"))
+            registry_time = time.perf_counter() - start
+            ingest_time = ingest(workdir)
+            db_size = os.path.getsize(stats_queries.DB_PATH) / 2 ** 20
+
+            print(f"\n{size} days ({len(roster)} followers): registry {registry_time:.2f}s, "
+                  f"ingest of {len(new_logs)} days {ingest_time:.2f}s, database {db_size:.1f} MB")
+            rows.append((size, "follower_registry", registry_time * 1000, registry_time * 1000))
+            rows.append((size, f"log_manager ({len(new_logs)} days)", ingest_time * 1000, ingest_time * 1000))
+            for query, median_ms, max_ms in time_queries(repeats):
+                print(f"  {query:<60} {median_ms:9.2f} ms (max {max_ms:.2f})")
+                rows.append((size, query, median_ms, max_ms))
+            done = size
+
+        if output:
+            with open(output, 'w', newline='') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(["days", "operation", "median_ms", "max_ms"])
+                writer.writerows((d, op, round(m, 3), round(x, 3)) for d, op, m, x in rows)
+            print(f"\nResults written to {output}")
+        return rows
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and dashboard queries on a synthetic history.")
+    parser.add_argument('--sizes', default="30,180,365", help="History sizes to measure at, in days (comma separated).")
+    parser.add_argument('--players', type=int, default=10000, help="Followers at the end of the history.")
+    parser.add_argument('--repeats', type=int, default=5, help="Runs of each query (the median is reported).")
+    parser.add_argument('--output', default=None, help="Also write the results to this CSV.")
+    parser.add_argument('--workdir', default=None, help="Keep the generated history and database here.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run_benchmark([int(s) for s in args.sizes.split(",")], args.players, args.repeats, args.output, args.workdir, args.seed)
@@ -1,20 +1,34 @@
 # Read follower info and see if there are duplicates
-import os
-import csv
+import argparse
+
+from utils.follower_registry import REGISTRY_PATH, init_registry, ingest_new_exports
 
 FOLLOWER_PATH_INFO = 'followers_info'
 
-def main():
-    # Read csv in followers_info
-    csv_files = [f for f in os.listdir(FOLLOWER_PATH_INFO) if f.endswith('.csv')]
-    all_followers = set()
-    for csv_file in csv_files:
-        with open(os.path.join(FOLLOWER_PATH_INFO, csv_file), "r", encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader)  # skip header
-            for row in reader:
-                all_followers.add(tuple(row))
-    print(f"Total unique followers found: {len(all_followers)}")
+def main(args):
+    # Ingest only the exports the registry has not seen yet
+    conn = init_registry(args.registry)
+    diffs = ingest_new_exports(conn, FOLLOWER_PATH_INFO)
+    for filename, diff in diffs.items():
+        print(f"{filename}:")
+        print(f"  joined: {len(diff['joined'])}, left: {len(diff['left'])}, "
+              f"avatar changed: {len(diff['avatar_changed'])}, renamed: {len(diff['renamed'])}")
+        for old_username, new_username in diff['renamed']:
+            print(f"  {old_username} -> {new_username}")
+
+    cur = conn.cursor()
+    # Followers are keyed by Instagram user ID, so the same account with a new
+    # username or avatar URL is counted once
+    cur.execute("SELECT COUNT(*), SUM(active) FROM followers")
+    total, active = cur.fetchone()
+    cur.execute("SELECT SUM(num_rows) FROM exports")
+    total_rows = cur.fetchone()[0] or 0
+    conn.close()
+
+    print(f"Total unique followers found: {total} ({active or 0} currently following, {total_rows} rows across all exports)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Count unique followers across all exports.")
+    parser.add_argument('--registry', default=REGISTRY_PATH, help="Follower registry database.")
+    args = parser.parse_args()
+    main(args)
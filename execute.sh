@@ -1,9 +1,15 @@
 #!/bin/bash
 set -e
 
-python simulation.py
-python utils/log_manager.py
+# Every stage is timed and recorded in pipeline_runs (see utils/run_metrics.py)
+export PIPELINE_RUN_ID=$(date '+%Y%m%d_%H%M%S')
+stage() { python -m utils.run_metrics "$@"; }
 
+stage avatar_cache -- python -m utils.avatar_cache
+stage simulation -- python simulation.py
+stage log_manager -- python -m utils.log_manager
+
+# Recorded after git add: their runs stay out of the commit (--local)
 git add .
-git commit -m "Day $(date '+%Y-%m-%d'): Update stats"
-git push
+stage --local git_commit -- git commit -m "Day $(date '+%Y-%m-%d'): Update stats"
+stage --local git_push -- git push
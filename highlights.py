@@ -0,0 +1,140 @@
+import os
+import csv
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.helpers import load_config, load_saved_avatars
+from utils.log_archive import open_log
+from utils.match_recording import RECORDINGS_DIR, MatchRecording, get_recording_path
+from utils.compositor import FrameCompositor, VideoEncoder
+
+# "My kills" clips: for every player, the seconds around each of their kills
+# and around their own death, cut out of a recorded match (simulation.py
+# --record). Frames are drawn again from the recording, so nothing is
+# simulated or decoded, and each player's clip is rendered on its own worker.
+HIGHLIGHTS_DIR = "simulations/highlights"
+RING_COLOR = (255, 215, 0)
+DEATH_COLOR = (255, 60, 60)
+
+
+def read_kills(simulations_dir, timestamp):
+    # (killer, victim, tick) of every elimination, in order
+    with open_log(simulations_dir, f"{timestamp}_collision_log.csv") as f:
+        return [(row['Opponent'], row['Particle'], int(row['Frame']))
+                for row in csv.DictReader(f) if row['Killed'] == 'True']
+
+def get_windows(kills, before, after):
+    """
+    Tick ranges to show for every player: [tick - before, tick + after]
+    around each kill and around their death, overlapping ones merged.
+    Returns {player: [(first, last, kills_so_far), ...]}.
+    """
+    events = {}
+    for killer, victim, tick in kills:
+        events.setdefault(killer, []).append((tick, 'kill'))
+        events.setdefault(victim, []).append((tick, 'death'))
+
+    windows = {}
+    for player, player_events in events.items():
+        merged = []
+        kills_so_far = 0
+        for tick, kind in sorted(player_events):
+            kills_so_far += kind == 'kill'
+            if merged and tick - before <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], tick + after, kills_so_far)
+            else:
+                merged.append((tick - before, tick + after, kills_so_far))
+        windows[player] = merged
+    return windows
+
+def latest_timestamp(recordings_dir=RECORDINGS_DIR):
+    names = sorted(f for f in os.listdir(recordings_dir) if f.endswith(".npz"))
+    if not names:
+        raise FileNotFoundError(f"No recordings in {recordings_dir}, run simulation.py --record first")
+    return names[-1][:-len(".npz")]
+
+
+# ========= WORKERS ========= #
+# Set once per worker process by _init_worker, shared by all its clips
+_recording = None
+_compositor = None
+
+
+def _init_worker(recording_path, config):
+    global _recording, _compositor
+    import pygame
+    # Nothing is shown, but converting the avatars needs a display mode
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.init()
+    _recording = MatchRecording(recording_path)
+    pygame.display.set_mode((_recording.width, _recording.height))
+    # Only the sprites of the recorded players, read from disk (no registry sync)
+    images = load_saved_avatars(_recording.roster, config['images']['path'], config['images']['local'],
+                                config['particles']['max_radius'])
+    _compositor = FrameCompositor(_recording.width, _recording.height, tuple(config['colors']['background']),
+                                  pygame.font.SysFont(None, 36), images=images)
+
+def render_clip(player, windows, death_tick, path):
+    encoder = VideoEncoder(path, _recording.width, _recording.height, _recording.fps)
+    try:
+        for first, last, kills_so_far in windows:
+            caption = f"{player} - {kills_so_far} kill{'s' if kills_so_far != 1 else ''}"
+            last_pos = None
+            for k in _recording.frames_between(first, last):
+                snapshot = _recording.snapshot(k)
+                frame = _compositor.compose_snapshot(snapshot)
+                pos = _recording.position_of(k, player)
+                if pos is not None:
+                    last_pos = pos
+                    _compositor.draw_ring(pos, snapshot['radius'] + 4, RING_COLOR)
+                elif last_pos is not None and death_tick is not None and _recording.ticks[k] >= death_tick:
+                    # Mark where they fell for the rest of the window
+                    _compositor.draw_ring(last_pos, snapshot['radius'] + 4, DEATH_COLOR)
+                _compositor.draw_text(caption, (30, 70), RING_COLOR)
+                encoder.write(frame)
+    finally:
+        encoder.close()
+    return encoder.frames
+
+
+def export_highlights(timestamp=None, players=None, workers=None, before=3.0, after=2.0,
+                      simulations_dir="simulations", output_dir=HIGHLIGHTS_DIR, config_path='config.yaml'):
+    config = load_config(config_path)
+    timestamp = timestamp or latest_timestamp()
+    recording_path = get_recording_path(timestamp)
+    # Windows are in ticks, like the collision log and the recording
+    tick_rate = config['physics']['tick_rate']
+    kills = read_kills(simulations_dir, timestamp)
+    windows = get_windows(kills, int(before * tick_rate), int(after * tick_rate))
+    deaths = {victim: tick for _, victim, tick in kills}
+    if players is not None:
+        windows = {p: w for p, w in windows.items() if p in players}
+
+    out_dir = os.path.join(output_dir, timestamp)
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"{len(windows)} clips from {recording_path}")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(recording_path, config)) as pool:
+        futures = {
+            player: pool.submit(render_clip, player, player_windows, deaths.get(player),
+                                os.path.join(out_dir, f"{player}.mp4"))
+            for player, player_windows in windows.items()
+        }
+        for player, future in futures.items():
+            try:
+                print(f"{player}: {future.result()} frames")
+            except Exception as e:
+                print(f"Error rendering {player}: {e}")
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a short clip of every player's kills and death from a recorded match.")
+    parser.add_argument('--timestamp', default=None, help="Match to cut (default: the latest recording).")
+    parser.add_argument('--players', default=None, help="Only these players (comma separated).")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU).")
+    parser.add_argument('--before', type=float, default=3.0, help="Seconds shown before each kill or death.")
+    parser.add_argument('--after', type=float, default=2.0, help="Seconds shown after each kill or death.")
+    args = parser.parse_args()
+    players = set(args.players.split(",")) if args.players else None
+    out_dir = export_highlights(args.timestamp, players, args.workers, args.before, args.after)
+    print(f"Clips written to {out_dir}")
@@ -5,6 +5,13 @@ import math
 
 
 class Particle:
+    # Attributes that fully determine how the particle moves from here on
+    STATE_FIELDS = (
+        'pos', 'vel', 'prev_pos', 'hp', 'alive', 'radius',
+        '_last_pos', '_last_vel', '_seg_pos', '_seg_dir', '_seg_speed',
+        '_seg_steps', '_seg_dt', '_seg_radius', '_seg_acc', '_seg_uncapped',
+    )
+
     def __init__(self, pid, image, radius, max_hp, max_speed, acc_magnitude, width, height, position):
         self.id = pid
         self.image = image
@@ -24,37 +31,127 @@ class Particle:
         self.hp = max_hp
         self.alive = True
         self.mass = 1.0  
+        # Position at the start of the last physics step (used for swept collisions)
+        self.prev_pos = self.pos.copy()
+        # Straight segment the particle is currently moving along (see advance)
+        self._start_segment(self.pos, self.vel, 1.0)
+        self._last_pos = self.pos.copy()
+        self._last_vel = self.vel.copy()
+
+    def move(self, dt=1.0):
+        # dt is measured in ticks (one tick = one frame at the reference tick rate)
+        self.advance(1, dt)
 
-    def move(self):
-        if not self.alive:
+    def advance(self, n_steps, dt=1.0):
+        # Move n_steps physics steps ahead, assuming no collisions in between.
+        # The particle accelerates along its velocity and only changes direction
+        # at the walls, so every position is computed in closed form from the
+        # start of the current straight segment. One call with n_steps and
+        # n_steps calls with 1 give exactly the same result.
+        self.prev_pos = self.pos.copy()
+        if not self.alive or n_steps <= 0:
             return
 
-        # Apply acceleration in the direction of velocity
-        if np.linalg.norm(self.vel) > 0:
-            acc_dir = self.vel / np.linalg.norm(self.vel)
-            acc = acc_dir * self.acc_mag
-        else:
-            acc = np.array([0.0, 0.0])
+        if self._segment_is_stale(dt):
+            self._start_segment(self.pos, self.vel, dt)
 
-        self.vel += acc
+        # Bounce off edges
+        THR = 0.1  # Threshold to avoid sticking to the edge
+        lows = np.array([self.radius + THR, self.radius + THR])
+        highs = np.array([self.width - self.radius - THR, self.height - self.radius - THR])
 
-        speed = np.linalg.norm(self.vel)
-        if speed > self.max_speed:
-            self.vel = (self.vel / speed) * self.max_speed
+        def out_of_bounds(pos):
+            return bool(np.any(pos < lows) or np.any(pos > highs))
 
-        self.pos += self.vel
+        while n_steps > 0:
+            first = self._seg_steps + 1
+            last = self._seg_steps + n_steps
+            if not out_of_bounds(self._segment_pos(last)):
+                step = last
+            else:
+                # First step that leaves the arena
+                lo, hi = first, last
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if out_of_bounds(self._segment_pos(mid)):
+                        hi = mid
+                    else:
+                        lo = mid + 1
+                step = lo
+            n_steps -= step - self._seg_steps
 
-        # Bounce off edges
-        THR = 0.1  # Threshold to avoid sticking to the edge
-        for i, limit in enumerate([self.width, self.height]):
-            min_pos = self.radius + THR
-            max_pos = limit - self.radius - THR
-            if self.pos[i] < min_pos:
-                self.pos[i] = min_pos
-                self.vel[i] *= -1
-            elif self.pos[i] > max_pos:
-                self.pos[i] = max_pos
-                self.vel[i] *= -1
+            pos = self._segment_pos(step)
+            speed = self._segment_speed(step)
+            direction = self._seg_dir
+            self._seg_steps = step
+
+            if out_of_bounds(pos):
+                direction = direction.copy()
+                for i in range(2):
+                    if pos[i] < lows[i]:
+                        pos[i] = lows[i]
+                        direction[i] *= -1
+                    elif pos[i] > highs[i]:
+                        pos[i] = highs[i]
+                        direction[i] *= -1
+                self._start_segment(pos, direction * speed, dt, direction=direction, speed=speed)
+
+            self.pos = pos
+            self.vel = direction * speed
+
+        self._last_pos = self.pos.copy()
+        self._last_vel = self.vel.copy()
+
+    def get_state(self):
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+
+    def set_state(self, state):
+        for field in self.STATE_FIELDS:
+            setattr(self, field, state[field])
+
+    def _segment_is_stale(self, dt):
+        # Collisions, damage and radius changes edit the state from outside
+        return (
+            self._seg_dt != dt
+            or self._seg_radius != self.radius
+            or not np.array_equal(self.pos, self._last_pos)
+            or not np.array_equal(self.vel, self._last_vel)
+        )
+
+    def _start_segment(self, pos, vel, dt, direction=None, speed=None):
+        if speed is None:
+            speed = float(np.linalg.norm(vel))
+        if direction is None:
+            direction = vel / speed if speed > 0 else np.zeros(2)
+        self._seg_pos = np.array(pos, dtype=float)
+        self._seg_dir = direction
+        self._seg_speed = speed
+        self._seg_steps = 0
+        self._seg_dt = dt
+        self._seg_radius = self.radius
+        # Acceleration is applied in the direction of velocity, so a still
+        # particle stays still
+        self._seg_acc = self.acc_mag * dt if speed > 0 else 0.0
+        # Steps before the speed reaches max_speed
+        if speed >= self.max_speed:
+            self._seg_uncapped = 0
+        elif self._seg_acc > 0:
+            self._seg_uncapped = int((self.max_speed - speed) // self._seg_acc)
+        else:
+            self._seg_uncapped = math.inf
+
+    def _segment_speed(self, k):
+        if k <= self._seg_uncapped:
+            return self._seg_speed + k * self._seg_acc
+        return self.max_speed
+
+    def _segment_pos(self, k):
+        # The velocity is updated before the position, so step k moves at speed(k)
+        m = min(k, self._seg_uncapped)
+        length = m * self._seg_speed + self._seg_acc * m * (m + 1) / 2
+        if k > m:
+            length += (k - m) * self.max_speed
+        return self._seg_pos + self._seg_dir * (length * self._seg_dt)
 
     def draw(self, surface):
         # Gradient color based on HP (green to red)
@@ -5,77 +5,170 @@ Fight Rankings with Elimination Details
 Shows all players, their ranks, and who eliminated them.
 """
 
+import argparse
 import pandas as pd
 import os
+import re
 from typing import Optional
 
+from utils.log_archive import COLLISION_SUFFIX, DETAILED_PREFIX, load_index, list_logs, open_log, open_rankings
+
+ALL_RANKINGS_FILE = "all_rankings.csv"
+TIMESTAMP_PATTERN = re.compile(r"\d{8}_\d{6}")
+
 def _find_latest_file(simulations_dir: str, prefix: str, suffix: str) -> Optional[str]:
-    files = []
-    for filename in os.listdir(simulations_dir):
-        if filename.startswith(prefix) and filename.endswith(suffix):
-            filepath = os.path.join(simulations_dir, filename)
-            files.append((filepath, os.path.getmtime(filepath)))
-    if not files:
+    # Nomes com o timestamp padrão (YYYYMMDD_HHMMSS) já ficam em ordem cronológica,
+    # então basta o maior deles; os outros (--timestamp livre) vão pela data de
+    # modificação, e o mais novo de todos ganha
+    files = [f for f in os.listdir(simulations_dir) if f.startswith(prefix) and f.endswith(suffix)]
+    stamped = [f for f in files if TIMESTAMP_PATTERN.fullmatch(f[len(prefix):len(f) - len(suffix)])]
+    candidates = set(files) - set(stamped)
+    if stamped:
+        candidates.add(max(stamped))
+    if not candidates:
         return None
-    files.sort(key=lambda x: x[1], reverse=True)
-    return files[0][0]
+    paths = [os.path.join(simulations_dir, f) for f in candidates]
+    return max(paths, key=os.path.getmtime)
 
 
-def _generate_detailed_from_collision(collision_csv_path: str) -> str:
-    # Lê log de colisões e produz um CSV detalhado com Rank, Player, Eliminated_By
-    df = pd.read_csv(collision_csv_path)
-
-    # Normaliza coluna "Killed" para boolean
-    killed_col = df["Killed"].astype(str).str.lower().isin(["true", "1", "yes"])
-    df = df.assign(Killed=killed_col)
+def _detailed_path(simulations_dir: str, collision_log: str) -> str:
+    # <timestamp>_collision_log.csv -> <simulations>/detailed_rankings_<timestamp>.csv
+    timestamp = collision_log.split(COLLISION_SUFFIX)[0]
+    return os.path.join(simulations_dir, f"{DETAILED_PREFIX}{timestamp}.csv")
 
-    # Conjunto de todos os jogadores vistos
-    players = set(df["Particle"].astype(str)) | set(df["Opponent"].astype(str))
-    total_players = len(players)
 
-    # Para cada jogador eliminado, pegar o primeiro frame em que Killed=True
-    eliminated_df = (
-        df[df["Killed"] == True]  # noqa: E712 (comparação explícita com True)
-        .copy()
+def _rank_collisions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rank every match in a collision log frame with a "Match" column, in one pass.
+    Returns Match, Rank, Player, Eliminated_By with the winner (rank 1) first and
+    then the players in elimination order, like detailed_rankings_*.csv.
+    """
+    # Normaliza coluna "Killed" para boolean
+    killed = df["Killed"].astype(str).str.lower().isin(["true", "1", "yes"])
+    df = df.assign(
+        Killed=killed,
+        Particle=df["Particle"].astype(str),
+        Opponent=df["Opponent"].astype(str),
     )
-    # Se houver múltiplas linhas por jogador, manter o menor frame (eliminação mais cedo)
-    eliminated_df["Player"] = eliminated_df["Particle"].astype(str)
-    eliminated_df["Eliminated_By"] = eliminated_df["Opponent"].astype(str)
-    first_kills = (
-        eliminated_df.sort_values(["Frame"])  # ordem cronológica
-        .drop_duplicates(subset=["Player"], keep="first")
+
+    # Jogadores vistos em cada partida
+    players = pd.concat([
+        df[["Match", "Particle"]].rename(columns={"Particle": "Player"}),
+        df[["Match", "Opponent"]].rename(columns={"Opponent": "Player"}),
+    ]).drop_duplicates()
+    total_players = players.groupby("Match")["Player"].size()
+
+    # Primeira eliminação de cada jogador, em ordem cronológica (ordenação estável,
+    # empates mantêm a ordem do log)
+    eliminated = (
+        df[df["Killed"]]
+        .sort_values(["Match", "Frame"], kind="mergesort")
+        .drop_duplicates(subset=["Match", "Particle"], keep="first")
+        .rename(columns={"Particle": "Player", "Opponent": "Eliminated_By"})
     )
 
-    # Ordena pela sequência de eliminação
-    first_kills = first_kills.sort_values("Frame", ascending=True)
+    # Primeiro eliminado recebe rank N, depois N-1, ..., até 2
+    order = eliminated.groupby("Match").cumcount().to_numpy()
+    eliminated["Rank"] = total_players.reindex(eliminated["Match"]).to_numpy() - order
 
-    # Atribui ranks: primeiro eliminado recebe rank N, depois N-1, ..., até 2
-    ranks_desc = list(range(total_players, 1, -1))
-    rank_rows = []
-    for idx, (_, row) in enumerate(first_kills.iterrows()):
-        rank_rows.append({
-            "Rank": ranks_desc[idx],
-            "Player": row["Player"],
-            "Eliminated_By": row["Eliminated_By"],
-        })
+    # Vencedor: quem nunca foi eliminado (rank 1)
+    survivors = players.merge(
+        eliminated[["Match", "Player"]], on=["Match", "Player"], how="left", indicator=True
+    )
+    survivors = survivors[survivors["_merge"] == "left_only"].sort_values(["Match", "Player"])
+    winners = survivors.drop_duplicates(subset=["Match"], keep="first")[["Match", "Player"]]
+    winners = (
+        pd.DataFrame({"Match": total_players.index})
+        .merge(winners, on="Match", how="left")
+        .fillna({"Player": "UNKNOWN"})
+        .assign(Rank=1, Eliminated_By="WINNER")
+    )
 
-    eliminated_players = set(first_kills["Player"].astype(str))
-    winners = list(players - eliminated_players)
-    winner = winners[0] if winners else "UNKNOWN"
+    ranked = pd.concat([
+        winners.assign(_order=-1),
+        eliminated.assign(_order=order),
+    ])
+    ranked = ranked.sort_values(["Match", "_order"], kind="mergesort")
+    ranked["Rank"] = ranked["Rank"].astype(int)
+    return ranked[["Match", "Rank", "Player", "Eliminated_By"]].reset_index(drop=True)
 
-    # Adiciona o vencedor (rank 1)
-    rank_rows.insert(0, {"Rank": 1, "Player": winner, "Eliminated_By": "WINNER"})
 
-    detailed_df = pd.DataFrame(rank_rows)
+def _generate_detailed_from_collision(simulations_dir: str, collision_log: str) -> str:
+    # Lê log de colisões (na pasta ou no arquivo mensal) e produz um CSV
+    # detalhado com Rank, Player, Eliminated_By
+    with open_log(simulations_dir, collision_log) as f:
+        df = pd.read_csv(f).assign(Match=0)
+    detailed_df = _rank_collisions(df).drop(columns=["Match"])
 
-    # Deriva timestamp do nome do arquivo de colisão: <simulations>/<timestamp>_collision_log.csv
-    base_name = os.path.basename(collision_csv_path)
-    timestamp = base_name.split("_collision_log.csv")[0]
-    out_path = os.path.join(os.path.dirname(collision_csv_path), f"detailed_rankings_{timestamp}.csv")
+    out_path = _detailed_path(simulations_dir, collision_log)
     detailed_df.to_csv(out_path, index=False)
     return out_path
 
 
+def build_all_rankings(simulations_dir: str = "simulations", output: Optional[str] = None) -> str:
+    """
+    Batch mode: rank every collision log in simulations_dir and write one
+    consolidated CSV (Match, Date, Rank, Player, Eliminated_By) for all matches.
+    Logs whose detailed rankings are newer than the log are not parsed again.
+    Archived logs count as older than their detailed rankings, which are read
+    from the archive when they were archived too.
+    """
+    output = output or os.path.join(simulations_dir, ALL_RANKINGS_FILE)
+
+    logs = {}
+    detailed = {}
+    with os.scandir(simulations_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(COLLISION_SUFFIX):
+                logs[entry.name[:-len(COLLISION_SUFFIX)]] = entry
+            elif entry.name.startswith(DETAILED_PREFIX) and entry.name.endswith(".csv"):
+                detailed[entry.name[len(DETAILED_PREFIX):-len(".csv")]] = entry
+    archive_index = load_index(simulations_dir)
+    archived = {name[:-len(COLLISION_SUFFIX)] for name in archive_index} - set(logs)
+    archived_rankings = {ts for ts in archived - set(detailed)
+                         if archive_index[f"{ts}{COLLISION_SUFFIX}"]['rankings_offset'] is not None}
+
+    stale = sorted(
+        [ts for ts, entry in logs.items()
+         if ts not in detailed or detailed[ts].stat().st_mtime < entry.stat().st_mtime]
+        + [ts for ts in archived if ts not in detailed and ts not in archived_rankings]
+    )
+
+    def read_log(ts):
+        with open_log(simulations_dir, f"{ts}{COLLISION_SUFFIX}", archive_index) as f:
+            return pd.read_csv(f).assign(Match=ts)
+
+    frames = []
+    if stale:
+        collisions = pd.concat([read_log(ts) for ts in stale], ignore_index=True)
+        regenerated = _rank_collisions(collisions)
+        for ts, group in regenerated.groupby("Match", sort=False):
+            group.drop(columns=["Match"]).to_csv(
+                os.path.join(simulations_dir, f"{DETAILED_PREFIX}{ts}.csv"), index=False
+            )
+        frames.append(regenerated)
+
+    fresh = sorted(set(detailed) - set(stale))
+    frames.extend(pd.read_csv(detailed[ts].path).assign(Match=ts) for ts in fresh)
+    for ts in sorted(archived_rankings):
+        with open_rankings(simulations_dir, ts, archive_index) as f:
+            frames.append(pd.read_csv(f).assign(Match=ts))
+
+    if not frames:
+        raise FileNotFoundError(f"No collision logs or detailed rankings found in '{simulations_dir}'.")
+
+    all_rankings = pd.concat(frames, ignore_index=True)
+    all_rankings["Date"] = pd.to_datetime(
+        all_rankings["Match"].str.slice(0, 8), format="%Y%m%d", errors="coerce"
+    ).dt.strftime("%Y-%m-%d")
+    all_rankings = all_rankings.sort_values(["Match", "Rank"], kind="mergesort")
+    all_rankings[["Match", "Date", "Rank", "Player", "Eliminated_By"]].to_csv(output, index=False)
+
+    print(f"Matches: {all_rankings['Match'].nunique()} ({len(stale)} regenerated, {len(fresh)} up to date)")
+    print(f"Consolidated rankings written to {output}")
+    return output
+
+
 def show_rankings_with_kills():
     """
     Show all players, their rankings, and who killed them.
@@ -83,16 +176,16 @@ def show_rankings_with_kills():
     # Find most recent detailed rankings file
     simulations_dir = "simulations"
 
-    # Tenta achar um detailed pronto
-    latest_detailed = _find_latest_file(simulations_dir, "detailed_rankings_", ".csv")
+    # Tenta achar um detailed pronto (a simulação já grava um ao fim de cada partida)
+    latest_detailed = _find_latest_file(simulations_dir, DETAILED_PREFIX, ".csv")
 
-    # Se não existir, tenta gerar a partir do último collision_log
+    # Se não existir, tenta gerar a partir do último collision_log (arquivados inclusive)
     if latest_detailed is None:
-        latest_collision = _find_latest_file(simulations_dir, "", "_collision_log.csv")
-        if latest_collision is None:
+        collision_logs = list_logs(simulations_dir)
+        if not collision_logs:
             print("Error: No detailed rankings files found and no collision logs to generate from!")
             return
-        latest_detailed = _generate_detailed_from_collision(latest_collision)
+        latest_detailed = _generate_detailed_from_collision(simulations_dir, collision_logs[-1])
     
     # Read and display rankings
     df = pd.read_csv(latest_detailed)
@@ -143,4 +236,11 @@ def show_rankings_with_kills():
     print(f"💀 First Eliminated: {last_place['Player']} (killed by {last_place['Eliminated_By']})")
 
 if __name__ == "__main__":
-    show_rankings_with_kills()
+    parser = argparse.ArgumentParser(description="Show fight rankings with eliminations.")
+    parser.add_argument('--all', action='store_true', help="Rank every match and write one consolidated CSV.")
+    parser.add_argument('--output', default=None, help=f"Consolidated CSV path (default: simulations/{ALL_RANKINGS_FILE}).")
+    args = parser.parse_args()
+    if args.all:
+        build_all_rankings(output=args.output)
+    else:
+        show_rankings_with_kills()
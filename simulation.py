@@ -1,114 +1,50 @@
+import argparse
 import pygame
-import random
-import moviepy.editor as mpy
 
-from utils.helpers import load_config, get_dynamic_radius, load_particles, check_collisions, display_winner, add_particle_to_frames, remove_dead_particles
-import datetime
-import gc
-
-
-# Initialize global variables
-running = True
-winner_shown = False
-
-# Load configuration
-config = load_config('config.yaml')
-
-WIDTH = config['screen']['width']
-HEIGHT = config['screen']['height']
-FPS = config['screen']['fps']
-
-MIN_RADIUS = config['particles']['min_radius']
-MAX_RADIUS = config['particles']['max_radius']
-MAX_HP = config['particles']['max_hp']
-MAX_SPEED = config['particles']['max_speed']
-ACC_MAGNITUDE = config['particles']['acc_magnitude']
-
-BG_COLOR = tuple(config['colors']['background'])
-
-IMG_PATH = config['images']['path']
-LOCAL_IMAGES = config['images']['local']
-
-# Initialize Pygame
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Particle Simulation")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont(None, 36)
-
-# Create a timestamp 
-timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-
-# Init frames
-frames = []
-
-# Load particles
-particles = load_particles(MIN_RADIUS, MAX_RADIUS, MAX_HP, MAX_SPEED, ACC_MAGNITUDE, WIDTH, HEIGHT, IMG_PATH, LOCAL_IMAGES)
-num_particles = len(particles)
-
-# Main loop
-while running:
-    frame_number = len(frames)
-    clock.tick(FPS)
-    screen.fill(BG_COLOR)
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-    RADIUS = get_dynamic_radius(particles, WIDTH, HEIGHT, MIN_RADIUS, MAX_RADIUS)
-
-    CELL_SIZE = RADIUS * 2
-    grid_width = WIDTH // CELL_SIZE + 1
-    grid_height = HEIGHT // CELL_SIZE + 1
-
-    # Move and draw particles
-    for p in particles:
-        p.move()
-        p.draw(screen)
-    
-    # Show count of alive particles
-    alive_count = sum(1 for p in particles if p.alive)
-    text = font.render(f"Vivos: {alive_count}", True, (255,255,255))
-    screen.blit(text, (30, 30))
-
-    # Show winner if only one particle remains
-    if alive_count == 1 and not winner_shown:
-        display_winner(font, particles, screen, WIDTH, HEIGHT, RADIUS, timestamp)
-        
-        frames = add_particle_to_frames(screen, frames)
-
-        pygame.time.wait(2000)
-        running = False
-
-    check_collisions(RADIUS, CELL_SIZE, grid_width, grid_height, particles, timestamp, frame_number)
-
-    # Remove dead particles from the list
-    particles = remove_dead_particles(particles)
-
-    pygame.display.flip()
-
-    frames = add_particle_to_frames(screen, frames)
-
-# Repeat last frame for 2 seconds
-frames += [frames[-1]] * 2 * FPS  # Assuming 60 FPS
-
-# Clean up variables to free RAM except for frames
-del particles
-del config
-del font
-del screen
-del clock
-del IMG_PATH
-del LOCAL_IMAGES
-
-gc.collect()
-
-# Store each frame in a tmp file just in case
-# for i, frame in enumerate(frames):
-#    mpy.ImageClip(frame).save_frame(f"simulations/{timestamp}/frame_{i:04d}.png")
-
-clip = mpy.ImageSequenceClip(frames, fps=FPS)
-clip.write_videofile(f"simulations/{timestamp}_simulation.mp4", codec='libx264')
-
-pygame.quit()
\ No newline at end of file
+from utils.helpers import load_config, read_players_file
+from utils.match_runner import run_match
+from utils.run_metrics import report, file_size, count_csv_rows
+
+# Command line over utils/match_runner.run_match: one match per run, with the
+# outputs named after its timestamp in simulations/.
+parser = argparse.ArgumentParser(description="Run the particle arena.")
+parser.add_argument('--headless', action='store_true', help="Simulate without a window or video, only the collision log.")
+parser.add_argument('--compositor', action='store_true',
+                    help="Render the video without a window: frames are composed in NumPy and streamed to ffmpeg.")
+parser.add_argument('--substeps', type=int, default=None, help="Physics substeps per tick (overrides config.yaml).")
+parser.add_argument('--resume', nargs='?', const='latest', default=None,
+                    help="Continue a match from a checkpoint file (default: the latest one).")
+parser.add_argument('--players', default=None,
+                    help="Text file with one player per line: only they take part (e.g. a tournament final).")
+parser.add_argument('--timestamp', default=None, help="Name the match outputs with this timestamp instead of the current time.")
+parser.add_argument('--record', action='store_true',
+                    help="Keep the state of every frame in simulations/recordings, for highlights.py.")
+parser.add_argument('--trace', action='store_true',
+                    help="Keep a compact movement trace in simulations/traces, for utils/trace_analytics.py.")
+parser.add_argument('--shards', type=int, default=0,
+                    help="Run headless on this many worker processes, one per arena strip (for very large rosters).")
+args = parser.parse_args()
+
+# What the match wrote, for the pipeline metrics (see utils/run_metrics.py)
+def report_match(result):
+    report(frames=result.ticks, rows=count_csv_rows(result.log_path),
+           bytes_written=file_size(result.log_path, result.rankings_path, result.video_path))
+
+result = run_match(
+    load_config('config.yaml'),
+    read_players_file(args.players) if args.players else None,
+    {
+        'headless': args.headless,
+        'compositor': args.compositor,
+        'substeps': args.substeps,
+        'resume': args.resume,
+        'timestamp': args.timestamp,
+        'record': args.record,
+        'trace': args.trace,
+        'shards': args.shards,
+    },
+)
+pygame.quit()
+if result.stopped:
+    raise SystemExit(1)
+report_match(result)
@@ -1,182 +1,109 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import os
 
+from utils.live_feed import read_snapshot
+from utils.log_manager import init_db, sync_partitions
+from utils.run_metrics import RUNS_FILE, LOCAL_RUNS_FILE, sync_pipeline_runs
+from utils.stats_partitions import MANIFEST_FILE
+from utils.query_cache import VersionedCache, read_data_version
+from utils import stats_queries
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "data/daily_stats.db")
+STATS_DIR = os.path.join(os.path.dirname(__file__), "data/stats")
 
-# ========= DB HELPERS ========= #
+# The queries read the same database
+stats_queries.DB_PATH = DB_PATH
 
-def get_conn():
-    return sqlite3.connect(DB_PATH)
+# ========= DB HELPERS ========= #
 
-@st.cache_data(ttl=300)
-def get_available_dates():
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT date FROM daily_summary ORDER BY date DESC")
-    dates = [r[0] for r in cursor.fetchall()]
-    conn.close()
-    return ["Todos os Tempos"] + dates 
-
-@st.cache_data(ttl=300)
-def get_daily_summary(date_str):
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT num_players, winner FROM daily_summary WHERE date = ?", (date_str,))
-    row = cursor.fetchone()
-    conn.close()
-    return {"num_players": row[0], "winner": row[1]} if row else None
-
-@st.cache_data(ttl=300)
-def get_players(date_str):
-    conn = get_conn()
-    cursor = conn.cursor()
-    if date_str == "Todos os Tempos":
-        cursor.execute("SELECT DISTINCT player FROM player_stats ORDER BY player ASC")
-    else:
-        cursor.execute("SELECT player FROM player_stats WHERE date = ? ORDER BY player ASC", (date_str,))
-    players = [r[0] for r in cursor.fetchall()]
-    conn.close()
-    return players
-
-
-@st.cache_data(ttl=300)
-def get_top_players(date_str, stat="kills", limit=10):
-    conn = get_conn()
-    cursor = conn.cursor()
-
-    if date_str == "Todos os Tempos":
-        cursor.execute(f"""
-            SELECT player, SUM({stat}) as total_{stat}
-            FROM player_stats
-            GROUP BY player
-            ORDER BY total_{stat} DESC
-            LIMIT ?
-        """, (limit,))
-      
-    else:
-        cursor.execute(f"""
-            SELECT player, {stat}
-            FROM player_stats
-            WHERE date = ?
-            ORDER BY {stat} DESC
-            LIMIT ?
-        """, (date_str, limit))
-    rows = cursor.fetchall()
-    conn.close()
-    if stat == "kills":
-        col_name = "Eliminações"
-    else:
-        col_name = stat.capitalize()
-    return pd.DataFrame(rows, columns=["Jogador", col_name])
-
-
-@st.cache_data(ttl=300)
-def get_player_stats(date_str, player):
-    conn = get_conn()
-    cursor = conn.cursor()
-    if date_str == "Todos os Tempos":
-        cursor.execute("""
-            SELECT 
-                SUM(kills), SUM(deaths),
-                NULL, NULL
-            FROM player_stats
-            WHERE player = ?
-        """, (player,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return {
-                "kills": row[0] or 0,
-                "deaths": row[1] or 0,
-                "nemesis": None,
-                "victim": None,
-            }
-        return None
-    else:
-        cursor.execute("""
-            SELECT kills, deaths, nemesis, victim
-            FROM player_stats
-            WHERE date = ? AND player = ?
-        """, (date_str, player))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return {
-                "kills": row[0],
-                "deaths": row[1],
-                "nemesis": row[2],
-                "victim": row[3],
-            }
-        return None
-
-@st.cache_data(ttl=300)
-def get_player_rank(date_str, player):
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT rank FROM ranking WHERE date = ? AND player = ?
-    """, (date_str, player))
-    row = cursor.fetchone()
+@st.cache_data(max_entries=1)
+def sync_stats(stamp):
+    # The database is not committed: build it, or bring it up to date, from
+    # the daily partitions. Runs again only when the stats files change
+    # (stamp), and bumps the data version when it loads anything.
+    conn = init_db(DB_PATH)
+    loaded = len(sync_partitions(conn, STATS_DIR))
+    loaded += sync_pipeline_runs(conn, STATS_DIR)
     conn.close()
-    return row[0] if row else None
-
-@st.cache_data(ttl=300)
-def get_player_time(date_str, player):
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT time FROM ranking WHERE date = ? AND player = ?
-    """, (date_str, player))
-    row = cursor.fetchone()
-    conn.close()
-    return row[0] if row else None
-
-@st.cache_data(ttl=300)
-def get_all_winners():
-    """Return all winners per day."""
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT date, winner FROM daily_summary ORDER BY date DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return pd.DataFrame(rows, columns=["Data", "Vencedor"])
-
-@st.cache_data(ttl=300)
-def get_wins_leaderboard(limit=10):
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT winner AS player, COUNT(*) AS wins
-        FROM daily_summary
-        WHERE winner IS NOT NULL AND winner <> ''
-        GROUP BY winner
-        ORDER BY wins DESC, player ASC
-        LIMIT ?
-        """,
-        (limit,)
-    )
-    rows = cursor.fetchall()
-    conn.close()
-    return pd.DataFrame(rows, columns=["Jogador", "Vitórias"])
-
-@st.cache_data(ttl=300)
-def get_wins(player):
-    """Return how many wins a player has (all-time or specific date)."""
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM daily_summary WHERE winner = ?", (player,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    return loaded
+
+def get_stats_stamp():
+    paths = [os.path.join(STATS_DIR, name) for name in (MANIFEST_FILE, RUNS_FILE, LOCAL_RUNS_FILE)]
+    return tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in paths)
+
+# Query results are kept until the data version changes (see
+# utils/query_cache.py). The cache lives across reruns and sessions.
+@st.cache_resource
+def get_query_cache():
+    return VersionedCache(lambda: read_data_version(DB_PATH), maxsize=1024)
+
+query_cache = get_query_cache()
+
+
+# The queries themselves are in utils/stats_queries.py
+PLAYER_PAGE_SIZE = stats_queries.PLAYER_PAGE_SIZE
+get_available_dates = query_cache.cached(stats_queries.get_available_dates)
+get_daily_summary = query_cache.cached(stats_queries.get_daily_summary)
+search_players = query_cache.cached(stats_queries.search_players)
+get_player_count = query_cache.cached(stats_queries.get_player_count)
+player_played = query_cache.cached(stats_queries.player_played)
+get_top_players = query_cache.cached(stats_queries.get_top_players)
+get_player_stats = query_cache.cached(stats_queries.get_player_stats)
+get_rivals = query_cache.cached(stats_queries.get_rivals)
+get_top_rivalries = query_cache.cached(stats_queries.get_top_rivalries)
+get_pipeline_runs = query_cache.cached(stats_queries.get_pipeline_runs)
+get_player_rank = query_cache.cached(stats_queries.get_player_rank)
+get_player_time = query_cache.cached(stats_queries.get_player_time)
+get_all_winners = query_cache.cached(stats_queries.get_all_winners)
+get_wins_leaderboard = query_cache.cached(stats_queries.get_wins_leaderboard)
+get_wins = query_cache.cached(stats_queries.get_wins)
+get_top_ratings = query_cache.cached(stats_queries.get_top_ratings)
+get_rating_history = query_cache.cached(stats_queries.get_rating_history)
+
+# ========= LIVE ========= #
+
+LIVE_MAX_POINTS = 5000  # Scatter points sent to the browser per refresh
+
+def render_live_view():
+    snapshot = read_snapshot()
+    if snapshot is None:
+        st.info("Nenhuma partida em andamento.")
+        return
+
+    if snapshot["finished"]:
+        winner = snapshot["players"]["player"][0] if snapshot["alive"] == 1 else None
+        st.success(f"Partida encerrada! Vencedor: {winner}" if winner else "Partida encerrada!")
+
+    cols = st.columns(3)
+    cols[0].metric("Vivos", f"{snapshot['alive']} / {snapshot['num_players']}")
+    cols[1].metric("Frame", snapshot["frame"])
+    cols[2].metric("Eliminados", snapshot["num_players"] - snapshot["alive"])
+
+    players_df = pd.DataFrame(snapshot["players"])
+    if len(players_df) > LIVE_MAX_POINTS:
+        players_df = players_df.sample(LIVE_MAX_POINTS, random_state=0)
+    # Screen coordinates grow downwards
+    players_df["y"] = snapshot["height"] - players_df["y"]
+    st.scatter_chart(players_df, x="x", y="y", color="hp", height=400)
+
+    if snapshot["kills"]:
+        st.markdown("### Últimas eliminações")
+        kills_df = pd.DataFrame(snapshot["kills"][::-1], columns=["Eliminado", "Por", "Frame"])
+        st.dataframe(kills_df, use_container_width=True, hide_index=True)
+
+# Re-run only this part of the page every second, when supported
+if hasattr(st, "fragment"):
+    render_live_view = st.fragment(run_every=1)(render_live_view)
 
 
 # ========= APP ========= #
 
 st.title("⚔️ fIGth club: lute ou deixe de seguir")
 
+# New partitions bump the data version, which invalidates the cached queries
+sync_stats(get_stats_stamp())
+
 # Dates
 available_dates = get_available_dates()
 if not available_dates:
@@ -185,32 +112,51 @@ if not available_dates:
 
 selected_date = st.sidebar.selectbox("Selecionar Data", available_dates)
 
-# Players
-players = get_players(selected_date)
-if not players:
+# Players: searched a page at a time, never the whole roster
+n_players = get_player_count(selected_date)
+if not n_players:
     st.warning(f"Nenhum jogador encontrado para {selected_date}")
     st.stop()
 
+player_query = st.sidebar.text_input("Buscar jogador", key="player_query")
+if st.session_state.get("player_query_used") != (selected_date, player_query):
+    # New search: back to the first page
+    st.session_state.player_query_used = (selected_date, player_query)
+    st.session_state.player_page = 0
+page = st.session_state.get("player_page", 0)
+
+players, has_more = search_players(selected_date, player_query, page)
+
 if "selected_player" not in st.session_state:
-    st.session_state.selected_player = players[0]
+    st.session_state.selected_player = players[0] if players else search_players(selected_date)[0][0]
 
-if st.session_state.selected_player not in players:
+if not player_played(selected_date, st.session_state.selected_player):
     st.sidebar.warning(f"Nenhum dado para **{st.session_state.selected_player}** em {selected_date}")
 
+# Keep the current player selectable while browsing other pages
+options = players if st.session_state.selected_player in players else [st.session_state.selected_player] + players
 selected_player = st.sidebar.selectbox(
     "Selecionar um jogador",
-    players,
-    index=players.index(st.session_state.selected_player) if st.session_state.selected_player in players else 0,
+    options,
+    index=options.index(st.session_state.selected_player),
     key="selected_player"
 )
 
+prev_col, page_col, next_col = st.sidebar.columns([1, 2, 1])
+if prev_col.button("◀", disabled=page == 0):
+    st.session_state.player_page = page - 1
+    st.rerun()
+page_col.caption(f"Página {page + 1}" if players else "Nenhum resultado")
+if next_col.button("▶", disabled=not has_more):
+    st.session_state.player_page = page + 1
+    st.rerun()
+
 # Tabs
-tab1, tab2 = st.tabs(["🏆 Ranking", "📊 Estatísticas do Jogador"])
+tab1, tab2, tab3, tab4 = st.tabs(["🏆 Ranking", "📊 Estatísticas do Jogador", "🔴 Ao Vivo", "⚙️ Desempenho"])
 
 with tab1:
-    n_players = len(players)
     st.subheader(f"🏆 Ranking para {selected_date} — {n_players} jogadores")
-    stat_choice = st.sidebar.radio("Estatística do Ranking", ["vencedores", "eliminações"])
+    stat_choice = st.sidebar.radio("Estatística do Ranking", ["vencedores", "eliminações", "rating"])
     top_df = pd.DataFrame()
     if stat_choice == "vencedores":
         if selected_date == "Todos os Tempos":
@@ -219,10 +165,21 @@ with tab1:
         else: 
             winner = get_daily_summary(selected_date)['winner']
             st.markdown(f"🏅 O vencedor de {selected_date} é **[{winner}](https://instagram.com/{winner})**!")
+    elif stat_choice == "rating":
+        top_df = get_top_ratings(selected_date, limit=10)
     else:
         top_df = get_top_players(selected_date, "kills", limit=10)
     if not top_df.empty:
         st.dataframe(top_df, use_container_width=True, hide_index=True)
+    elif stat_choice == "rating":
+        st.info("Sem ratings para este dia. Numa instalação com dias anteriores aos ratings, "
+                "rode uma vez `python -m utils.log_manager --rate-history`.")
+
+    if selected_date == "Todos os Tempos":
+        rivalries_df = get_top_rivalries(limit=10)
+        if not rivalries_df.empty:
+            st.markdown("### ⚔️ Maiores rivalidades")
+            st.dataframe(rivalries_df, use_container_width=True, hide_index=True)
 
 with tab2:
     st.header(f"📊 Estatísticas de [{selected_player}](https://instagram.com/{selected_player})")
@@ -255,19 +212,55 @@ with tab2:
                 with cols[1]:
                     st.metric("⏱️ Tempo", f"{time:.2f} s")
 
-        # Nemesis and Victim
-        if selected_date != "Todos os Tempos":
-            col_nemesis, col_victim = st.columns(2)
-            with col_nemesis:
-                st.markdown("### Nêmesis")
-                if stats["nemesis"]:
-                    st.markdown(f"[{stats['nemesis']}](https://instagram.com/{stats['nemesis']})")
-                else:
-                    st.write("Nenhuma nêmesis encontrada.")
-
-            with col_victim:
-                st.markdown("### Vítima")
-                if stats["victim"]:
-                    st.markdown(f"[{stats['victim']}](https://instagram.com/{stats['victim']})")
-                else:
-                    st.write("Nenhuma vítima encontrada.")
\ No newline at end of file
+        # Nemesis and Victim (all-time ones come from the head-to-head totals)
+        col_nemesis, col_victim = st.columns(2)
+        with col_nemesis:
+            st.markdown("### Nêmesis")
+            if stats["nemesis"]:
+                st.markdown(f"[{stats['nemesis']}](https://instagram.com/{stats['nemesis']})")
+            else:
+                st.write("Nenhuma nêmesis encontrada.")
+
+        with col_victim:
+            st.markdown("### Vítima")
+            if stats["victim"]:
+                st.markdown(f"[{stats['victim']}](https://instagram.com/{stats['victim']})")
+            else:
+                st.write("Nenhuma vítima encontrada.")
+
+        # Skill rating after every day played
+        rating_df = get_rating_history(selected_player)
+        if not rating_df.empty:
+            st.markdown("### 📈 Rating")
+            last = rating_df.iloc[-1]
+            st.metric("Rating atual", f"{last['Rating']:.2f}",
+                      f"{last['Rating'] - rating_df.iloc[-2]['Rating']:+.2f}" if len(rating_df) > 1 else None)
+            st.line_chart(rating_df, x="Data", y=["Rating", "μ"])
+
+        # Rivals: kills and deaths against the most frequent opponents
+        rivals_df = get_rivals(selected_date, selected_player, limit=10)
+        if not rivals_df.empty:
+            st.markdown("### ⚔️ Rivais")
+            st.bar_chart(rivals_df, x="Oponente", y=["Eliminações", "Mortes"], stack=False)
+
+with tab3:
+    st.header("🔴 Partida ao vivo")
+    render_live_view()
+
+with tab4:
+    st.header("⚙️ Desempenho do pipeline diário")
+    runs_df = get_pipeline_runs()
+    if runs_df.empty:
+        st.write("Nenhuma execução registrada ainda.")
+    else:
+        # One line per stage, one point per daily run
+        metric = st.selectbox("Métrica", ["Tempo (s)", "Pico de RAM (MB)", "Frames", "Linhas", "Bytes gravados"])
+        chart_df = runs_df.pivot_table(index="Execução", columns="Etapa", values=metric, aggfunc="max")
+        chart_df.index = pd.to_datetime(chart_df.index, format="%Y%m%d_%H%M%S", errors="coerce")
+        st.line_chart(chart_df)
+
+        failed = runs_df[runs_df["Saída"] != 0]
+        if not failed.empty:
+            st.warning(f"{len(failed)} etapas terminaram com erro")
+        st.markdown("### Últimas execuções")
+        st.dataframe(runs_df.sort_values("Início", ascending=False).head(50), use_container_width=True, hide_index=True)
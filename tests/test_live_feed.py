@@ -0,0 +1,81 @@
+import os
+import sys
+import signal
+import subprocess
+
+import pytest
+
+from utils.live_feed import LiveFeedPublisher, read_snapshot
+
+NAME = f"lutafoda_test_{os.getpid()}"
+# Publishes a feed and waits, like a match in another process
+HOLDER = f"""
+import sys, time
+from multiprocessing import resource_tracker
+from utils.live_feed import LiveFeedPublisher
+feed = LiveFeedPublisher(['a', 'b'], 640, 360, {NAME!r})
+# Like a crash that takes the tracker along: nobody cleans the segment up
+resource_tracker.unregister(feed.shm._name, 'shared_memory')
+print('ready', flush=True)
+time.sleep(60)
+"""
+
+
+@pytest.fixture
+def holder():
+    proc = subprocess.Popen([sys.executable, "-c", HOLDER], stdout=subprocess.PIPE, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert proc.stdout.readline().strip() == 'ready'
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def test_running_feed_is_not_taken_over(holder):
+    with pytest.raises(FileExistsError):
+        LiveFeedPublisher(['c'], 640, 360, NAME)
+    assert read_snapshot(NAME)['num_players'] == 2
+
+
+def test_feed_of_a_dead_match_is_replaced(holder):
+    os.kill(holder.pid, signal.SIGKILL)
+    holder.wait()
+    feed = LiveFeedPublisher(['c'], 640, 360, NAME)
+    try:
+        assert read_snapshot(NAME)['num_players'] == 1
+    finally:
+        feed.close()
+
+
+def test_same_process_cannot_publish_twice():
+    feed = LiveFeedPublisher(['a'], 640, 360, NAME)
+    try:
+        with pytest.raises(FileExistsError):
+            LiveFeedPublisher(['b'], 640, 360, NAME)
+    finally:
+        feed.close()
+
+
+def test_segment_without_roster_reads_as_no_match():
+    # Created but not written yet, as a reader may catch it
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=NAME, create=True, size=4096)
+    try:
+        assert read_snapshot(NAME) is None
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_finished_match_lingers():
+    feed = LiveFeedPublisher(['a', 'b'], 640, 360, NAME)
+    feed.close(linger=60)
+    snapshot = read_snapshot(NAME)
+    assert snapshot['finished'] and snapshot['num_players'] == 2
+    # The next match of this process takes its place right away
+    feed = LiveFeedPublisher(['c'], 640, 360, NAME)
+    try:
+        assert not read_snapshot(NAME)['finished']
+    finally:
+        feed.close()
+    assert read_snapshot(NAME) is None
@@ -0,0 +1,64 @@
+import os
+from datetime import date
+
+from utils.synthetic_history import generate_history
+from utils.log_archive import DETAILED_PREFIX, INDEX_FILE, archive_logs, get_archive_dir, load_index, open_rankings
+from rankings_with_kills import build_all_rankings
+
+
+def make_history(tmp_path, days=10):
+    logs = generate_history(str(tmp_path), days, 40, start=date(2025, 1, 1))
+    return str(tmp_path / "simulations"), {os.path.basename(log) for log in logs}
+
+
+def read_file(path, mode='r'):
+    with open(path, mode) as f:
+        return f.read()
+
+
+def test_rankings_follow_their_logs_into_the_archive(tmp_path):
+    simulations_dir, processed = make_history(tmp_path)
+    before = open(build_all_rankings(simulations_dir)).read()
+    ranking = open(os.path.join(simulations_dir, f"{DETAILED_PREFIX}20250102_120000.csv")).read()
+
+    moved = archive_logs(simulations_dir, processed, keep_days=3, today=date(2025, 1, 10))
+    # Matches before Jan 7: 6 logs and their 6 rankings
+    assert len(moved) == 12
+    left = [f for f in os.listdir(simulations_dir) if f.startswith(DETAILED_PREFIX)]
+    assert sorted(left) == [f"{DETAILED_PREFIX}2025010{d}_120000.csv" for d in range(7, 10)] + [f"{DETAILED_PREFIX}20250110_120000.csv"]
+    with open_rankings(simulations_dir, "20250102_120000") as f:
+        assert f.read() == ranking
+
+    # Same consolidated rankings, without writing the archived ones back
+    os.remove(os.path.join(simulations_dir, "all_rankings.csv"))
+    assert open(build_all_rankings(simulations_dir)).read() == before
+    assert sorted(f for f in os.listdir(simulations_dir) if f.startswith(DETAILED_PREFIX)) == sorted(left)
+
+
+def test_rankings_of_logs_archived_before_them(tmp_path):
+    simulations_dir, processed = make_history(tmp_path, days=4)
+    build_all_rankings(simulations_dir)
+    archive_logs(simulations_dir, processed, keep_days=0, today=date(2025, 1, 10))
+    # An index written before the rankings were archived
+    index_path = os.path.join(get_archive_dir(simulations_dir), INDEX_FILE)
+    lines = open(index_path).read().splitlines()
+    with open(index_path, 'w') as f:
+        f.write("\n".join(",".join(line.split(",")[:5]) for line in lines) + "\n")
+    for entry in load_index(simulations_dir).values():
+        assert entry['rankings_offset'] is None
+    build_all_rankings(simulations_dir)
+    archive_dir = get_archive_dir(simulations_dir)
+    archives = {name: read_file(os.path.join(archive_dir, name), 'rb')
+                for name in os.listdir(archive_dir) if name != INDEX_FILE}
+    ranking = read_file(os.path.join(simulations_dir, f"{DETAILED_PREFIX}20250101_120000.csv"))
+
+    moved = archive_logs(simulations_dir, processed, keep_days=0, today=date(2025, 1, 10))
+    assert len(moved) == 4 and all(f.startswith(DETAILED_PREFIX) for f in moved)
+    index = load_index(simulations_dir)
+    assert all(entry['rankings_offset'] is not None for entry in index.values())
+    # Archives are never changed: the rankings went to new ones
+    for name, data in archives.items():
+        assert read_file(os.path.join(archive_dir, name), 'rb') == data
+    assert sorted(entry['rankings_archive'] for entry in index.values()) == [f"logs_2025010{d}_1.csv.gz" for d in range(1, 5)]
+    with open_rankings(simulations_dir, "20250101_120000") as f:
+        assert f.read() == ranking
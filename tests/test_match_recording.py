@@ -0,0 +1,60 @@
+import os
+import random
+
+import numpy as np
+
+from utils.helpers import load_config
+from utils.match_runner import run_match
+from utils.match_recording import MatchRecorder, MatchRecording, get_recording_path
+from utils.match_trace import MatchTrace, get_trace_path
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.yaml')
+
+
+def play_headless(tmp_path, monkeypatch, record=False, trace=False, every_ticks=1, players=24):
+    # Small headless match in tmp_path, the outputs in its simulations/
+    config = load_config(CONFIG_PATH)
+    img_dir = tmp_path / "img"
+    img_dir.mkdir()
+    for i in range(players):
+        (img_dir / f"particle_{i}.png").touch()
+    config['images'] = {'local': True, 'path': str(img_dir)}
+    config['screen'].update(width=640, height=360)
+    config['live_feed']['enabled'] = False
+    config['checkpoint']['dir'] = str(tmp_path / "checkpoints")
+    config['trace']['every_ticks'] = every_ticks
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "simulations").mkdir()
+    random.seed(1)
+    return run_match(config, options={'headless': True, 'record': record, 'trace': trace, 'timestamp': 'test'})
+
+
+def test_recording_has_every_tick(tmp_path, monkeypatch):
+    result = play_headless(tmp_path, monkeypatch, record=True)
+    recording = MatchRecording(get_recording_path('test'))
+    # The fast-forward must not jump over recorded ticks
+    assert list(recording.ticks) == list(range(1, result.ticks + 1))
+
+
+def test_recording_written_in_chunks(tmp_path, monkeypatch):
+    (tmp_path / "one").mkdir()
+    (tmp_path / "chunked").mkdir()
+    play_headless(tmp_path / "one", monkeypatch, record=True)
+    one = MatchRecording(tmp_path / "one" / get_recording_path('test'))
+    # Many flushes to the temporary files, one of them mid-frame
+    monkeypatch.setattr(MatchRecorder, 'CHUNK_ROWS', 1000)
+    play_headless(tmp_path / "chunked", monkeypatch, record=True)
+    chunked = MatchRecording(tmp_path / "chunked" / get_recording_path('test'))
+    for name in ('ticks', 'offsets', 'index', 'pos', 'hp_ratio'):
+        assert np.array_equal(getattr(one, name), getattr(chunked, name))
+
+
+def test_trace_samples_every_ticks(tmp_path, monkeypatch):
+    result = play_headless(tmp_path, monkeypatch, trace=True, every_ticks=7)
+    trace = MatchTrace(get_trace_path('test'))
+    # One tick in every_ticks, plus the last one
+    expected = list(range(7, result.ticks + 1, 7))
+    if expected[-1] != result.ticks:
+        expected.append(result.ticks)
+    assert list(trace.ticks) == expected
+    assert np.all(np.diff(trace.ticks) > 0)
@@ -0,0 +1,54 @@
+import numpy as np
+
+from utils.match_trace import TraceRecorder, MatchTrace
+
+
+class Dot:
+    # Just what the recorder reads from a Particle
+    def __init__(self, pid, pos, vel, hp=100.0):
+        self.id = pid
+        self.pos = np.array(pos, dtype=float)
+        self.vel = np.array(vel, dtype=float)
+        self.hp = hp
+        self.max_hp = 100.0
+        self.alive = True
+
+
+def record(tmp_path, speed, ticks=50):
+    dots = [Dot('a', (100, 100), (speed, 0)), Dot('b', (500, 300), (-3.25, 1.5), hp=60)]
+    recorder = TraceRecorder([d.id for d in dots], 1920, 1080, 60)
+    expected = []
+    for tick in range(ticks):
+        if tick == 30:
+            dots[1].alive = False
+        for d in dots:
+            d.pos = np.clip(d.pos + d.vel * 0.01, 0, 1920)
+        recorder.record(tick, dots, 10)
+        expected.append({d.id: (d.pos.copy(), d.vel.copy(), d.hp / d.max_hp) for d in dots if d.alive})
+    path = tmp_path / "trace.npz"
+    recorder.save(path)
+    return MatchTrace(path), expected
+
+
+def check(trace, expected, pos_tol, vel_tol):
+    for player in ('a', 'b'):
+        rows = trace.rows_of(player)
+        frames = trace.frame[rows]
+        assert list(frames) == [k for k, alive in enumerate(expected) if player in alive]
+        for pos, vel, hp, k in zip(trace.pos[rows], trace.vel[rows], trace.hp_ratio[rows], frames):
+            want_pos, want_vel, want_hp = expected[k][player]
+            assert np.abs(pos - want_pos).max() <= pos_tol
+            assert np.abs(vel - want_vel).max() <= vel_tol
+            assert abs(hp - want_hp) <= 1e-4
+
+
+def test_slow_match_keeps_full_precision(tmp_path):
+    trace, expected = record(tmp_path, speed=9.5)
+    check(trace, expected, pos_tol=1 / 32, vel_tol=1 / 256)
+
+
+def test_fast_players_are_not_clipped(tmp_path):
+    # Far above the old +-255 px/tick limit
+    trace, expected = record(tmp_path, speed=5000.0)
+    assert np.abs(trace.vel[:, 0]).max() > 4999
+    check(trace, expected, pos_tol=1 / 32, vel_tol=5000 / 32767)
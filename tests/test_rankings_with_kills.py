@@ -0,0 +1,23 @@
+import os
+
+from rankings_with_kills import DETAILED_PREFIX, _find_latest_file
+
+
+def touch(path, mtime):
+    path.write_text("Rank,Player\n")
+    os.utime(path, (mtime, mtime))
+
+
+def test_latest_file_ignores_name_order_of_custom_timestamps(tmp_path):
+    touch(tmp_path / f"{DETAILED_PREFIX}20261018_120000.csv", 1000)
+    touch(tmp_path / f"{DETAILED_PREFIX}20261019_120000.csv", 2000)
+    # Sorts after both by name, but was written before them
+    touch(tmp_path / f"{DETAILED_PREFIX}T1.csv", 500)
+    assert _find_latest_file(str(tmp_path), DETAILED_PREFIX, ".csv").endswith("20261019_120000.csv")
+
+    touch(tmp_path / f"{DETAILED_PREFIX}T2.csv", 3000)
+    assert _find_latest_file(str(tmp_path), DETAILED_PREFIX, ".csv").endswith("T2.csv")
+
+
+def test_latest_file_none_when_empty(tmp_path):
+    assert _find_latest_file(str(tmp_path), DETAILED_PREFIX, ".csv") is None
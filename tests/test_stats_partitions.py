@@ -0,0 +1,61 @@
+import os
+import sys
+import gzip
+import json
+import hashlib
+import subprocess
+from datetime import date
+
+from utils.synthetic_history import generate_history
+from utils.stats_partitions import load_manifest, save_manifest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def log_manager(workdir, *args):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    subprocess.run([sys.executable, "-m", "utils.log_manager", *args], cwd=workdir, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def read_stats(stats_dir):
+    # {file name: bytes} of the whole partition set, manifest included
+    stats = {}
+    for name in sorted(os.listdir(stats_dir)):
+        with open(os.path.join(stats_dir, name), 'rb') as f:
+            stats[name] = f.read()
+    return stats
+
+def drop_ratings(stats_dir):
+    # Rewrite the partitions as they were exported before the ratings existed
+    manifest = load_manifest(stats_dir)
+    for iso_date, entry in manifest.items():
+        path = os.path.join(stats_dir, entry["file"])
+        with gzip.open(path, 'rb') as f:
+            payload = json.loads(f.read().decode('utf-8'))
+        rows = len(payload["tables"].pop("rating_history", {"rows": []})["rows"])
+        data = gzip.compress(json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8'), mtime=0)
+        with open(path, 'wb') as f:
+            f.write(data)
+        entry.update(sha1=hashlib.sha1(data).hexdigest(), rows=entry["rows"] - rows)
+    save_manifest(manifest, stats_dir)
+
+
+def test_existing_partitions_round_trip_unchanged(tmp_path):
+    generate_history(str(tmp_path), 6, 30, start=date(2025, 1, 1))
+    log_manager(tmp_path, "--keep-days", "-1")
+    stats_dir = str(tmp_path / "data" / "stats")
+    drop_ratings(stats_dir)
+    before = read_stats(stats_dir)
+
+    # An existing install: fresh database from the partitions, nothing new to ingest
+    os.remove(tmp_path / "data" / "daily_stats.db")
+    log_manager(tmp_path, "--keep-days", "-1")
+    assert read_stats(stats_dir) == before
+
+    # The explicit backfill adds the ratings, and running it again changes nothing
+    log_manager(tmp_path, "--keep-days", "-1", "--rate-history")
+    rated = read_stats(stats_dir)
+    assert rated != before
+    log_manager(tmp_path, "--keep-days", "-1", "--rate-history")
+    log_manager(tmp_path, "--keep-days", "-1")
+    assert read_stats(stats_dir) == rated
@@ -0,0 +1,113 @@
+import os
+import math
+import random
+import shutil
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.helpers import load_config, load_roster_ids
+from utils.sharded_engine import run_sharded_match
+from utils.match_index import MatchIndex
+from utils.match_runner import run_match
+
+# Rosters too big for one arena play in rounds: the players are split into
+# groups, the group matches run headless in parallel, and the best of each
+# group move on until few enough are left for a normal, rendered final.
+# Everything ends up in one collision log for the day, rounds one after the
+# other, so log_manager and the rankings read it like any other match.
+
+
+def split_groups(players, group_size):
+    # Groups of (almost) equal size, at most group_size each
+    players = list(players)
+    random.shuffle(players)
+    n_groups = math.ceil(len(players) / group_size)
+    return [players[i::n_groups] for i in range(n_groups)]
+
+def play_group(group, config, name, out_dir, advance, seed):
+    # One group match in a worker process; returns the players who go through
+    random.seed(seed)
+    match_index = run_sharded_match(
+        group,
+        config['screen']['width'], config['screen']['height'],
+        config['particles']['min_radius'], config['particles']['max_radius'],
+        config['particles']['max_hp'], config['particles']['max_speed'], config['particles']['acc_magnitude'],
+        config['physics']['substeps'], name, 0, simulations_dir=out_dir, stop_at=advance,
+    )
+    return match_index.survivors()
+
+def read_log(path, frame_offset=0):
+    df = pd.read_csv(path)
+    df['Frame'] = df['Frame'] + frame_offset
+    return df
+
+
+def run_tournament(config, timestamp, headless=False, workers=None, simulations_dir="simulations"):
+    group_size = config['tournament']['group_size']
+    final_size = config['tournament']['final_size']
+    roster = [str(pid) for pid in load_roster_ids(config['images']['path'], config['images']['local'])]
+
+    work_dir = os.path.join(simulations_dir, f"tournament_{timestamp}")
+    os.makedirs(work_dir, exist_ok=True)
+
+    # Group rounds
+    players = roster
+    round_logs = []
+    frame_offset = 0
+    round_number = 1
+    while len(players) > final_size:
+        groups = split_groups(players, group_size)
+        # Enough players per group to fill the final, at least the winner
+        advance = max(1, final_size // len(groups))
+        print(f"Round {round_number}: {len(players)} players in {len(groups)} groups, {advance} go through per group")
+
+        names = [f"round{round_number}_group{i}" for i in range(len(groups))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(play_group, group, config, name, work_dir, advance, random.randrange(2 ** 32))
+                for group, name in zip(groups, names)
+            ]
+            players = [pid for future in futures for pid in future.result()]
+
+        # Groups play at the same time: merge their kills by frame
+        round_log = pd.concat(
+            [read_log(os.path.join(work_dir, f"{name}_collision_log.csv"), frame_offset) for name in names],
+            ignore_index=True,
+        ).sort_values('Frame', kind='stable')
+        round_logs.append(round_log)
+        frame_offset = int(round_log['Frame'].max()) + 1 if not round_log.empty else frame_offset
+        round_number += 1
+
+    # Final: a normal match with only the players left, drawn at full detail
+    print(f"Final: {len(players)} players")
+    run_match(config, players, {'headless': headless, 'timestamp': timestamp})
+
+    # One log for the whole tournament, rounds in order
+    log_path = os.path.join(simulations_dir, f"{timestamp}_collision_log.csv")
+    full_log = pd.concat(round_logs + [read_log(log_path, frame_offset)], ignore_index=True)
+    tmp_path = log_path + ".tmp"
+    full_log.to_csv(tmp_path, index=False, lineterminator='\n')
+    os.replace(tmp_path, log_path)
+
+    # Rankings over the whole roster, replacing the final-only ones
+    match_index = MatchIndex(roster)
+    for row in full_log[full_log['Killed']].itertuples(index=False):
+        match_index.record_elimination(row.Particle, row.Opponent, row.Frame)
+    match_index.write_detailed_rankings(timestamp, simulations_dir)
+
+    shutil.rmtree(work_dir)
+    print(f"Campeão: {match_index.winner()}")
+    return match_index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play the day's match as a bracket tournament.")
+    parser.add_argument('--headless', action='store_true', help="Do not render the final either.")
+    parser.add_argument('--workers', type=int, default=None, help="Group matches played at once (default: one per core).")
+    args = parser.parse_args()
+
+    run_tournament(load_config('config.yaml'), datetime.datetime.now().strftime("%Y%m%d_%H%M%S"),
+                   headless=args.headless, workers=args.workers)
@@ -0,0 +1,175 @@
+import os
+import json
+import struct
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pygame
+import yaml
+
+from utils.run_metrics import report, file_size
+
+CACHE_PATH = "data/avatar_cache.npy"
+INDEX_PATH = "data/avatar_cache.json"
+IMG_DIR = "followers_info/img"
+CONFIG_PATH = "config.yaml"
+SPRITE_SCALE = 2  # particles are drawn radius * 2 wide (Particle.draw)
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _circle_alpha(size):
+    # Same disk as circular_mask: centre size // 2, radius size // 2
+    yy, xx = np.mgrid[0:size, 0:size]
+    center = size // 2
+    return ((xx - center) ** 2 + (yy - center) ** 2 <= center ** 2).astype(np.uint8)
+
+# Worker: decode, resize and mask one avatar. Runs without a display, so the
+# image is blitted on a 32-bit surface instead of convert_alpha().
+def _prepare_avatar(path, size):
+    image = pygame.image.load(path)
+    surface = pygame.Surface(image.get_size(), pygame.SRCALPHA, 32)
+    surface.blit(image, (0, 0))
+    surface = pygame.transform.smoothscale(surface, (size, size))
+    rgba = np.frombuffer(pygame.image.tobytes(surface, 'RGBA'), dtype=np.uint8).reshape(size, size, 4).copy()
+    mask = _circle_alpha(size)
+    rgba *= mask[:, :, None]
+    return rgba
+
+
+def _png_side(path):
+    # Longest side of a PNG, from its header (None when it is not a PNG)
+    with open(path, 'rb') as f:
+        head = f.read(24)
+    if len(head) < 24 or not head.startswith(PNG_SIGNATURE):
+        return None
+    return max(struct.unpack('>II', head[16:24]))
+
+def get_cache_size(config_path=CONFIG_PATH, source_side=None):
+    # Side of the largest particle ever drawn, so cached avatars are only
+    # scaled down, but never more than the sources have. The winner screen
+    # draws bigger and reads its one avatar from the PNG (helpers.display_winner).
+    with open(config_path, 'r') as f:
+        max_radius = yaml.safe_load(f)['particles']['max_radius']
+    size = SPRITE_SCALE * max_radius
+    return min(size, source_side) if source_side else size
+
+
+def _load_index(index_path):
+    if os.path.exists(index_path):
+        with open(index_path, 'r') as f:
+            return json.load(f)
+    return {"size": None, "entries": {}}
+
+
+def build_cache(img_dir=IMG_DIR, cache_path=CACHE_PATH, index_path=INDEX_PATH, size=None, workers=None):
+    """
+    Decode, mask and resize every avatar in img_dir into one (N, size, size, 4)
+    uint8 .npy file, keyed by username and source hash. Avatars whose PNG did
+    not change are copied over from the previous cache instead of decoded.
+    size defaults to get_cache_size(), capped at the largest source.
+    """
+    usernames = sorted(f[:-4] for f in os.listdir(img_dir) if f.endswith('.png'))
+    if not usernames:
+        print(f"No avatars found in '{img_dir}'.")
+        return None
+    if not size:
+        sides = [_png_side(os.path.join(img_dir, f"{username}.png")) for username in usernames]
+        size = get_cache_size(source_side=max((side for side in sides if side), default=None))
+
+    index = _load_index(index_path)
+    old_entries = index["entries"] if index["size"] == size and os.path.exists(cache_path) else {}
+    old_cache = np.load(cache_path, mmap_mode='r') if old_entries else None
+    old_by_hash = {entry["sha1"]: entry["row"] for entry in old_entries.values()}
+    entries = {}
+    reused = {}
+    to_decode = []
+    for row, username in enumerate(usernames):
+        path = os.path.join(img_dir, f"{username}.png")
+        stat = os.stat(path)
+        old = old_entries.get(username)
+        if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+            sha1 = old["sha1"]
+        else:
+            sha1 = _file_hash(path)
+        entries[username] = {"row": row, "sha1": sha1, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if sha1 in old_by_hash:
+            reused[row] = old_by_hash[sha1]
+        else:
+            to_decode.append((row, path))
+
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    tmp_path = cache_path + ".tmp.npy"
+    cache = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=(len(usernames), size, size, 4))
+    for row, old_row in reused.items():
+        cache[row] = old_cache[old_row]
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {row: pool.submit(_prepare_avatar, path, size) for row, path in to_decode}
+        for row, future in futures.items():
+            try:
+                cache[row] = future.result()
+            except Exception as e:
+                print(f"Error preparing avatar {usernames[row]}: {e}")
+                failed.append(usernames[row])
+
+    cache.flush()
+    del cache, old_cache
+    os.replace(tmp_path, cache_path)
+    for username in failed:
+        entries.pop(username)
+    with open(index_path, 'w') as f:
+        json.dump({"size": size, "entries": entries}, f)
+
+    print(f"Avatar cache: {len(usernames)} avatars ({len(reused)} reused, {len(to_decode) - len(failed)} decoded, {len(failed)} failed)")
+    return cache_path
+
+
+def load_cached_avatars(usernames, img_dir=IMG_DIR, cache_path=CACHE_PATH, index_path=INDEX_PATH):
+    """
+    Return {username: Surface} for every avatar in the cache whose PNG has not
+    changed since it was cached. Needs a display mode (for convert_alpha).
+    """
+    if not os.path.exists(cache_path) or not os.path.exists(index_path):
+        return {}
+    index = _load_index(index_path)
+    size = index["size"]
+
+    rows = {}
+    for username in usernames:
+        entry = index["entries"].get(username)
+        if entry is None:
+            continue
+        try:
+            stat = os.stat(os.path.join(img_dir, f"{username}.png"))
+        except OSError:
+            continue
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            rows[username] = entry["row"]
+    if not rows:
+        return {}
+
+    # Rows in file order, each surface made straight from the memory map
+    cache = np.load(cache_path, mmap_mode='r')
+    return {
+        username: pygame.image.frombytes(cache[row].tobytes(), (size, size), 'RGBA').convert_alpha()
+        for username, row in sorted(rows.items(), key=lambda item: item[1])
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess follower avatars into one memory-mappable cache.")
+    parser.add_argument('--img-dir', default=IMG_DIR, help="Directory with <username>.png avatars.")
+    parser.add_argument('--size', type=int, default=None,
+                        help="Side of the cached sprites in pixels (default: the largest particle's, from config.yaml).")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core).")
+    args = parser.parse_args()
+    cache_path = build_cache(img_dir=args.img_dir, size=args.size, workers=args.workers)
+    if cache_path is not None:
+        report(bytes_written=file_size(cache_path, INDEX_PATH))
@@ -0,0 +1,121 @@
+import os
+import json
+import math
+import glob
+import random
+import numpy as np
+
+from particle import Particle
+
+# Particle fields stored as integers / possibly infinite counters
+INT_FIELDS = ('_seg_steps', 'radius')
+COUNTER_FIELDS = ('_seg_uncapped',)
+
+
+def get_checkpoint_path(checkpoint_dir, timestamp):
+    return os.path.join(checkpoint_dir, f"{timestamp}_checkpoint.npz")
+
+def find_latest_checkpoint(checkpoint_dir):
+    # Checkpoints are named after the match timestamp, so the name sorts by date
+    paths = sorted(glob.glob(os.path.join(checkpoint_dir, "*_checkpoint.npz")))
+    return paths[-1] if paths else None
+
+def get_log_path(timestamp):
+    return f'simulations/{timestamp}_collision_log.csv'
+
+
+# Save the full match state: every particle of the roster (alive mask, HP and
+# motion of the survivors), RNG state, physics clock and how far the collision
+# log had been written. The file is replaced atomically.
+def save_checkpoint(path, roster_ids, particles, meta):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    alive_ids = [str(p.id) for p in particles if p.alive]
+    states = [p.get_state() for p in particles if p.alive]
+    arrays = {
+        'roster': np.array([str(pid) for pid in roster_ids]),
+        'ids': np.array(alive_ids),
+        'alive': np.isin(np.array([str(pid) for pid in roster_ids]), np.array(alive_ids)),
+    }
+    for field in Particle.STATE_FIELDS:
+        arrays[field] = np.array([s[field] for s in states], dtype=float).reshape(len(states), -1)
+
+    log_path = get_log_path(meta['timestamp'])
+    meta = dict(meta, log_size=os.path.getsize(log_path) if os.path.exists(log_path) else 0)
+
+    # RNG states as plain arrays and JSON, so loading never unpickles: the
+    # Mersenne Twister words plus position of each generator, and the rest
+    # (version, cached gaussian) in meta
+    version, words, gauss_next = random.getstate()
+    _, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    arrays['random_state'] = np.array(words, dtype=np.uint32)
+    arrays['numpy_state'] = np.append(keys, pos).astype(np.uint32)
+    meta['rng'] = {'version': version, 'gauss_next': gauss_next,
+                   'has_gauss': has_gauss, 'cached_gaussian': cached_gaussian}
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    with np.load(path) as data:
+        meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+        rng = meta.pop('rng')
+        numpy_state = data['numpy_state']
+        rng_state = (
+            (rng['version'], tuple(int(w) for w in data['random_state']), rng['gauss_next']),
+            ('MT19937', numpy_state[:-1].copy(), int(numpy_state[-1]), rng['has_gauss'], rng['cached_gaussian']),
+        )
+        ids = [str(pid) for pid in data['ids']]
+        states = {}
+        for i, pid in enumerate(ids):
+            state = {}
+            for field in Particle.STATE_FIELDS:
+                value = data[field][i]
+                if value.shape == (1,):
+                    value = value[0]
+                    if field in INT_FIELDS:
+                        value = int(value)
+                    elif field in COUNTER_FIELDS:
+                        value = value if math.isinf(value) else int(value)
+                    elif field == 'alive':
+                        value = bool(value)
+                    else:
+                        value = float(value)
+                else:
+                    value = value.copy()
+                state[field] = value
+            states[pid] = state
+    return states, meta, rng_state
+
+# Put freshly loaded particles back in the checkpointed state. Particles that
+# were already eliminated are dropped, RNG state is restored and the collision
+# log is cut back to what had been written at checkpoint time.
+def resume_from_checkpoint(path, particles):
+    states, meta, rng_state = load_checkpoint(path)
+
+    resumed = []
+    for p in particles:
+        state = states.get(str(p.id))
+        if state is not None:
+            p.set_state(state)
+            resumed.append(p)
+
+    missing = set(states) - {str(p.id) for p in resumed}
+    if missing:
+        raise KeyError(f"Checkpoint has particles that are not in the roster: {sorted(missing)[:5]}")
+
+    random.setstate(rng_state[0])
+    np.random.set_state(rng_state[1])
+
+    log_path = get_log_path(meta['timestamp'])
+    if os.path.exists(log_path):
+        if meta['log_size'] > 0:
+            with open(log_path, 'r+b') as f:
+                f.truncate(meta['log_size'])
+        else:
+            os.remove(log_path)
+
+    return resumed, meta
@@ -0,0 +1,206 @@
+import subprocess
+import numpy as np
+import pygame
+import imageio_ffmpeg
+
+BAR_HEIGHT = 8
+BAR_OFFSET = 14  # Gap between the top of the avatar and the HP bar
+BAR_BG = (40, 40, 40)
+BAR_BORDER = (220, 220, 220)
+PIXEL = np.dtype((np.void, 3))
+
+
+# What a frame needs from the match, copied out so the physics can move on
+# while the frame is drawn
+def take_snapshot(particles, radius, alive_count):
+    alive = [p for p in particles if p.alive]
+    return {
+        'ids': [p.id for p in alive],
+        'pos': np.array([p.pos for p in alive]).reshape(-1, 2),
+        'hp_ratio': np.clip(np.array([p.hp / p.max_hp for p in alive]), 0, 1),
+        'radius': radius,
+        'alive_count': alive_count,
+    }
+
+
+# Draws match frames straight into one preallocated (H, W, 3) uint8 buffer,
+# the layout the video encoder reads, instead of blitting on a pygame surface
+# and copying it out. Avatars are scaled once per radius (not once per frame)
+# and all of them are alpha-blended in a single gather/blend/scatter.
+# Overlapping avatars are blended against the background they share, which
+# only shows during the few frames two players touch.
+class FrameCompositor:
+    def __init__(self, width, height, bg_color, font, images=None):
+        self.width = width
+        self.height = height
+        self.font = font
+        # Avatar of every player, by id
+        self.images = dict(images or {})
+        self._set_target(self.new_frame())
+        self._background = self.new_frame()
+        self._background[:] = bg_color
+        self._sprite_radius = None
+        self._slot = {}
+        self._premultiplied = None
+        self._inv_alpha = None
+        self._texts = {}
+        self._rings = {}
+
+    def new_frame(self):
+        return np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+    def _set_target(self, frame):
+        self.frame = frame
+        # Same buffer seen as one row per pixel, and as one 3-byte item per
+        # pixel (moves whole pixels at once), for gathers by pixel index
+        self._pixels = frame.reshape(-1, 3)
+        self._pixel_items = frame.reshape(-1).view(PIXEL)
+
+    # ---- sprites ---- #
+    def _prepare_sprites(self, ids, radius):
+        # Colour * alpha and 255 - alpha of every avatar at this radius, so a
+        # frame only has one multiply-add per pixel left to do
+        diameter = radius * 2
+        self._slot = {pid: i for i, pid in enumerate(ids)}
+        rgb = np.empty((len(ids), diameter, diameter, 3), dtype=np.uint16)
+        alpha = np.empty((len(ids), diameter, diameter, 1), dtype=np.uint16)
+        for i, pid in enumerate(ids):
+            scaled = pygame.transform.smoothscale(self.images[pid], (diameter, diameter))
+            # surfarray is (x, y): swap to (y, x) like the frame
+            rgb[i] = pygame.surfarray.pixels3d(scaled).swapaxes(0, 1)
+            alpha[i, :, :, 0] = pygame.surfarray.pixels_alpha(scaled).swapaxes(0, 1)
+        self._premultiplied = rgb * alpha
+        self._inv_alpha = 255 - alpha
+        self._sprite_radius = radius
+
+    def _draw_sprites(self, ids, pos, radius):
+        if radius != self._sprite_radius or any(pid not in self._slot for pid in ids):
+            self._prepare_sprites(ids, radius)
+        diameter = radius * 2
+        slots = np.array([self._slot[pid] for pid in ids])
+        centers = pos.astype(int)
+        # Same placement as Particle.draw, kept inside the frame
+        x0 = np.clip(centers[:, 0] - radius, 0, self.width - diameter)
+        y0 = np.clip(centers[:, 1] - radius, 0, self.height - diameter)
+
+        offsets = np.arange(diameter)
+        index = (y0[:, None, None] + offsets[None, :, None]) * self.width + (x0[:, None, None] + offsets[None, None, :])
+        under = np.take(self._pixels, index, axis=0).astype(np.uint16)
+
+        # (rgb * a + under * (255 - a)) / 255, rounded, without a division
+        blended = under
+        blended *= self._inv_alpha[slots]
+        blended += self._premultiplied[slots]
+        blended += 128
+        blended += blended >> 8
+        blended >>= 8
+        self._pixel_items[index] = blended.astype(np.uint8).reshape(-1).view(PIXEL).reshape(index.shape)
+
+    # ---- HP bars ---- #
+    def _draw_hp_bars(self, pos, hp_ratio, radius):
+        bar_width = radius * 2
+        centers = pos.astype(int)
+        x0 = centers[:, 0] - radius
+        y0 = centers[:, 1] - radius - BAR_OFFSET
+
+        # Same red-to-green gradient as Particle.draw, one row for all bars
+        grad = np.arange(bar_width) / bar_width
+        gradient = np.stack([(255 * (1 - grad)).astype(int), (255 * grad).astype(int), np.full(bar_width, 40)], axis=1)
+
+        cols = np.arange(bar_width)
+        rows = np.arange(BAR_HEIGHT)
+        filled = cols[None, :] < (hp_ratio * bar_width).astype(int)[:, None]
+        colors = np.where(filled[:, :, None], gradient[None], np.array(BAR_BG))
+        bars = np.broadcast_to(colors[:, None, :, :], (len(pos), BAR_HEIGHT, bar_width, 3)).copy()
+        # Thin border
+        bars[:, [0, -1], :, :] = BAR_BORDER
+        bars[:, :, [0, -1], :] = BAR_BORDER
+
+        ys = y0[:, None, None] + rows[None, :, None]
+        xs = x0[:, None, None] + cols[None, None, :]
+        inside = (ys >= 0) & (ys < self.height) & (xs >= 0) & (xs < self.width)
+        index = ys * self.width + xs
+        self._pixels[index[inside]] = bars[inside]
+
+    # ---- marks ---- #
+    def draw_ring(self, center, radius, color, width=3):
+        # Circle outline, e.g. around the player a highlight is about
+        key = (radius, width)
+        if key not in self._rings:
+            d = np.arange(-radius - width, radius + width + 1)
+            dy, dx = np.meshgrid(d, d, indexing='ij')
+            on_ring = np.abs(np.hypot(dx, dy) - radius) <= width / 2
+            self._rings[key] = (dy[on_ring], dx[on_ring])
+        dy, dx = self._rings[key]
+        ys = dy + int(center[1])
+        xs = dx + int(center[0])
+        inside = (ys >= 0) & (ys < self.height) & (xs >= 0) & (xs < self.width)
+        self.frame[ys[inside], xs[inside]] = color
+
+    # ---- text ---- #
+    def draw_text(self, text, pos, color=(255, 255, 255)):
+        key = (text, color)
+        if key not in self._texts:
+            surface = self.font.render(text, True, color)
+            rgb = pygame.surfarray.array3d(surface).swapaxes(0, 1).astype(np.uint16)
+            alpha = pygame.surfarray.array_alpha(surface).swapaxes(0, 1)[:, :, None].astype(np.uint16)
+            # HUD strings repeat a lot, keep only the recent ones
+            if len(self._texts) > 256:
+                self._texts.clear()
+            self._texts[key] = (rgb, alpha)
+        rgb, alpha = self._texts[key]
+        x, y = pos
+        h = min(rgb.shape[0], self.height - y)
+        w = min(rgb.shape[1], self.width - x)
+        region = self.frame[y:y + h, x:x + w]
+        region[:] = (rgb[:h, :w] * alpha[:h, :w] + region * (255 - alpha[:h, :w]) + 127) // 255
+
+    # ---- frames ---- #
+    def compose(self, particles, radius, alive_count):
+        for p in particles:
+            self.images.setdefault(p.id, p.image)
+        return self.compose_snapshot(take_snapshot(particles, radius, alive_count))
+
+    def compose_snapshot(self, snapshot, frame=None):
+        # Draw into `frame` (default: the compositor's own buffer)
+        self._set_target(self.frame if frame is None else frame)
+        np.copyto(self.frame, self._background)
+        if snapshot['ids']:
+            self._draw_sprites(snapshot['ids'], snapshot['pos'], snapshot['radius'])
+            self._draw_hp_bars(snapshot['pos'], snapshot['hp_ratio'], snapshot['radius'])
+        self.draw_text(f"Vivos: {snapshot['alive_count']}", (30, 30))
+        if snapshot.get('caption'):
+            self.draw_text(snapshot['caption'], (30, 70), (255, 215, 0))
+        return self.frame
+
+    def compose_with_surface(self, draw, frame=None):
+        # For one-off screens drawn with pygame (the winner screen): draw on a
+        # surface holding the frame and copy it back
+        self._set_target(self.frame if frame is None else frame)
+        surface = pygame.surfarray.make_surface(self.frame.swapaxes(0, 1))
+        draw(surface)
+        self.frame[:] = pygame.surfarray.pixels3d(surface).swapaxes(0, 1)
+        return self.frame
+
+
+# Pipes raw RGB frames to ffmpeg. write() hands over the frame's own buffer,
+# so nothing is copied on the Python side.
+class VideoEncoder:
+    def __init__(self, path, width, height, fps, codec='libx264', preset='medium'):
+        self.proc = subprocess.Popen([
+            imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-vcodec', 'rawvideo', '-s', f'{width}x{height}', '-pix_fmt', 'rgb24', '-r', str(fps),
+            '-i', '-', '-an', '-vcodec', codec, '-preset', preset, '-pix_fmt', 'yuv420p', path,
+        ], stdin=subprocess.PIPE)
+        self.frames = 0
+
+    def write(self, frame, repeat=1):
+        data = memoryview(np.ascontiguousarray(frame)).cast('B')
+        for _ in range(repeat):
+            self.proc.stdin.write(data)
+        self.frames += repeat
+
+    def close(self):
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.proc.returncode}")
@@ -0,0 +1,274 @@
+import os
+import re
+import csv
+import sqlite3
+from datetime import datetime
+from urllib.parse import urlsplit
+
+REGISTRY_PATH = "data/followers.db"
+
+# IGExportTool columns (matched case-insensitively, with or without spaces/underscores)
+USER_ID_COLUMNS = ['User ID', 'user_id', 'pk', 'id']
+USERNAME_COLUMNS = ['Username', 'user', 'login', 'handle']
+FULL_NAME_COLUMNS = ['Full Name', 'full_name', 'name']
+AVATAR_COLUMNS = ['Avatar', 'Avatar URL', 'avatar_url', 'profile_pic_url', 'profile_image_url', 'image_url']
+
+BATCH_SIZE = 5000
+
+
+# ========= DB SETUP ========= #
+def init_registry(path=REGISTRY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+
+    # One row per Instagram account, whatever its username or avatar URL is today
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS followers (
+        user_id TEXT PRIMARY KEY,
+        username TEXT,
+        full_name TEXT,
+        avatar_url TEXT,
+        avatar_key TEXT,
+        first_seen TEXT,
+        last_seen TEXT,
+        active INTEGER
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_followers_active ON followers (active, first_seen)")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS exports (
+        file TEXT PRIMARY KEY,
+        size INTEGER,
+        mtime REAL,
+        exported_at TEXT,
+        num_rows INTEGER,
+        ingested_at TEXT
+    )
+    """)
+
+    # joined / left / avatar_changed / renamed, per export
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS follower_events (
+        exported_at TEXT,
+        user_id TEXT,
+        event TEXT,
+        old_value TEXT,
+        new_value TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_follower_events_user ON follower_events (user_id)")
+
+    conn.commit()
+    return conn
+
+
+# ========= CSV HELPERS ========= #
+def _normalize(col_name):
+    return str(col_name).strip().lower().replace(" ", "").replace("_", "")
+
+def _resolve_column(header, possible_names):
+    normalized_to_index = {}
+    for idx, col in enumerate(header):
+        normalized_to_index.setdefault(_normalize(col), idx)
+    for name in possible_names:
+        idx = normalized_to_index.get(_normalize(name))
+        if idx is not None:
+            return idx
+    return None
+
+def _get_export_date(csv_path):
+    # IGExportTool_All2025-09-26-10-57.csv -> 2025-09-26T10:57:00
+    match = re.search(r'(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})', os.path.basename(csv_path))
+    if match:
+        return datetime(*map(int, match.groups())).isoformat()
+    return datetime.fromtimestamp(os.path.getmtime(csv_path)).isoformat(timespec='seconds')
+
+def avatar_key(url):
+    # The CDN signs avatar URLs with query parameters that change on every
+    # export; the file name identifies the picture itself
+    if not url:
+        return None
+    return os.path.basename(urlsplit(url).path) or url
+
+def _iter_export_rows(csv_path):
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        id_idx = [i for i in (_resolve_column(header, [c]) for c in USER_ID_COLUMNS) if i is not None]
+        username_idx = _resolve_column(header, USERNAME_COLUMNS)
+        full_name_idx = _resolve_column(header, FULL_NAME_COLUMNS)
+        avatar_idx = _resolve_column(header, AVATAR_COLUMNS)
+        if username_idx is None:
+            raise KeyError(f"Export '{csv_path}' has no username column. Found: {header}")
+
+        def get(row, idx):
+            if idx is None or idx >= len(row):
+                return None
+            value = row[idx].strip()
+            return value or None
+
+        for row in reader:
+            username = get(row, username_idx)
+            if not username:
+                continue
+            # "User ID" is empty in some exports; fall back to "id", then the username
+            user_id = next((get(row, i) for i in id_idx if get(row, i)), None) or f"username:{username}"
+            yield user_id, username, get(row, full_name_idx), get(row, avatar_idx)
+
+
+# ========= INGEST ========= #
+def ingest_export(conn, csv_path):
+    """
+    Stream one export into the registry and return what changed since the
+    previous export: joined, left, avatar_changed and renamed followers.
+    """
+    exported_at = _get_export_date(csv_path)
+    cur = conn.cursor()
+    cur.execute("DROP TABLE IF EXISTS temp.seen")
+    cur.execute("CREATE TEMP TABLE seen (user_id TEXT PRIMARY KEY)")
+
+    diff = {"joined": [], "left": [], "avatar_changed": [], "renamed": []}
+    events = []
+    num_rows = 0
+
+    def flush(batch):
+        ids = [r[0] for r in batch]
+        known = {}
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            cur.execute(
+                f"SELECT user_id, username, avatar_key, active FROM followers WHERE user_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            known.update({r[0]: r[1:] for r in cur.fetchall()})
+
+        for user_id, username, full_name, avatar_url in batch:
+            key = avatar_key(avatar_url)
+            previous = known.get(user_id)
+            if previous is None or not previous[2]:
+                diff["joined"].append(username)
+                events.append((exported_at, user_id, "joined", None, username))
+            else:
+                old_username, old_key, _ = previous
+                if old_username != username:
+                    diff["renamed"].append((old_username, username))
+                    events.append((exported_at, user_id, "renamed", old_username, username))
+                if key and old_key and old_key != key:
+                    diff["avatar_changed"].append(username)
+                    events.append((exported_at, user_id, "avatar_changed", old_key, key))
+
+        cur.executemany("INSERT OR IGNORE INTO seen (user_id) VALUES (?)", [(r[0],) for r in batch])
+        cur.executemany("""
+            INSERT INTO followers (user_id, username, full_name, avatar_url, avatar_key, first_seen, last_seen, active)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username=excluded.username,
+                full_name=excluded.full_name,
+                avatar_url=COALESCE(excluded.avatar_url, followers.avatar_url),
+                avatar_key=COALESCE(excluded.avatar_key, followers.avatar_key),
+                last_seen=excluded.last_seen,
+                active=1
+        """, [
+            (user_id, username, full_name, avatar_url, avatar_key(avatar_url), exported_at, exported_at)
+            for user_id, username, full_name, avatar_url in batch
+        ])
+
+    batch = []
+    seen_in_file = set()
+    for row in _iter_export_rows(csv_path):
+        num_rows += 1
+        # The same account twice in one export counts once
+        if row[0] in seen_in_file:
+            continue
+        seen_in_file.add(row[0])
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    # Everyone active who is not in this export has left
+    cur.execute("""
+        SELECT user_id, username FROM followers
+        WHERE active = 1 AND user_id NOT IN (SELECT user_id FROM temp.seen)
+    """)
+    left = cur.fetchall()
+    diff["left"] = [username for _, username in left]
+    events.extend((exported_at, user_id, "left", username, None) for user_id, username in left)
+    cur.executemany("UPDATE followers SET active = 0 WHERE user_id = ?", [(user_id,) for user_id, _ in left])
+
+    cur.executemany(
+        "INSERT INTO follower_events (exported_at, user_id, event, old_value, new_value) VALUES (?, ?, ?, ?, ?)",
+        events,
+    )
+    stat = os.stat(csv_path)
+    cur.execute(
+        "INSERT OR REPLACE INTO exports (file, size, mtime, exported_at, num_rows, ingested_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (os.path.basename(csv_path), stat.st_size, stat.st_mtime, exported_at, num_rows,
+         datetime.now().isoformat(timespec='seconds')),
+    )
+    cur.execute("DROP TABLE temp.seen")
+    conn.commit()
+    return diff
+
+def ingest_new_exports(conn, export_dir):
+    """
+    Ingest every export in export_dir that is not in the registry yet (or that
+    changed on disk), oldest first. Returns {file: diff}.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT file, size, mtime FROM exports")
+    known = {file: (size, mtime) for file, size, mtime in cur.fetchall()}
+
+    new_files = []
+    for filename in os.listdir(export_dir):
+        if not filename.endswith('.csv'):
+            continue
+        path = os.path.join(export_dir, filename)
+        stat = os.stat(path)
+        if known.get(filename) != (stat.st_size, stat.st_mtime):
+            new_files.append(path)
+
+    # Diffs only make sense in export order
+    new_files.sort(key=_get_export_date)
+    return {os.path.basename(path): ingest_export(conn, path) for path in new_files}
+
+
+# ========= ROSTER ========= #
+def get_roster(conn):
+    # Current followers, one per account, as (username, avatar_url)
+    cur = conn.cursor()
+    cur.execute("SELECT username, avatar_url FROM followers WHERE active = 1 ORDER BY first_seen, rowid")
+    return cur.fetchall()
+
+def sync_roster(export_dir, img_dir=None, path=REGISTRY_PATH):
+    """
+    Bring the registry up to date with export_dir and return the roster.
+    Cached avatars of followers who changed picture are dropped so they are
+    downloaded again; renamed followers keep theirs.
+    """
+    conn = init_registry(path)
+    try:
+        diffs = ingest_new_exports(conn, export_dir)
+        if img_dir:
+            for diff in diffs.values():
+                for old_username, new_username in diff["renamed"]:
+                    old_path = os.path.join(img_dir, f"{old_username}.png")
+                    new_path = os.path.join(img_dir, f"{new_username}.png")
+                    if os.path.exists(old_path) and not os.path.exists(new_path):
+                        os.replace(old_path, new_path)
+                for username in diff["avatar_changed"]:
+                    cached = os.path.join(img_dir, f"{username}.png")
+                    if os.path.exists(cached):
+                        os.remove(cached)
+        for filename, diff in diffs.items():
+            print(f"{filename}: +{len(diff['joined'])} -{len(diff['left'])} "
+                  f"{len(diff['avatar_changed'])} new avatars, {len(diff['renamed'])} renamed")
+        return get_roster(conn)
+    finally:
+        conn.close()
@@ -7,6 +7,8 @@ import pandas as pd
 import random
 
 from particle import Particle
+from utils.follower_registry import sync_roster
+from utils.avatar_cache import load_cached_avatars
 import requests
 from io import BytesIO
 from tqdm import tqdm
@@ -67,79 +69,110 @@ def assign_position(radius, width, height, num_particles):
 
         return positions
 
-# Load particles from a CSV file
-def load_particles(min_radius, max_radius, max_hp, max_speed, acc_magnitude, width, height, image_path, local_images):
+# Read (username, avatar URL) pairs from a single followers CSV
+def read_roster_csv(csv_path):
+    df = pd.read_csv(csv_path)
+
+    # Resolve column names flexivelmente (case-insensitive, com/sem espaços/sublinhados)
+    def normalize(col_name):
+        return str(col_name).strip().lower().replace(" ", "").replace("_", "")
+
+    normalized_to_original = {normalize(c): c for c in df.columns}
+
+    def resolve_column(possible_names):
+        for name in possible_names:
+            key = normalize(name)
+            if key in normalized_to_original:
+                return normalized_to_original[key]
+        return None
+
+    username_col = resolve_column([
+        'Username', 'user', 'login', 'handle', 'profile', 'name'
+    ])
+    avatar_col = resolve_column([
+        'Avatar URL', 'AvatarURL', 'avatar_url', 'avatar', 'image_url', 'image', 'url', 'profile_pic_url', 'profile_image_url'
+    ])
+
+    if username_col is None or avatar_col is None:
+        raise KeyError(
+            f"CSV não contém colunas esperadas. Encontradas: {list(df.columns)}. "
+            "Precisamos de uma coluna de username (ex.: Username) e uma de avatar (ex.: Avatar URL / avatar_url / profile_pic_url)."
+        )
+
+    return [
+        (str(username) if pd.notna(username) else None, str(avatar) if pd.notna(avatar) else None)
+        for username, avatar in zip(df[username_col], df[avatar_col])
+    ]
+
+# Player ids only (no avatars), for engines that never draw
+def load_roster_ids(image_path, local_images, players=None):
+    if local_images:
+        ids = list(range(len([f for f in os.listdir(image_path) if f.endswith('.png')])))
+    else:
+        if os.path.isdir(image_path):
+            roster = sync_roster(image_path, img_dir="followers_info/img")
+        else:
+            roster = read_roster_csv(image_path)
+        ids = [username for username, _ in roster if username and username.strip()]
+    if players is not None:
+        ids = [pid for pid in ids if str(pid) in players]
+    return ids
+
+# Player ids listed one per line in a text file
+def read_players_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+# Load particles from a CSV file (only the given player ids, if any)
+def load_particles(min_radius, max_radius, max_hp, max_speed, acc_magnitude, width, height, image_path, local_images, players=None):
+    ids, particle_images = load_avatars(image_path, local_images, max_radius, players)
+    return create_particles(ids, particle_images, min_radius, max_radius, max_hp, max_speed, acc_magnitude, width, height)
+
+# Player ids and their masked avatars, in roster order (only the given player ids, if any)
+def load_avatars(image_path, local_images, max_radius, players=None):
 
     if local_images:
         # Read how many particle images are available
-        num_particles = len([f for f in os.listdir(image_path) if f.endswith('.png')])
+        ids = load_roster_ids(image_path, local_images, players)
             
-        if num_particles == 0:
+        if len(ids) == 0:
             raise ValueError("No particle images found in the 'img' directory.")
 
         # Load and mask particle images
-        particle_images = [circular_mask(pygame.image.load(f'{image_path}/particle_{i}.png').convert_alpha()) for i in range(num_particles)]
-
-        radius = get_dynamic_radius(particle_images, width, height, min_radius, max_radius, change_radius=False)
-
-        positions = assign_position(radius, width, height, num_particles)
-
-        # Create particles
-        particles = [Particle(i, particle_images[i], radius, max_hp, max_speed, acc_magnitude, width, height, positions[i]) for i in range(num_particles)]
+        particle_images = [circular_mask(pygame.image.load(f'{image_path}/particle_{i}.png').convert_alpha()) for i in ids]
     
     else:
-        # Ensure image_path is a CSV file, not a directory
         if os.path.isdir(image_path):
-            # Find the first CSV file in the directory
-            csv_files = [f for f in os.listdir(image_path) if f.endswith('.csv')]
-            if not csv_files:
-                raise FileNotFoundError(f"No CSV file found in directory '{image_path}'.")
-            csv_path = os.path.join(image_path, csv_files[0])
+            # Directory of follower exports: the registry merges them into one
+            # entry per Instagram account and only reads exports it has not seen
+            roster = sync_roster(image_path, img_dir="followers_info/img")
+            if not roster:
+                raise FileNotFoundError(f"No followers found in the exports in '{image_path}'.")
         else:
-            csv_path = image_path
+            roster = read_roster_csv(image_path)
+        if players is not None:
+            roster = [(username, avatar) for username, avatar in roster if username in players]
 
-        df = pd.read_csv(csv_path)
         particle_images = []
         usernames = []
 
-        # Resolve column names flexivelmente (case-insensitive, com/sem espaços/sublinhados)
-        def normalize(col_name):
-            return str(col_name).strip().lower().replace(" ", "").replace("_", "")
-
-        normalized_to_original = {normalize(c): c for c in df.columns}
-
-        def resolve_column(possible_names):
-            for name in possible_names:
-                key = normalize(name)
-                if key in normalized_to_original:
-                    return normalized_to_original[key]
-            return None
-
-        username_col = resolve_column([
-            'Username', 'user', 'login', 'handle', 'profile', 'name'
-        ])
-        avatar_col = resolve_column([
-            'Avatar URL', 'AvatarURL', 'avatar_url', 'avatar', 'image_url', 'image', 'url', 'profile_pic_url', 'profile_image_url'
-        ])
-
-        if username_col is None or avatar_col is None:
-            raise KeyError(
-                f"CSV não contém colunas esperadas. Encontradas: {list(df.columns)}. "
-                "Precisamos de uma coluna de username (ex.: Username) e uma de avatar (ex.: Avatar URL / avatar_url / profile_pic_url)."
-            )
-        
         # Ensure the img directory exists
         os.makedirs("followers_info/img", exist_ok=True)
+
+        # Avatars preprocessed by utils/avatar_cache.py come in one bulk read
+        cached_avatars = load_cached_avatars([username for username, _ in roster if username])
         
-        for _, row in tqdm(df.iterrows(), total=len(df), desc="Loading avatars"):
-            username = str(row[username_col]) if pd.notna(row[username_col]) else None
-            img_path = str(row[avatar_col]) if pd.notna(row[avatar_col]) else None
-            
+        for username, img_path in tqdm(roster, total=len(roster), desc="Loading avatars"):
             # Always add the username first
             if username is None or username.strip() == "":
                 # pula linhas sem username válido
                 continue
             usernames.append(username)
+
+            if username in cached_avatars:
+                # Already decoded, masked and resized
+                particle_images.append(cached_avatars[username])
+                continue
             
             try:
                 if os.path.exists(f"followers_info/img/{username}.png"):
@@ -162,21 +195,47 @@ def load_particles(min_radius, max_radius, max_hp, max_speed, acc_magnitude, wid
             except Exception as e:
                 print(f"Error loading image for {username} from {img_path}: {str(e)}")
                 # Create a simple colored circle as fallback
-                fallback_surface = pygame.Surface((max_radius*2, max_radius*2), pygame.SRCALPHA)
-                pygame.draw.circle(fallback_surface, (200, 200, 200, 255), 
-                                 (max_radius, max_radius), max_radius)
-                particle_images.append(circular_mask(fallback_surface))
+                particle_images.append(fallback_avatar(max_radius))
+
+        ids = usernames
+
+    return ids, particle_images
 
-        num_particles = len(particle_images)
+# Simple colored circle for players without a usable avatar
+def fallback_avatar(max_radius):
+    fallback_surface = pygame.Surface((max_radius*2, max_radius*2), pygame.SRCALPHA)
+    pygame.draw.circle(fallback_surface, (200, 200, 200, 255), 
+                     (max_radius, max_radius), max_radius)
+    return circular_mask(fallback_surface)
 
-        radius = get_dynamic_radius(particle_images, width, height, min_radius, max_radius, change_radius=False)
+# {id: masked avatar} of players of an earlier match, from what is already on
+# disk (avatar cache, saved PNGs): nothing is downloaded and the follower
+# registry is not touched, so many processes can call it at once
+def load_saved_avatars(ids, image_path, local_images, max_radius):
+    if local_images:
+        return {str(i): circular_mask(pygame.image.load(f'{image_path}/particle_{i}.png').convert_alpha()) for i in ids}
+
+    avatars = load_cached_avatars([str(username) for username in ids])
+    for username in ids:
+        username = str(username)
+        if username in avatars:
+            continue
+        try:
+            avatars[username] = circular_mask(pygame.image.load(f"followers_info/img/{username}.png").convert_alpha())
+        except Exception:
+            avatars[username] = fallback_avatar(max_radius)
+    return avatars
 
-        positions = assign_position(radius, width, height, num_particles)
+# Fresh particles for a match, spread over the arena (images may be None when nothing is drawn)
+def create_particles(ids, images, min_radius, max_radius, max_hp, max_speed, acc_magnitude, width, height):
+    num_particles = len(ids)
 
-        # Create particles
-        particles = [Particle(usernames[i], particle_images[i], radius, max_hp, max_speed, acc_magnitude, width, height, positions[i]) for i in range(num_particles)]
+    radius = get_dynamic_radius(ids, width, height, min_radius, max_radius, change_radius=False)
 
-    return particles
+    positions = assign_position(radius, width, height, num_particles)
+
+    # Create particles
+    return [Particle(ids[i], images[i], radius, max_hp, max_speed, acc_magnitude, width, height, positions[i]) for i in range(num_particles)]
 
 def create_log(particle_a, particle_b, timestamp, frame_number):
     killed_a = not particle_a.alive
@@ -206,8 +265,50 @@ def create_log(particle_a, particle_b, timestamp, frame_number):
 def get_cell_coords(pos, cell_size):
     return int(pos[0] // cell_size), int(pos[1] // cell_size)
 
+# Size the collision grid so that swept pairs are always in neighbouring cells.
+# Two particles can only meet during a step if their current positions are closer
+# than 2 * radius plus the distance both travelled in that step.
+def get_collision_grid(radius, particles, width, height):
+    max_disp = max((np.linalg.norm(p.pos - p.prev_pos) for p in particles if p.alive), default=0.0)
+    cell_size = max(radius * 2, radius * 2 + 2 * max_disp)
+    grid_width = int(width // cell_size) + 1
+    grid_height = int(height // cell_size) + 1
+    return cell_size, grid_width, grid_height
+
+# Earliest fraction of the last step (0..1) at which two particles touch, or None.
+# Both particles moved in a straight line from prev_pos to pos during the step.
+def get_contact_time(a, b, radius):
+    return get_segment_contact_time(a.prev_pos - b.prev_pos, a.pos - b.pos, radius)
+
+# Same test on the relative position at the start (d0) and end (d1) of the step
+def get_segment_contact_time(d0, d1, radius):
+    min_dist = radius * 2
+
+    if np.dot(d1, d1) < min_dist ** 2:
+        # Already overlapping at the end of the step
+        if np.dot(d0, d0) < min_dist ** 2:
+            return 1.0
+    elif np.dot(d0, d0) < min_dist ** 2:
+        # Overlapping at the start but separated at the end: they moved apart
+        return None
+
+    # Solve |d0 + t * (d1 - d0)| = 2 * radius for the smallest t in [0, 1]
+    rel = d1 - d0
+    qa = np.dot(rel, rel)
+    if qa == 0:
+        return None
+    qb = 2 * np.dot(d0, rel)
+    qc = np.dot(d0, d0) - min_dist ** 2
+    disc = qb * qb - 4 * qa * qc
+    if disc < 0:
+        return None
+    t = (-qb - np.sqrt(disc)) / (2 * qa)
+    if 0 <= t <= 1:
+        return t
+    return None
+
 # Check collisions using a grid-based approach
-def check_collisions(radius, cell_size, grid_width, grid_height, particles, timestamp, frame_number):
+def check_collisions(radius, cell_size, grid_width, grid_height, particles, timestamp, frame_number, match_index=None):
 
     # Create empty grid
     grid = [[[] for _ in range(grid_height)] for _ in range(grid_width)]
@@ -232,45 +333,77 @@ def check_collisions(radius, cell_size, grid_width, grid_height, particles, time
                                     continue
                                 if not a.alive:
                                     break  # Already eliminated
+
+                                # Swept test: catches fast particles that passed through each other
+                                t = get_contact_time(a, b, radius)
+                                if t is None:
+                                    continue
+                                if t < 1:
+                                    # Rewind both particles to the moment of contact
+                                    a.pos = a.prev_pos + (a.pos - a.prev_pos) * t
+                                    b.pos = b.prev_pos + (b.pos - b.prev_pos) * t
+
                                 dist_pos = a.pos - b.pos
                                 dist = np.linalg.norm(dist_pos)
-                                if dist < radius * 2:
-                                    # Compute direction of collision
-                                    direction = dist_pos / dist if dist != 0 else np.array([1.0, 0.0])
-
-                                    # Repel particles slightly to avoid sticking
-                                    repel_distance = 0.1 * radius
-                                    a.pos += direction * repel_distance
-                                    b.pos -= direction * repel_distance
-
-                                    # Damage calculation, the force is the difference in velocities
-                                    # and the damage is the minimum of the force and the minimum HP of both particles,
-                                    # so only one particle can be eliminated at a time.
-                                    force_a = np.linalg.norm(a.vel)*2
-                                    force_b = np.linalg.norm(b.vel)*2
-
-                                    min_hp = min(a.hp, b.hp)
-                                    a.damage(min(force_b, min_hp))
-                                    b.damage(min(force_a, min_hp))
-
-                                    # Conservation of momentum (1D elastic collision in collision direction)
-                                    v1 = np.dot(a.vel, direction)
-                                    v2 = np.dot(b.vel, direction)
-                                    m1 = a.mass
-                                    m2 = b.mass
-
-                                    # New velocities in collision direction
-                                    new_v1 = (v1 * (m1 - m2) + 2 * m2 * v2) / (m1 + m2)
-                                    new_v2 = (v2 * (m2 - m1) + 2 * m1 * v1) / (m1 + m2)
-
-                                    # Update velocities
-                                    a.vel += (new_v1 - v1) * direction
-                                    b.vel += (new_v2 - v2) * direction
-
-                                    if not a.alive or not b.alive:
-                                        create_log(a, b, timestamp, frame_number)
-
-def display_winner(font, particles, screen, width, height, radius, timestamp=None):
+
+                                # Compute direction of collision
+                                direction = dist_pos / dist if dist != 0 else np.array([1.0, 0.0])
+
+                                # Only resolve approaching pairs, so a contact spanning several
+                                # substeps is counted once, whatever the step size
+                                if dist != 0 and np.dot(a.vel - b.vel, direction) >= 0:
+                                    continue
+
+                                # Repel particles slightly to avoid sticking
+                                repel_distance = 0.1 * radius
+                                a.pos += direction * repel_distance
+                                b.pos -= direction * repel_distance
+
+                                # Damage calculation, the force is the difference in velocities
+                                # and the damage is the minimum of the force and the minimum HP of both particles,
+                                # so only one particle can be eliminated at a time.
+                                force_a = np.linalg.norm(a.vel)*2
+                                force_b = np.linalg.norm(b.vel)*2
+
+                                min_hp = min(a.hp, b.hp)
+                                a.damage(min(force_b, min_hp))
+                                b.damage(min(force_a, min_hp))
+
+                                # Conservation of momentum (1D elastic collision in collision direction)
+                                v1 = np.dot(a.vel, direction)
+                                v2 = np.dot(b.vel, direction)
+                                m1 = a.mass
+                                m2 = b.mass
+
+                                # New velocities in collision direction
+                                new_v1 = (v1 * (m1 - m2) + 2 * m2 * v2) / (m1 + m2)
+                                new_v2 = (v2 * (m2 - m1) + 2 * m1 * v1) / (m1 + m2)
+
+                                # Update velocities
+                                a.vel += (new_v1 - v1) * direction
+                                b.vel += (new_v2 - v2) * direction
+
+                                if not a.alive or not b.alive:
+                                    create_log(a, b, timestamp, frame_number)
+                                    if match_index is not None:
+                                        match_index.record(a, b, frame_number)
+
+# The winner is drawn bigger than the cached sprites (utils/avatar_cache.py):
+# scale its own PNG when there is one. No convert_alpha, the compositor may
+# draw this without a display.
+def winner_avatar(winner):
+    path = f"followers_info/img/{winner.id}.png"
+    if not os.path.exists(path):
+        return winner.image
+    try:
+        image = pygame.image.load(path)
+    except pygame.error:
+        return winner.image
+    surface = pygame.Surface(image.get_size(), pygame.SRCALPHA, 32)
+    surface.blit(image, (0, 0))
+    return circular_mask(surface)
+
+def display_winner(font, particles, screen, width, height, radius, timestamp=None, match_index=None):
     winner_shown = True
     winner = next(p for p in particles if p.alive)
     winner_text = font.render(f"Vencedor: {winner.id}!", True, (255, 215, 0))
@@ -278,14 +411,17 @@ def display_winner(font, particles, screen, width, height, radius, timestamp=Non
     screen.blit(winner_text, text_rect)
     # Show winner's image in the center, scaled up
     diameter = radius * 4
-    winner_img = pygame.transform.smoothscale(winner.image, (diameter, diameter))
+    winner_img = pygame.transform.smoothscale(winner_avatar(winner), (diameter, diameter))
     img_rect = winner_img.get_rect(center=(width // 2, height // 2 + 1.5 * radius))
     screen.blit(winner_img, img_rect)
 
     # Show last survivors list in a colored panel (Top 5)
     try:
-        if timestamp is not None:
-            survivors = get_last_survivors_from_log(timestamp, str(winner.id), top_k=5)
+        if match_index is not None or timestamp is not None:
+            if match_index is not None:
+                survivors = match_index.top(top_k=5)
+            else:
+                survivors = get_last_survivors_from_log(timestamp, str(winner.id), top_k=5)
             # Panel layout parameters
             panel_width = 420
             line_height = 28
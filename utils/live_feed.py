@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+FEED_NAME = "lutafoda_live"
+MAX_KILLS = 20  # Latest kills kept in the feed
+
+# Layout of the segment:
+#   header   seq, frame, alive, num_players, num_kills, owner pid, finished (int64), width, height, radius (float64)
+#   players  roster index of each alive player (int32), position (float32 x2), hp (float32)
+#   kills    (victim, killer, frame) roster indices, newest last (int32 x3)
+#   roster   length (int64) + JSON list of player ids
+# seq is a seqlock: odd while the simulation is writing, so a reader that saw
+# the same even value before and after copying has a consistent snapshot.
+# finished is set by close(): the segment then stays up for a few seconds
+# (linger) so the dashboard can show the end of the match.
+HEADER = np.dtype([
+    ('seq', 'i8'), ('frame', 'i8'), ('alive', 'i8'), ('num_players', 'i8'), ('num_kills', 'i8'),
+    ('owner', 'i8'), ('finished', 'i8'), ('width', 'f8'), ('height', 'f8'), ('radius', 'f8'),
+])
+
+
+def _layout(num_players, roster_bytes):
+    offsets = {'header': 0}
+    size = HEADER.itemsize
+    for name, itemsize in (('index', 4), ('pos', 8), ('hp', 4), ('kills', 12)):
+        offsets[name] = size
+        size += itemsize * (MAX_KILLS if name == 'kills' else num_players)
+    offsets['roster'] = size
+    size += 8 + roster_bytes
+    return offsets, size
+
+def _views(buf, num_players, roster_bytes):
+    offsets, _ = _layout(num_players, roster_bytes)
+    return {
+        'header': np.ndarray((), dtype=HEADER, buffer=buf, offset=offsets['header']),
+        'index': np.ndarray((num_players,), dtype=np.int32, buffer=buf, offset=offsets['index']),
+        'pos': np.ndarray((num_players, 2), dtype=np.float32, buffer=buf, offset=offsets['pos']),
+        'hp': np.ndarray((num_players,), dtype=np.float32, buffer=buf, offset=offsets['hp']),
+        'kills': np.ndarray((MAX_KILLS, 3), dtype=np.int32, buffer=buf, offset=offsets['kills']),
+    }
+
+
+# Feeds published by this process, to tell a feed of a running match here
+# from one a crashed match left behind under our (reused) pid
+_open_feeds = set()
+# Finished feeds of this process still up for the dashboard, by name
+_lingering = {}
+
+
+def _is_running(pid):
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _remove_stale(name):
+    """
+    Unlink the segment called name if the match that wrote it is gone. Raises
+    FileExistsError when another running match still publishes there.
+    """
+    try:
+        existing = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    try:
+        owner = 0
+        if existing.size >= HEADER.itemsize:
+            owner = int(np.ndarray((), dtype=HEADER, buffer=existing.buf)['owner'])
+        if name in _open_feeds or (owner > 0 and _is_running(owner)):
+            # Not ours: keep the resource tracker from unlinking it when we exit
+            resource_tracker.unregister(existing._name, 'shared_memory')
+            raise FileExistsError(f"Live feed '{name}' is in use by the match in process {owner}")
+        existing.unlink()
+    finally:
+        existing.close()
+
+
+# Written by the simulation. publish() is rate limited, so a match only pays
+# for a few numpy copies per second, whatever its frame rate.
+class LiveFeedPublisher:
+    def __init__(self, roster_ids, width, height, name=FEED_NAME, hz=10):
+        self.roster = [str(pid) for pid in roster_ids]
+        self.slot = {pid: i for i, pid in enumerate(self.roster)}
+        self.interval = 1.0 / hz if hz else 0.0
+        self.last_publish = 0.0
+
+        roster_json = json.dumps(self.roster).encode('utf-8')
+        _, size = _layout(len(self.roster), len(roster_json))
+        # The previous match of this process makes way for this one
+        previous = _lingering.pop(name, None)
+        if previous is not None:
+            previous.cancel()
+            previous.function()
+        # Left behind by a match that did not finish (never one still running)
+        _remove_stale(name)
+        self.name = name
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _open_feeds.add(name)
+        self.views = _views(self.shm.buf, len(self.roster), len(roster_json))
+
+        offsets, _ = _layout(len(self.roster), len(roster_json))
+        start = offsets['roster']
+        self.shm.buf[start:start + 8] = np.int64(len(roster_json)).tobytes()
+        self.shm.buf[start + 8:start + 8 + len(roster_json)] = roster_json
+
+        header = self.views['header']
+        header['num_players'] = len(self.roster)
+        header['owner'] = os.getpid()
+        header['width'] = width
+        header['height'] = height
+
+    def publish(self, frame_number, particles, radius, match_index, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_publish < self.interval:
+            return False
+        self.last_publish = now
+
+        alive = [p for p in particles if p.alive]
+        kills = match_index.eliminations[-MAX_KILLS:]
+        views = self.views
+        header = views['header']
+
+        header['seq'] += 1
+        n = len(alive)
+        if n:
+            views['index'][:n] = [self.slot[str(p.id)] for p in alive]
+            views['pos'][:n] = np.array([p.pos for p in alive])
+            views['hp'][:n] = [p.hp for p in alive]
+        if kills:
+            views['kills'][:len(kills)] = [(self.slot[v], self.slot[k], f) for v, k, f in kills]
+        header['frame'] = frame_number
+        header['alive'] = n
+        header['num_kills'] = len(kills)
+        header['radius'] = radius
+        header['seq'] += 1
+        return True
+
+    def close(self, linger=0):
+        """
+        Mark the match as finished and remove the segment, after linger
+        seconds so the dashboard still shows the final state.
+        """
+        header = self.views['header']
+        header['seq'] += 1
+        header['finished'] = 1
+        header['seq'] += 1
+        self.views = header = None
+        if linger > 0:
+            # Not a daemon: the process waits for it before exiting
+            _lingering[self.name] = threading.Timer(linger, self._unlink)
+            _lingering[self.name].start()
+        else:
+            self._unlink()
+
+    def _unlink(self):
+        _lingering.pop(self.name, None)
+        self.shm.close()
+        self.shm.unlink()
+        _open_feeds.discard(self.name)
+
+
+def read_snapshot(name=FEED_NAME, retries=50):
+    """
+    Latest snapshot of the running match, or None when no match is running.
+    Returns {frame, alive, num_players, finished, width, height, radius,
+    players, kills} with players as a DataFrame-ready dict of lists.
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return None
+    # Only the simulation owns the segment: keep this process' resource
+    # tracker from unlinking it when the reader exits
+    resource_tracker.unregister(shm._name, 'shared_memory')
+
+    try:
+        header = np.ndarray((), dtype=HEADER, buffer=shm.buf)
+        num_players = int(header['num_players'])
+        offsets, _ = _layout(num_players, 0)
+        start = offsets['roster']
+        roster_bytes = int(np.frombuffer(shm.buf[start:start + 8], dtype=np.int64)[0]) if num_players else 0
+        if not roster_bytes:
+            # Just created, the publisher has not written the roster yet
+            return None
+        roster = json.loads(bytes(shm.buf[start + 8:start + 8 + roster_bytes]).decode('utf-8'))
+        views = _views(shm.buf, num_players, roster_bytes)
+
+        for _ in range(retries):
+            seq = int(header['seq'])
+            if seq % 2:
+                time.sleep(0.001)
+                continue
+            alive = int(header['alive'])
+            num_kills = int(header['num_kills'])
+            snapshot = {
+                'frame': int(header['frame']),
+                'alive': alive,
+                'num_players': num_players,
+                'finished': bool(header['finished']),
+                'width': float(header['width']),
+                'height': float(header['height']),
+                'radius': float(header['radius']),
+                'index': views['index'][:alive].copy(),
+                'pos': views['pos'][:alive].copy(),
+                'hp': views['hp'][:alive].copy(),
+                'kills': views['kills'][:num_kills].copy(),
+            }
+            if int(header['seq']) == seq:
+                break
+        else:
+            return None
+    finally:
+        header = views = None
+        shm.close()
+
+    return {
+        'frame': snapshot['frame'],
+        'alive': snapshot['alive'],
+        'num_players': snapshot['num_players'],
+        'finished': snapshot['finished'],
+        'width': snapshot['width'],
+        'height': snapshot['height'],
+        'radius': snapshot['radius'],
+        'players': {
+            'player': [roster[i] for i in snapshot['index']],
+            'x': snapshot['pos'][:, 0].tolist(),
+            'y': snapshot['pos'][:, 1].tolist(),
+            'hp': snapshot['hp'].tolist(),
+        },
+        'kills': [(roster[v], roster[k], int(f)) for v, k, f in snapshot['kills']],
+    }
@@ -0,0 +1,185 @@
+import io
+import os
+import csv
+import gzip
+from datetime import datetime, timedelta
+
+# Processed collision logs older than KEEP_DAYS leave simulations/ for
+# compressed archives (archive/logs_YYYYMMDD.csv.gz, one per day of matches).
+# Every match is its own gzip member, followed by its detailed rankings as a
+# second one, and archive/index.csv keeps where each member starts: reading a
+# match is one seek and one small decompress. (zcat on an archive still
+# works, the members just follow one another.) An archive is written once and
+# never changed: simulations/ is committed every day, and a file that grew
+# would be stored again in full each time. Whatever reaches the archive later
+# for a day (rankings of a log archived before them) goes to a new file,
+# logs_YYYYMMDD_1.csv.gz and so on. The monthly archives of older versions
+# (logs_YYYYMM.csv.gz) are still read through the index.
+ARCHIVE_DIR = "archive"  # inside the simulations directory
+INDEX_FILE = "index.csv"
+INDEX_COLUMNS = ['match', 'date', 'archive', 'offset', 'length',
+                 'rankings_archive', 'rankings_offset', 'rankings_length']
+COLLISION_SUFFIX = "_collision_log.csv"
+DETAILED_PREFIX = "detailed_rankings_"
+KEEP_DAYS = 7
+
+
+def get_archive_dir(simulations_dir):
+    return os.path.join(simulations_dir, ARCHIVE_DIR)
+
+def load_index(simulations_dir):
+    # {log file name: index row}
+    path = os.path.join(get_archive_dir(simulations_dir), INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    index = {}
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            row['offset'] = int(row['offset'])
+            row['length'] = int(row['length'])
+            # Empty (or missing, in older indexes) until the rankings are archived
+            for column in ('rankings_offset', 'rankings_length'):
+                row[column] = int(row[column]) if row.get(column) else None
+            # Older indexes kept the rankings in the log's archive
+            has_rankings = row['rankings_offset'] is not None
+            row['rankings_archive'] = row.get('rankings_archive') or (row['archive'] if has_rankings else None)
+            index[f"{row['match']}{COLLISION_SUFFIX}"] = row
+    return index
+
+def save_index(index, simulations_dir):
+    path = os.path.join(get_archive_dir(simulations_dir), INDEX_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=INDEX_COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(sorted(index.values(), key=lambda row: row['match']))
+    os.replace(tmp_path, path)
+
+
+def list_logs(simulations_dir, index=None):
+    """Names of every collision log, in simulations_dir or archived, oldest first."""
+    index = load_index(simulations_dir) if index is None else index
+    names = set(index)
+    names.update(f for f in os.listdir(simulations_dir) if f.endswith(COLLISION_SUFFIX))
+    return sorted(names)
+
+def open_log(simulations_dir, filename, index=None):
+    # Text file object with the log, wherever it is kept
+    path = os.path.join(simulations_dir, filename)
+    if os.path.exists(path):
+        return open(path, 'r', newline='')
+    index = load_index(simulations_dir) if index is None else index
+    if filename not in index:
+        raise FileNotFoundError(f"{filename} is neither in {simulations_dir} nor in its archive")
+    entry = index[filename]
+    return _read_member(simulations_dir, entry['archive'], entry['offset'], entry['length'])
+
+def open_rankings(simulations_dir, match, index=None):
+    # Text file object with the match's detailed rankings, wherever they are kept
+    path = os.path.join(simulations_dir, f"{DETAILED_PREFIX}{match}.csv")
+    if os.path.exists(path):
+        return open(path, 'r', newline='')
+    index = load_index(simulations_dir) if index is None else index
+    entry = index.get(f"{match}{COLLISION_SUFFIX}")
+    if entry is None or entry['rankings_offset'] is None:
+        raise FileNotFoundError(f"Detailed rankings of {match} are neither in {simulations_dir} nor in its archive")
+    return _read_member(simulations_dir, entry['rankings_archive'], entry['rankings_offset'], entry['rankings_length'])
+
+def _read_member(simulations_dir, archive_name, offset, length):
+    with open(os.path.join(get_archive_dir(simulations_dir), archive_name), 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    return io.StringIO(gzip.decompress(data).decode('utf-8'), newline='')
+
+def _write_archive(simulations_dir, day, paths):
+    """
+    Compress the files into a new archive of that day, one member each.
+    Returns the archive's name and the (offset, length) of every member.
+    """
+    archive_dir = get_archive_dir(simulations_dir)
+    os.makedirs(archive_dir, exist_ok=True)
+    archive_name = f"logs_{day:%Y%m%d}.csv.gz"
+    n = 0
+    while os.path.exists(os.path.join(archive_dir, archive_name)):
+        n += 1
+        archive_name = f"logs_{day:%Y%m%d}_{n}.csv.gz"
+
+    members = []
+    archive_path = os.path.join(archive_dir, archive_name)
+    with open(archive_path + ".tmp", 'wb') as f:
+        for path in paths:
+            with open(path, 'rb') as source:
+                data = gzip.compress(source.read(), mtime=0)
+            members.append((f.tell(), len(data)))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(archive_path + ".tmp", archive_path)
+    return archive_name, members
+
+
+def archive_logs(simulations_dir, processed_files, keep_days=KEEP_DAYS, today=None):
+    """
+    Move the processed logs of matches older than keep_days, and the detailed
+    rankings of every archived match, into new archives (one per day of
+    matches). Returns the names of the files moved.
+    """
+    cutoff = (today or datetime.now().date()) - timedelta(days=keep_days)
+    index = load_index(simulations_dir)
+
+    moved = []
+    # {day: [(match, file name)]}, every log before its rankings
+    batches = {}
+    for filename in sorted(os.listdir(simulations_dir)):
+        if not filename.endswith(COLLISION_SUFFIX) or filename not in processed_files:
+            continue
+        match = filename[:-len(COLLISION_SUFFIX)]
+        try:
+            day = datetime.strptime(match[:8], "%Y%m%d").date()
+        except ValueError:
+            continue
+        if day >= cutoff:
+            continue
+        if filename in index:
+            # Already archived: a previous run stopped before removing the file
+            os.remove(os.path.join(simulations_dir, filename))
+            moved.append(filename)
+            continue
+        batches.setdefault(day, []).append((match, filename))
+
+    # Rankings go with their log (also those of logs archived before they did):
+    # rankings of matches still in simulations/ stay there with them
+    archiving = {match for batch in batches.values() for match, _ in batch}
+    for filename in sorted(os.listdir(simulations_dir)):
+        if not (filename.startswith(DETAILED_PREFIX) and filename.endswith(".csv")):
+            continue
+        match = filename[len(DETAILED_PREFIX):-len('.csv')]
+        entry = index.get(f"{match}{COLLISION_SUFFIX}")
+        if entry is None and match not in archiving:
+            continue
+        if entry is not None and entry['rankings_offset'] is not None:
+            os.remove(os.path.join(simulations_dir, filename))
+            moved.append(filename)
+            continue
+        day = datetime.strptime(match[:8], "%Y%m%d").date()
+        batches.setdefault(day, []).append((match, filename))
+
+    for day, batch in sorted(batches.items()):
+        archive_name, members = _write_archive(
+            simulations_dir, day, [os.path.join(simulations_dir, filename) for _, filename in batch])
+        for (match, filename), (offset, length) in zip(batch, members):
+            if filename.endswith(COLLISION_SUFFIX):
+                index[filename] = {
+                    'match': match, 'date': day.isoformat(), 'archive': archive_name, 'offset': offset,
+                    'length': length, 'rankings_archive': None, 'rankings_offset': None, 'rankings_length': None,
+                }
+            else:
+                index[f"{match}{COLLISION_SUFFIX}"].update(
+                    rankings_archive=archive_name, rankings_offset=offset, rankings_length=length)
+        # Index before removing, so a crash never loses a file (at worst an
+        # archive nothing points to is left behind)
+        save_index(index, simulations_dir)
+        for _, filename in batch:
+            os.remove(os.path.join(simulations_dir, filename))
+            moved.append(filename)
+    return moved
@@ -8,13 +8,22 @@ from tqdm import tqdm
 from collections import defaultdict
 from datetime import datetime
 
+from utils.stats_partitions import (
+    STATS_DIR, PARTITION_TABLES, load_manifest, save_manifest, write_partition, read_partition,
+)
+from utils.log_archive import KEEP_DAYS, load_index, list_logs, open_log, archive_logs
+from utils.run_metrics import report, file_size, sync_pipeline_runs
+from utils.query_cache import init_meta_table, bump_data_version
+from utils.ratings import init_rating_tables, rate_pending_days, rebuild_ratings, refresh_player_ratings
+
+# Local database, rebuilt from the daily partitions in STATS_DIR
 DB_PATH = "data/daily_stats.db"
 PROCESSED_FILE_PATH = 'data/processed_logs/processed_files.json'
 
 # ========= DB SETUP ========= #
-def init_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+def init_db(path=DB_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
     cur = conn.cursor()
 
     cur.execute("""
@@ -47,9 +56,63 @@ def init_db():
     )
     """)
 
+    # Who eliminated whom: per day, and summed over all days
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS daily_head_to_head (
+        date TEXT,
+        killer TEXT,
+        victim TEXT,
+        kills INTEGER,
+        PRIMARY KEY (date, killer, victim)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS head_to_head (
+        killer TEXT,
+        victim TEXT,
+        kills INTEGER,
+        PRIMARY KEY (killer, victim)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_head_to_head_victim ON head_to_head (victim, kills)")
+
+    # Every player ever seen, for the dashboard search
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS players (
+        player TEXT PRIMARY KEY
+    )
+    """)
+    # Case-insensitive prefix search (the primary key compares in BINARY)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_players_nocase ON players (player COLLATE NOCASE)")
+    # Daily partitions already loaded into this database
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS partitions (
+        date TEXT PRIMARY KEY,
+        sha1 TEXT
+    )
+    """)
+
+    if has_trigram_search(conn):
+        # Substring search over names (SQLite >= 3.34)
+        cur.execute("CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5(player, tokenize='trigram')")
+
+    # Skill ratings (see utils/ratings.py)
+    init_rating_tables(conn)
+
+    # Data version read by the dashboard's query cache
+    init_meta_table(conn)
+
     conn.commit()
     return conn
 
+def has_trigram_search(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.trigram_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
 
 # ========= FILE TRACKING ========= #
 def load_processed_files():
@@ -242,6 +305,105 @@ def save_daily_player_stats(conn, iso_date, graph):
     conn.commit()
 
 
+def save_daily_head_to_head(conn, iso_date, graph):
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM daily_head_to_head WHERE date=? LIMIT 1", (iso_date,))
+    if cur.fetchone():
+        return  # already counted in the all-time totals
+
+    rows = [
+        (iso_date, killer, victim, stats['kills'])
+        for killer, victims in graph.items()
+        for victim, stats in victims.items()
+        if stats['kills'] > 0
+    ]
+    cur.executemany(
+        "INSERT INTO daily_head_to_head (date, killer, victim, kills) VALUES (?, ?, ?, ?)",
+        rows
+    )
+    add_head_to_head_totals(cur, [row[1:] for row in rows])
+    conn.commit()
+
+def add_head_to_head_totals(cur, rows, sign=1):
+    cur.executemany("""
+        INSERT INTO head_to_head (killer, victim, kills) VALUES (?, ?, ?)
+        ON CONFLICT(killer, victim) DO UPDATE SET kills = kills + excluded.kills
+    """, [(killer, victim, sign * kills) for killer, victim, kills in rows])
+
+
+def update_player_index(conn, iso_date=None):
+    # New players of the day (or of all days) go to the end of the index
+    cur = conn.cursor()
+    if iso_date is None:
+        cur.execute("INSERT OR IGNORE INTO players (player) SELECT DISTINCT player FROM player_stats")
+    else:
+        cur.execute("INSERT OR IGNORE INTO players (player) SELECT player FROM player_stats WHERE date=?", (iso_date,))
+
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='players_fts'")
+    if cur.fetchone():
+        cur.execute("""
+            INSERT INTO players_fts (rowid, player)
+            SELECT rowid, player FROM players
+            WHERE rowid > (SELECT COALESCE(MAX(rowid), 0) FROM players_fts)
+        """)
+    conn.commit()
+
+
+# ========= PARTITIONS ========= #
+def export_partition(conn, iso_date, stats_dir=STATS_DIR):
+    # Write the day's rows to its partition file and return the manifest entry
+    cur = conn.cursor()
+    tables = {}
+    for table, columns in PARTITION_TABLES.items():
+        cur.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE date=? ORDER BY {', '.join(columns)}",
+            (iso_date,)
+        )
+        tables[table] = cur.fetchall()
+    entry = write_partition(iso_date, tables, stats_dir)
+    cur.execute("INSERT OR REPLACE INTO partitions (date, sha1) VALUES (?, ?)", (iso_date, entry["sha1"]))
+    conn.commit()
+    return entry
+
+def import_partition(conn, iso_date, entry, stats_dir=STATS_DIR):
+    # Replace whatever this database had for the day with the partition
+    tables = read_partition(entry, stats_dir)
+    cur = conn.cursor()
+
+    cur.execute("SELECT killer, victim, kills FROM daily_head_to_head WHERE date=?", (iso_date,))
+    add_head_to_head_totals(cur, cur.fetchall(), sign=-1)
+    cur.execute("DELETE FROM head_to_head WHERE kills <= 0")
+    for table, (columns, rows) in tables.items():
+        cur.execute(f"DELETE FROM {table} WHERE date=?", (iso_date,))
+        cur.executemany(
+            f"INSERT INTO {table} (date, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})",
+            [[iso_date] + row for row in rows]
+        )
+    add_head_to_head_totals(cur, tables['daily_head_to_head'][1])
+
+    cur.execute("INSERT OR REPLACE INTO partitions (date, sha1) VALUES (?, ?)", (iso_date, entry["sha1"]))
+    conn.commit()
+    update_player_index(conn, iso_date)
+
+def sync_partitions(conn, stats_dir=STATS_DIR):
+    """
+    Load every partition in the manifest that this database does not have
+    yet (a fresh clone loads them all). Returns the dates loaded.
+    """
+    manifest = load_manifest(stats_dir)
+    cur = conn.cursor()
+    cur.execute("SELECT date, sha1 FROM partitions")
+    loaded = dict(cur.fetchall())
+
+    new_dates = [d for d in sorted(manifest) if loaded.get(d) != manifest[d]["sha1"]]
+    for iso_date in new_dates:
+        import_partition(conn, iso_date, manifest[iso_date], stats_dir)
+    refresh_player_ratings(conn, new_dates)
+    if new_dates:
+        bump_data_version(conn)
+    return new_dates
+
+
 # ========= EXTRA HELPERS ========= #
 def get_nemesis(graph, particle):
     nemesis = None
@@ -263,13 +425,24 @@ def main(args):
     simulations_dir = 'simulations'
     conn = init_db()
 
+    # Bring the local database up to date with the committed partitions
+    synced = sync_partitions(conn)
+    if synced:
+        print(f"Loaded {len(synced)} daily partitions")
+    sync_pipeline_runs(conn)
+
+    # First run with the player index: fill it from the stats already stored
+    if conn.execute("SELECT 1 FROM players LIMIT 1").fetchone() is None:
+        update_player_index(conn)
+
     processed_files = load_processed_files() if not args.historic else set()
-    all_files = sorted(f for f in os.listdir(simulations_dir) if f.endswith('.csv'))
+    # Recent logs are in simulations_dir, older ones in its monthly archives
+    archive_index = load_index(simulations_dir)
+    all_files = list_logs(simulations_dir, archive_index)
     files_to_process = [f for f in all_files if args.historic or f not in processed_files]
 
     if not files_to_process:
         print("No new log files to process.")
-        return
 
     # Group files by day
     files_by_day = defaultdict(list)
@@ -278,6 +451,7 @@ def main(args):
         if date_str:
             files_by_day[date_str].append(f)
 
+    processed_dates = set()
     for date_str, day_files in tqdm(files_by_day.items(), desc="Processing days", unit="day"):
         try:
             date_obj = datetime.strptime(date_str, "%Y%m%d")
@@ -288,9 +462,8 @@ def main(args):
 
         log_data = []
         for filename in day_files:
-            file_path = os.path.join(simulations_dir, filename)
             try:
-                with open(file_path, 'r') as f:
+                with open_log(simulations_dir, filename, archive_index) as f:
                     reader = csv.DictReader(f)
                     log_data.extend(reader)
                 processed_files.add(filename)
@@ -300,19 +473,58 @@ def main(args):
         if not log_data:
             continue
 
+        report(rows=len(log_data))
         daily_graph = create_interaction_graph(log_data)
 
         # Save to DB (idempotent)
         save_daily_ranking(conn, iso_date, log_data)
         save_daily_summary(conn, iso_date, daily_graph)
         save_daily_player_stats(conn, iso_date, daily_graph)
+        save_daily_head_to_head(conn, iso_date, daily_graph)
+        update_player_index(conn, iso_date)
+        processed_dates.add(iso_date)
+
+    # Ratings go forward one day at a time, after the day's tables are in.
+    # Only the days processed now: rating the past (and rewriting its
+    # partitions) is the explicit --rate-history step
+    if args.rate_history:
+        rated_dates = set(rebuild_ratings(conn))
+    else:
+        rated_dates = set(rate_pending_days(conn, processed_dates))
+    if rated_dates:
+        print(f"Rated {len(rated_dates)} days")
+
+    # Export the days processed now, and any day the database has that was
+    # never exported (all of them, the first time)
+    manifest = load_manifest()
+    cur = conn.cursor()
+    cur.execute("SELECT date FROM daily_summary")
+    to_export = processed_dates | rated_dates | ({r[0] for r in cur.fetchall()} - set(manifest))
+    for iso_date in sorted(to_export):
+        manifest[iso_date] = export_partition(conn, iso_date)
+    report(bytes_written=sum(file_size(os.path.join(STATS_DIR, manifest[d]["file"])) for d in to_export))
+    if to_export:
+        save_manifest(manifest)
 
     save_processed_files(processed_files)
+    # Done: cached dashboard queries are stale from here on
+    if processed_dates or rated_dates:
+        bump_data_version(conn)
     conn.close()
+
+    if args.keep_days >= 0:
+        archived = archive_logs(simulations_dir, processed_files, args.keep_days)
+        if archived:
+            print(f"Archived {len(archived)} logs and rankings older than {args.keep_days} days")
     print(f"\nProcessing complete in {time.time() - start:.2f}s")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process particle arena logs into SQLite.")
     parser.add_argument('--historic', action='store_true', help="Rebuild entire history from scratch.")
+    parser.add_argument('--keep-days', type=int, default=KEEP_DAYS,
+                        help="Days processed logs stay in simulations/ before being archived (negative: never).")
+    parser.add_argument('--rate-history', action='store_true',
+                        help="Rate every day again from the first one, e.g. once on an install with days from "
+                             "before the ratings. Rewrites only the partitions whose ratings change.")
     args = parser.parse_args()
     main(args)
\ No newline at end of file
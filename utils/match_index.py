@@ -0,0 +1,64 @@
+import pandas as pd
+
+
+# Results of a running match, updated as each elimination happens, so the
+# winner screen and the rankings never need to read the collision log back.
+class MatchIndex:
+    def __init__(self, roster_ids):
+        self.roster = [str(pid) for pid in roster_ids]
+        # (player, eliminated_by, frame) in elimination order
+        self.eliminations = []
+        self._eliminated = set()
+
+    # Same arguments as create_log: called once per fatal collision
+    def record(self, particle_a, particle_b, frame_number):
+        for victim, killer in ((particle_a, particle_b), (particle_b, particle_a)):
+            if not victim.alive:
+                self.record_elimination(victim.id, killer.id, frame_number)
+
+    def record_elimination(self, player, killer, frame_number):
+        player = str(player)
+        if player not in self._eliminated:
+            self._eliminated.add(player)
+            self.eliminations.append((player, str(killer), int(frame_number)))
+
+    def survivors(self):
+        return [pid for pid in self.roster if pid not in self._eliminated]
+
+    def winner(self):
+        survivors = self.survivors()
+        return survivors[0] if len(survivors) == 1 else None
+
+    # Winner first, then the players in reverse elimination order
+    def top(self, top_k=5):
+        top = self.survivors()
+        for player, _, _ in reversed(self.eliminations):
+            if len(top) >= top_k:
+                break
+            top.append(player)
+        return top[:top_k]
+
+    # Rows in the detailed_rankings_*.csv format: the winner is rank 1,
+    # the first player eliminated gets the last rank
+    def ranking(self):
+        total_players = len(self.roster)
+        rows = [
+            {"Rank": total_players - idx, "Player": player, "Eliminated_By": killer}
+            for idx, (player, killer, _) in enumerate(self.eliminations)
+        ]
+        winner = self.winner() or "UNKNOWN"
+        rows.insert(0, {"Rank": 1, "Player": winner, "Eliminated_By": "WINNER"})
+        return rows
+
+    def write_detailed_rankings(self, timestamp, simulations_dir="simulations"):
+        out_path = f"{simulations_dir}/detailed_rankings_{timestamp}.csv"
+        pd.DataFrame(self.ranking(), columns=["Rank", "Player", "Eliminated_By"]).to_csv(out_path, index=False)
+        return out_path
+
+    # Plain lists, so the index can travel inside a checkpoint
+    def get_state(self):
+        return [list(e) for e in self.eliminations]
+
+    def set_state(self, eliminations):
+        self.eliminations = [(player, killer, int(frame)) for player, killer, frame in eliminations]
+        self._eliminated = {player for player, _, _ in self.eliminations}
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import numpy as np
+
+RECORDINGS_DIR = "simulations/recordings"
+
+# Per-frame state of a match: who is alive, where, and with how much HP.
+# Enough to draw any frame again (highlights.py) without simulating the
+# match or decoding its video. Frames are stored back to back: the rows of
+# frame k are offsets[k]:offsets[k + 1] of index/pos/hp_ratio.
+
+
+def get_recording_path(timestamp, recordings_dir=RECORDINGS_DIR):
+    return os.path.join(recordings_dir, f"{timestamp}.npz")
+
+
+class MatchRecorder:
+    # The rows of every frame are kept in memory only until CHUNK_ROWS of
+    # them add up, then appended to temporary files; save() builds the npz
+    # from those files, so a long match never holds its frames in RAM.
+    CHUNK_ROWS = 1 << 18
+    COLUMNS = (('index', np.int32, ()), ('pos', np.float32, (2,)), ('hp_ratio', np.float32, ()))
+
+    def __init__(self, roster_ids, width, height, fps):
+        self.roster = [str(pid) for pid in roster_ids]
+        self.slot = {pid: i for i, pid in enumerate(self.roster)}
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.ticks = []
+        self.radius = []
+        self.alive_count = []
+        self.counts = []
+        self.rows = 0
+        self.chunk = {name: [] for name, _, _ in self.COLUMNS}
+        self.chunk_rows = 0
+        self.files = {name: tempfile.TemporaryFile() for name, _, _ in self.COLUMNS}
+
+    def record(self, tick, particles, radius, alive_count):
+        alive = [p for p in particles if p.alive]
+        self.ticks.append(tick)
+        self.radius.append(radius)
+        self.alive_count.append(alive_count)
+        self.counts.append(len(alive))
+        self.chunk['index'].append(np.array([self.slot[str(p.id)] for p in alive], dtype=np.int32))
+        self.chunk['pos'].append(np.array([p.pos for p in alive], dtype=np.float32).reshape(-1, 2))
+        self.chunk['hp_ratio'].append(np.clip(np.array([p.hp / p.max_hp for p in alive], dtype=np.float32), 0, 1))
+        self.chunk_rows += len(alive)
+        if self.chunk_rows >= self.CHUNK_ROWS:
+            self.flush()
+
+    def flush(self):
+        # Append the rows gathered so far to the temporary files
+        for name, dtype, _ in self.COLUMNS:
+            if self.chunk[name]:
+                self.files[name].write(np.concatenate(self.chunk[name]).astype(dtype).tobytes())
+            self.chunk[name] = []
+        self.rows += self.chunk_rows
+        self.chunk_rows = 0
+
+    def column(self, name):
+        # Everything recorded in one column, read from its temporary file
+        _, dtype, shape = next(c for c in self.COLUMNS if c[0] == name)
+        if not self.rows:
+            return np.empty((0,) + shape, dtype=dtype)
+        self.files[name].flush()
+        return np.memmap(self.files[name], dtype=dtype, mode='r', shape=(self.rows,) + shape)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.flush()
+        # The members are compressed from the memory maps a block at a time
+        np.savez_compressed(
+            path,
+            roster=np.array(self.roster),
+            size=np.array([self.width, self.height, self.fps]),
+            ticks=np.array(self.ticks, dtype=np.int64),
+            radius=np.array(self.radius, dtype=np.int32),
+            alive_count=np.array(self.alive_count, dtype=np.int32),
+            offsets=np.concatenate([[0], np.cumsum(self.counts)]).astype(np.int64),
+            index=self.column('index'),
+            pos=self.column('pos'),
+            hp_ratio=self.column('hp_ratio'),
+        )
+        for f in self.files.values():
+            f.close()
+
+
+class MatchRecording:
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.roster = [str(pid) for pid in data['roster']]
+            self.slot = {pid: i for i, pid in enumerate(self.roster)}
+            self.width, self.height, self.fps = (int(v) for v in data['size'])
+            self.ticks = data['ticks']
+            self.radius = data['radius']
+            self.alive_count = data['alive_count']
+            self.offsets = data['offsets']
+            self.index = data['index']
+            self.pos = data['pos']
+            self.hp_ratio = data['hp_ratio']
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def frames_between(self, first_tick, last_tick):
+        # Recorded frames whose tick is in [first_tick, last_tick]
+        lo = np.searchsorted(self.ticks, first_tick, side='left')
+        hi = np.searchsorted(self.ticks, last_tick, side='right')
+        return range(lo, hi)
+
+    def snapshot(self, frame):
+        # Same shape as compositor.take_snapshot, ids as strings
+        rows = slice(self.offsets[frame], self.offsets[frame + 1])
+        return {
+            'ids': [self.roster[i] for i in self.index[rows]],
+            'pos': self.pos[rows].astype(float),
+            'hp_ratio': self.hp_ratio[rows],
+            'radius': int(self.radius[frame]),
+            'alive_count': int(self.alive_count[frame]),
+        }
+
+    def position_of(self, frame, player):
+        # Where player is in this frame, or None when not alive
+        rows = slice(self.offsets[frame], self.offsets[frame + 1])
+        found = np.flatnonzero(self.index[rows] == self.slot[player])
+        return self.pos[rows][found[0]] if len(found) else None
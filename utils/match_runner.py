@@ -0,0 +1,476 @@
+import os
+import gc
+import signal
+import datetime
+import threading
+
+import numpy as np
+import pygame
+
+from utils.helpers import (
+    get_dynamic_radius, load_avatars, create_particles, load_roster_ids, get_collision_grid, check_collisions,
+    display_winner, add_particle_to_frames, remove_dead_particles,
+)
+from utils.scheduler import get_safe_steps, advance_particles
+from utils.steering import steer_particles
+from utils.checkpoint import get_checkpoint_path, find_latest_checkpoint, save_checkpoint, resume_from_checkpoint
+from utils.match_index import MatchIndex
+from utils.live_feed import LiveFeedPublisher
+from utils.match_recording import MatchRecorder, get_recording_path
+from utils.match_trace import TraceRecorder, get_trace_path
+from utils.replay import ReplayBuffer
+from utils.compositor import FrameCompositor, VideoEncoder, take_snapshot
+from utils.pipeline import FramePipeline
+
+# One match of the arena as a library call:
+#   result = run_match(config, roster, {'headless': True})
+# plays it, writes the usual outputs (collision log, rankings, video) and
+# returns a MatchResult. What does not change between matches (the roster,
+# the avatars, pygame's display and font) is loaded by MatchAssets the first
+# time a match needs it and kept for the next ones, so a batch job can play
+# many matches in one process. simulation.py is the command line over it.
+DEFAULT_OPTIONS = {
+    'headless': False,    # no window or video, only the collision log
+    'compositor': False,  # video composed in NumPy and streamed to ffmpeg, no window
+    'substeps': None,     # physics substeps per tick (default: config)
+    'resume': None,       # checkpoint to continue ('latest': the newest one)
+    'timestamp': None,    # name of the match outputs (default: now)
+    'record': False,      # keep every frame's state for highlights.py
+    'trace': False,       # keep a compact movement trace for utils/trace_analytics.py
+    'shards': 0,          # headless on this many worker processes, one per arena strip
+}
+
+
+class MatchResult:
+    def __init__(self, timestamp, match_index, ticks, stopped=False, checkpoint_path=None, simulations_dir="simulations"):
+        self.timestamp = timestamp
+        # Elimination order, killers and survivors
+        self.match_index = match_index
+        self.ticks = ticks
+        # Stopped by SIGTERM: the match goes on from checkpoint_path
+        self.stopped = stopped
+        self.checkpoint_path = checkpoint_path
+        self.log_path = f"{simulations_dir}/{timestamp}_collision_log.csv"
+        self.rankings_path = f"{simulations_dir}/detailed_rankings_{timestamp}.csv"
+        self.video_path = f"{simulations_dir}/{timestamp}_simulation.mp4"
+
+    @property
+    def winner(self):
+        return self.match_index.winner()
+
+    @property
+    def eliminations(self):
+        return self.match_index.eliminations
+
+    def ranking(self):
+        return self.match_index.ranking()
+
+
+class MatchAssets:
+    """
+    Everything matches read from outside the arena, loaded once: the roster,
+    the avatars (only the ones a drawn match needs, the first time) and the
+    pygame display and font. Headless matches never start pygame.
+    """
+    def __init__(self, config):
+        self.image_path = config['images']['path']
+        self.local_images = config['images']['local']
+        self.max_radius = config['particles']['max_radius']
+        self.size = (config['screen']['width'], config['screen']['height'])
+        self.images = {}
+        self.screen = None
+        self.font = None
+        self._roster_ids = None
+
+    def get_roster_ids(self, roster=None):
+        # Everyone, or only the given players, in roster order
+        if self._roster_ids is None:
+            self._roster_ids = load_roster_ids(self.image_path, self.local_images)
+        if roster is None:
+            return list(self._roster_ids)
+        roster = {str(pid) for pid in roster}
+        return [pid for pid in self._roster_ids if str(pid) in roster]
+
+    def init_display(self, window=False):
+        # The first drawn match picks the driver: a window, or none at all
+        if self.screen is None:
+            if not window:
+                # Surfaces still need a display mode to convert images, but nothing is shown
+                os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            pygame.init()
+            self.screen = pygame.display.set_mode(self.size)
+            pygame.display.set_caption("Particle Simulation")
+            self.font = pygame.font.SysFont(None, 36)
+        return self.screen
+
+    def get_images(self, ids, window=False):
+        self.init_display(window)
+        missing = [pid for pid in ids if pid not in self.images]
+        if missing:
+            loaded_ids, images = load_avatars(self.image_path, self.local_images, self.max_radius,
+                                              {str(pid) for pid in missing})
+            self.images.update(zip(loaded_ids, images))
+        return [self.images[pid] for pid in ids]
+
+    def close(self):
+        if self.screen is not None:
+            pygame.quit()
+        self.images.clear()
+        self.screen = None
+        self.font = None
+
+
+# Assets of the matches run in this process, by where they come from
+_assets = {}
+
+
+def get_assets(config):
+    key = (config['images']['path'], config['images']['local'], config['particles']['max_radius'],
+           config['screen']['width'], config['screen']['height'])
+    if key not in _assets:
+        _assets[key] = MatchAssets(config)
+    return _assets[key]
+
+
+def run_match(config, roster=None, options=None, assets=None):
+    """
+    Play one match with the given players (None: the whole roster) and
+    return its MatchResult. options are the keys of DEFAULT_OPTIONS.
+    """
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    assets = assets or get_assets(config)
+    headless = options['headless']
+    compositor_mode = options['compositor'] and not headless
+    window = not headless and not compositor_mode
+
+    width = config['screen']['width']
+    height = config['screen']['height']
+    fps = config['screen']['fps']
+
+    min_radius = config['particles']['min_radius']
+    max_radius = config['particles']['max_radius']
+    max_hp = config['particles']['max_hp']
+    max_speed = config['particles']['max_speed']
+    acc_magnitude = config['particles']['acc_magnitude']
+
+    bg_color = tuple(config['colors']['background'])
+
+    # Fixed-timestep physics: velocities are in pixels per tick and tick_rate ticks
+    # make one second, whatever fps the match is rendered at.
+    tick_rate = config['physics']['tick_rate']
+    substeps = options['substeps'] or config['physics']['substeps']
+    dt = 1.0 / substeps
+    steps_per_frame = tick_rate * substeps / fps
+
+    # Skip collision checks through stretches where no pair can meet
+    ff_max_particles = config['fast_forward']['max_particles']
+
+    # Particles turn towards (or away from) their nearest opponent
+    steering = config['steering']
+
+    checkpoint_dir = config['checkpoint']['dir']
+    checkpoint_every = config['checkpoint']['every_ticks']
+
+    live_feed_config = config['live_feed']
+    record = options['record'] or config['recording']['enabled']
+    trace_config = config['trace']
+    trace = options['trace'] or trace_config['enabled']
+    replay_config = config['replay']
+
+    # Frames the compositor's render and encode stages may fall behind the physics
+    pipeline_depth = config['video']['pipeline_depth']
+
+    timestamp = options['timestamp'] or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    ids = assets.get_roster_ids(roster)
+
+    if options['shards']:
+        # Sharded engine: no window, no avatars, only the log and the rankings
+        from utils.sharded_engine import run_sharded_match
+        match_index = run_sharded_match(ids, width, height, min_radius, max_radius, max_hp,
+                                        max_speed, acc_magnitude, substeps, timestamp, options['shards'])
+        return MatchResult(timestamp, match_index, max((frame for _, _, frame in match_index.eliminations), default=0))
+
+    # Headless matches draw nothing: no avatars, no pygame
+    images = [None] * len(ids) if headless else assets.get_images(ids, window)
+    screen = assets.screen
+    font = assets.font
+    clock = pygame.time.Clock() if window else None
+
+    # Init frames
+    frames = []
+
+    particles = create_particles(ids, images, min_radius, max_radius, max_hp, max_speed, acc_magnitude, width, height)
+    roster_ids = [p.id for p in particles]
+
+    # Physics clock, counted in substeps so simulated time never drifts
+    step_count = 0
+    step_accumulator = 0.0
+    # Steps left that are known to be collision-free
+    safe_steps = 0
+
+    if options['resume']:
+        checkpoint_path = find_latest_checkpoint(checkpoint_dir) if options['resume'] == 'latest' else options['resume']
+        if checkpoint_path is None:
+            raise FileNotFoundError(f"No checkpoint found in '{checkpoint_dir}'.")
+        particles, meta = resume_from_checkpoint(checkpoint_path, particles)
+        timestamp = meta['timestamp']
+        roster_ids = meta['roster']
+        step_count = meta['step_count']
+        step_accumulator = meta['step_accumulator']
+        safe_steps = meta['safe_steps']
+        substeps = meta['substeps']
+        dt = 1.0 / substeps
+        steps_per_frame = tick_rate * substeps / fps
+        radius = particles[0].radius
+        match_index = MatchIndex(roster_ids)
+        match_index.set_state(meta['eliminations'])
+        print(f"Resuming {timestamp} from tick {step_count // substeps} with {len(particles)} alive")
+    else:
+        radius = get_dynamic_radius(particles, width, height, min_radius, max_radius)
+        # Elimination order, killers and survivors, kept up to date as the match runs
+        match_index = MatchIndex(roster_ids)
+
+    if compositor_mode:
+        # Frames go straight from the compositor's buffers to ffmpeg, none are
+        # kept; drawing and encoding run alongside the physics. Opened only
+        # now that the timestamp is final: a resumed match keeps the checkpoint's
+        compositor = FrameCompositor(width, height, bg_color, font, images={p.id: p.image for p in particles})
+        encoder = VideoEncoder(f"simulations/{timestamp}_simulation.mp4", width, height, fps)
+        pipeline = FramePipeline(compositor, encoder, pipeline_depth)
+
+    checkpoint_path = get_checkpoint_path(checkpoint_dir, timestamp)
+    next_checkpoint = (step_count // substeps // checkpoint_every + 1) * checkpoint_every if checkpoint_every else None
+
+    # Live snapshots for the dashboard
+    live_feed = None
+    if live_feed_config['enabled']:
+        try:
+            live_feed = LiveFeedPublisher(roster_ids, width, height, live_feed_config['name'], live_feed_config['hz'])
+        except FileExistsError as e:
+            # Another match is on the dashboard: leave it there and play this one without
+            print(f"{e}, playing without the live feed")
+
+    # Frame states for the highlight clips
+    recorder = MatchRecorder(roster_ids, width, height, fps) if record else None
+
+    # Positions, velocities and HP for the heatmaps and movement stats
+    tracer = TraceRecorder(roster_ids, width, height, tick_rate, trace_config['every_ticks']) if trace else None
+
+    # Ticks the headless fast-forward must not jump over: the recording keeps
+    # every tick, the trace one in every_ticks
+    sample_every = 1 if recorder is not None else tracer.every if tracer is not None else 0
+
+    # Last seconds of the match, for the slow-motion replay of the final kill
+    replay = ReplayBuffer([p.id for p in particles], replay_config['seconds'] * fps) if replay_config['enabled'] and not headless else None
+    if replay is not None and window:
+        # The window is drawn with pygame, the replay with a compositor
+        compositor = FrameCompositor(width, height, bg_color, font, images={p.id: p.image for p in particles})
+
+    def get_final_replay():
+        # Snapshots of the final kill, slowed down and zoomed on the two players
+        if replay is None or not match_index.eliminations:
+            return []
+        victim, killer, _ = match_index.eliminations[-1]
+        focus, size = replay.get_focus(killer, victim)
+        if focus is None:
+            return []
+        return replay.replay_snapshots(focus, size, width, height, replay_config['zoom'], replay_config['slowdown'])
+
+    # A SIGTERM (e.g. from the job scheduler) saves a checkpoint before stopping
+    # (signal handlers can only be set from the main thread)
+    stop_requested = False
+
+    def request_stop(signum, frame):
+        nonlocal stop_requested
+        stop_requested = True
+
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.signal(signal.SIGTERM, request_stop)
+
+    running = True
+    try:
+        # Main loop
+        while running:
+            if window:
+                clock.tick(fps)
+                screen.fill(bg_color)
+
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+
+            # Advance the physics by as many fixed steps as this frame covers
+            # (headless runs have no frames, so they advance one tick at a time)
+            step_accumulator += substeps if headless else steps_per_frame
+            while step_accumulator >= 1:
+                if step_count % substeps == 0:
+                    # The radius follows the alive count and is updated once per tick,
+                    # so rendered and headless runs follow the same trajectory
+                    radius = get_dynamic_radius(particles, width, height, min_radius, max_radius)
+
+                    if headless and safe_steps >= substeps and not steering['enabled']:
+                        # Nothing to draw, so jump whole ticks towards the next possible collision
+                        # (not with steering, which turns the particles every tick)
+                        jump = safe_steps - safe_steps % substeps
+                        if sample_every:
+                            # Stop before the next tick the recording or the trace keeps
+                            tick = step_count // substeps
+                            jump = min(jump, ((tick // sample_every + 1) * sample_every - tick - 1) * substeps)
+                        if jump:
+                            advance_particles(particles, jump, dt)
+                            step_count += jump
+                            safe_steps -= jump
+
+                    if steering['enabled']:
+                        steer_particles(particles, steering['turn_rate'], steering['seek'], steering['flee_hp'],
+                                        steering['sight'] or np.inf)
+
+                step_accumulator -= 1
+                frame_number = step_count // substeps
+
+                for p in particles:
+                    p.move(dt)
+                step_count += 1
+
+                if safe_steps > 0:
+                    safe_steps -= 1
+                    continue
+
+                cell_size, grid_width, grid_height = get_collision_grid(radius, particles, width, height)
+                check_collisions(radius, cell_size, grid_width, grid_height, particles, timestamp, frame_number, match_index)
+
+                # Remove dead particles from the list
+                particles = remove_dead_particles(particles)
+
+                # Plan ahead only while the radius is current: a death can grow the
+                # radius at the next tick, which moves particles without velocity
+                if len(particles) <= ff_max_particles and get_dynamic_radius(particles, width, height, min_radius, max_radius, change_radius=False) == radius:
+                    safe_steps = get_safe_steps(particles, radius, dt)
+
+                if len(particles) <= 1:
+                    break
+
+            alive_count = len(particles)
+
+            if live_feed is not None:
+                live_feed.publish(step_count // substeps, particles, radius, match_index, force=alive_count <= 1)
+
+            if recorder is not None:
+                recorder.record(step_count // substeps, particles, radius, alive_count)
+
+            if tracer is not None:
+                tracer.record(step_count // substeps, particles, radius, force=alive_count <= 1)
+
+            if replay is not None:
+                replay.record(step_count // substeps, particles, radius, alive_count)
+
+            # Periodic checkpoint (only at frame boundaries, so the state is complete)
+            if alive_count > 1 and (stop_requested or (next_checkpoint is not None and step_count // substeps >= next_checkpoint)):
+                save_checkpoint(checkpoint_path, roster_ids, particles, {
+                    'timestamp': timestamp,
+                    'roster': [str(pid) for pid in roster_ids],
+                    'step_count': step_count,
+                    'step_accumulator': step_accumulator,
+                    'safe_steps': safe_steps,
+                    'substeps': substeps,
+                    'eliminations': match_index.get_state(),
+                })
+                if next_checkpoint is not None:
+                    next_checkpoint = (step_count // substeps // checkpoint_every + 1) * checkpoint_every
+                if stop_requested:
+                    if live_feed is not None:
+                        live_feed.close()
+                    if compositor_mode:
+                        pipeline.close()
+                    print(f"Stopped at tick {step_count // substeps}, resume with --resume {checkpoint_path}")
+                    return MatchResult(timestamp, match_index, step_count // substeps, stopped=True,
+                                       checkpoint_path=checkpoint_path)
+
+            if headless:
+                if alive_count <= 1:
+                    winner = particles[0].id if particles else None
+                    print(f"Vencedor: {winner} ({step_count // substeps} ticks)")
+                    running = False
+                continue
+
+            if compositor_mode:
+                snapshot = take_snapshot(particles, radius, alive_count)
+                if alive_count == 1:
+                    for replay_snapshot in get_final_replay():
+                        pipeline.submit(replay_snapshot)
+                    # Hold the winner screen for 2 seconds, like the rendered video
+                    pipeline.submit(snapshot, repeat=1 + 2 * fps, overlay=lambda surface: display_winner(
+                        font, particles, surface, width, height, radius, timestamp, match_index))
+                else:
+                    pipeline.submit(snapshot)
+                if alive_count <= 1:
+                    running = False
+                continue
+
+            if alive_count == 1:
+                for replay_snapshot in get_final_replay():
+                    frame = compositor.compose_snapshot(replay_snapshot)
+                    pygame.surfarray.blit_array(screen, frame.swapaxes(0, 1))
+                    pygame.display.flip()
+                    frames = add_particle_to_frames(screen, frames)
+                    pygame.event.pump()
+                    clock.tick(fps)
+                screen.fill(bg_color)
+
+            # Draw particles
+            for p in particles:
+                p.draw(screen)
+
+            # Show count of alive particles
+            text = font.render(f"Vivos: {alive_count}", True, (255,255,255))
+            screen.blit(text, (30, 30))
+
+            # Show winner if only one particle remains (the last frame: the loop ends here)
+            if alive_count == 1:
+                display_winner(font, particles, screen, width, height, radius, timestamp, match_index)
+
+                frames = add_particle_to_frames(screen, frames)
+
+                pygame.time.wait(2000)
+                running = False
+
+            pygame.display.flip()
+
+            frames = add_particle_to_frames(screen, frames)
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    if live_feed is not None:
+        # Final state stays on the dashboard for a while
+        live_feed.close(live_feed_config['linger'])
+
+    # The match is over, nothing left to resume
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    # Rankings come straight from the index, no need to parse the collision log again
+    match_index.write_detailed_rankings(timestamp)
+
+    if recorder is not None:
+        recorder.save(get_recording_path(timestamp))
+
+    if tracer is not None:
+        tracer.save(get_trace_path(timestamp))
+
+    result = MatchResult(timestamp, match_index, step_count // substeps)
+    if compositor_mode:
+        pipeline.close()
+    elif window:
+        import moviepy.editor as mpy
+        # Repeat last frame for 2 seconds
+        frames += [frames[-1]] * 2 * fps
+
+        # Free what the video does not need before encoding
+        particles = None
+        gc.collect()
+
+        clip = mpy.ImageSequenceClip(frames, fps=fps)
+        clip.write_videofile(result.video_path, codec='libx264')
+    return result
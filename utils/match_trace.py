@@ -0,0 +1,152 @@
+import os
+import numpy as np
+
+TRACES_DIR = "simulations/traces"
+
+# Movement trace of a match: position, velocity and HP of every alive player
+# at every recorded tick, for the heatmaps and movement stats of
+# utils/trace_analytics.py. Unlike the recordings (utils/match_recording.py),
+# which keep float frames for redrawing them, a trace is meant to be kept for
+# every match, so it is stored small:
+#   - values are quantized to int16 fixed point, each channel with the finest
+#     step that still fits its largest value in the match (at most the
+#     *_SCALE constants), so nothing is clipped however fast players go;
+#   - rows are grouped by player, each player's rows in tick order, and every
+#     row holds the difference from the player's previous row (the first row
+#     holds the value itself). Players move a few pixels per tick, so the
+#     differences are tiny and mostly repeated, and compress to a fraction of
+#     the raw size. Differences wrap around like int16 does, so decoding with
+#     an int16 cumulative sum gives back the exact quantized values.
+# A player's rows are first[p]:first[p] + count[p] of the recorded ticks:
+# players only ever leave the arena, so they are always contiguous.
+CHANNELS = ('x', 'y', 'vx', 'vy', 'hp')
+POS_SCALE = 16       # 1/16 px
+VEL_SCALE = 128      # 1/128 px/tick
+HP_SCALE = 10000     # HP as a fraction of max_hp
+INT16_MAX = 32767
+
+
+def get_trace_path(timestamp, traces_dir=TRACES_DIR):
+    return os.path.join(traces_dir, f"{timestamp}.npz")
+
+def get_scale(values):
+    # Per channel: the finest scale that keeps every value inside an int16
+    peak = np.abs(values).max(axis=0) if len(values) else np.zeros(len(CHANNELS))
+    finest = np.array([POS_SCALE, POS_SCALE, VEL_SCALE, VEL_SCALE, HP_SCALE], dtype=np.float64)
+    return np.minimum(finest, INT16_MAX / np.maximum(peak, 1e-9))
+
+def encode_deltas(values, offsets):
+    # Row minus the previous row, except at the start of every player
+    deltas = values.copy()
+    deltas[1:] -= values[:-1]
+    starts = offsets[:-1][offsets[:-1] < offsets[1:]]
+    deltas[starts] = values[starts]
+    return deltas
+
+def decode_deltas(deltas, offsets):
+    # Running sum over everything, minus what the previous players added
+    values = np.cumsum(deltas, axis=0, dtype=np.int16)
+    count = np.diff(offsets)
+    starts = offsets[:-1][count > 0]
+    before = np.zeros((len(starts), deltas.shape[1]), dtype=np.int16)
+    before[starts > 0] = values[starts[starts > 0] - 1]
+    values -= np.repeat(before, count[count > 0], axis=0)
+    return values
+
+
+class TraceRecorder:
+    def __init__(self, roster_ids, width, height, tick_rate, every=1):
+        self.roster = [str(pid) for pid in roster_ids]
+        self.slot = {pid: i for i, pid in enumerate(self.roster)}
+        self.width = width
+        self.height = height
+        self.tick_rate = tick_rate
+        self.every = max(1, every)
+        self.ticks = []
+        self.radius = []
+        self.index = []
+        self.values = []
+
+    def record(self, tick, particles, radius, force=False):
+        # Only ticks on every boundaries (and the last one, with force)
+        if tick % self.every and not force:
+            return
+        alive = [p for p in particles if p.alive]
+        self.ticks.append(tick)
+        self.radius.append(radius)
+        self.index.append(np.array([self.slot[str(p.id)] for p in alive], dtype=np.int32))
+        # Quantized at save, once the range of every channel is known
+        self.values.append(np.array([(p.pos[0], p.pos[1], p.vel[0], p.vel[1], p.hp / p.max_hp) for p in alive],
+                                    dtype=np.float32).reshape(-1, len(CHANNELS)))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        counts = [len(index) for index in self.index]
+        index = np.concatenate(self.index) if self.index else np.empty(0, dtype=np.int32)
+        values = np.concatenate(self.values) if self.values else np.empty((0, len(CHANNELS)), dtype=np.float32)
+        scale = get_scale(values)
+        values = np.rint(values * scale).astype(np.int16)
+        frame = np.repeat(np.arange(len(counts)), counts)
+
+        # Player by player, keeping the tick order within each one
+        order = np.argsort(index, kind='stable')
+        index, values, frame = index[order], values[order], frame[order]
+        count = np.bincount(index, minlength=len(self.roster))
+        offsets = np.concatenate([[0], np.cumsum(count)]).astype(np.int64)
+        first = np.zeros(len(self.roster), dtype=np.int32)
+        first[count > 0] = frame[offsets[:-1][count > 0]]
+
+        np.savez_compressed(
+            path,
+            roster=np.array(self.roster),
+            size=np.array([self.width, self.height, self.tick_rate, self.every]),
+            scale=scale,
+            ticks=np.array(self.ticks, dtype=np.int64),
+            radius=np.array(self.radius, dtype=np.int32),
+            first=first,
+            count=count.astype(np.int32),
+            deltas=encode_deltas(values, offsets),
+        )
+
+
+class MatchTrace:
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.roster = [str(pid) for pid in data['roster']]
+            self.slot = {pid: i for i, pid in enumerate(self.roster)}
+            self.width, self.height, self.tick_rate, self.every = (int(v) for v in data['size'])
+            self.ticks = data['ticks']
+            self.radius = data['radius']
+            self.first = data['first']
+            self.count = data['count']
+            scale = data['scale']
+            deltas = data['deltas']
+        self.offsets = np.concatenate([[0], np.cumsum(self.count)]).astype(np.int64)
+
+        # One row per player and recorded tick, as float arrays
+        values = decode_deltas(deltas, self.offsets) / scale
+        self.pos = values[:, 0:2]
+        self.vel = values[:, 2:4]
+        self.hp_ratio = values[:, 4]
+        # Who and which recorded tick every row is
+        self.player = np.repeat(np.arange(len(self.roster)), self.count)
+        self.frame = np.arange(len(values)) - np.repeat(self.offsets[:-1] - self.first, self.count)
+        # Match time each recorded tick stands for, up to the next one
+        gaps = np.diff(self.ticks, append=self.ticks[-1] + self.every) if len(self.ticks) else self.ticks
+        self.frame_seconds = gaps / self.tick_rate
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def rows_of(self, player):
+        # Rows of one player, in tick order
+        i = self.slot[str(player)]
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def rows_mask(self, players=None):
+        # Rows of the given players (None: everyone)
+        if players is None:
+            return np.ones(len(self.player), dtype=bool)
+        wanted = np.zeros(len(self.roster), dtype=bool)
+        wanted[[self.slot[str(p)] for p in players if str(p) in self.slot]] = True
+        return wanted[self.player]
@@ -0,0 +1,126 @@
+import time
+import queue
+import threading
+
+# Rendered matches used to do physics, drawing and encoding one after the
+# other for every frame. Here they are stages: the simulation loop (physics)
+# hands a snapshot of the frame to a render thread, which draws it with the
+# FrameCompositor into one of a few recycled buffers and hands it to an
+# encode thread feeding ffmpeg (itself a separate process). Queues are
+# bounded, so a slow stage holds the others back instead of piling up frames,
+# and a match takes about as long as its slowest stage.
+DONE = None
+
+
+class FramePipeline:
+    def __init__(self, compositor, encoder, depth=4):
+        self.compositor = compositor
+        self.encoder = encoder
+        self.depth = depth
+        self.error = None
+        # Seconds each stage spent working (not waiting)
+        self.busy = {'physics': 0.0, 'render': 0.0, 'encode': 0.0}
+        self.frames = 0
+        self.started = time.perf_counter()
+        self._last_submit = self.started
+
+        if depth > 0:
+            self.snapshots = queue.Queue(maxsize=depth)
+            self.rendered = queue.Queue(maxsize=depth)
+            # Every buffer is either free, being drawn, queued or being
+            # encoded: depth + 2 is enough to never wait on a free buffer
+            # while the encoder keeps up
+            self.free = queue.Queue()
+            for _ in range(depth + 2):
+                self.free.put(compositor.new_frame())
+            self.threads = [
+                threading.Thread(target=self._render_loop, name="render", daemon=True),
+                threading.Thread(target=self._encode_loop, name="encode", daemon=True),
+            ]
+            for thread in self.threads:
+                thread.start()
+
+    def submit(self, snapshot, repeat=1, overlay=None):
+        """
+        Queue one frame (see compositor.take_snapshot). repeat writes it that
+        many times; overlay(surface) draws on top of it with pygame.
+        Blocks while the render stage is `depth` frames behind.
+        """
+        now = time.perf_counter()
+        self.busy['physics'] += now - self._last_submit
+        if self.error:
+            raise RuntimeError("video pipeline failed") from self.error
+
+        if self.depth > 0 and overlay is None:
+            self.snapshots.put((snapshot, repeat))
+        else:
+            # pygame only draws on the display from the main thread: let the
+            # queued frames through first, then draw this one here
+            if self.depth > 0:
+                self.snapshots.join()
+                self.rendered.join()
+            # No threads: same stages, one after the other
+            self._render(snapshot, overlay, self.compositor.frame)
+            self._encode(self.compositor.frame, repeat)
+        self.frames += 1
+        self._last_submit = time.perf_counter()
+
+    def close(self):
+        self.busy['physics'] += time.perf_counter() - self._last_submit
+        if self.depth > 0:
+            self.snapshots.put(DONE)
+            for thread in self.threads:
+                thread.join()
+        self.encoder.close()
+        if self.error:
+            raise RuntimeError("video pipeline failed") from self.error
+
+        wall = time.perf_counter() - self.started
+        stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.busy.items())
+        print(f"Video: {self.frames} frames in {wall:.1f}s ({stages})")
+
+    # ---- stages ---- #
+    def _render(self, snapshot, overlay, frame):
+        start = time.perf_counter()
+        self.compositor.compose_snapshot(snapshot, frame)
+        if overlay is not None:
+            self.compositor.compose_with_surface(overlay, frame)
+        self.busy['render'] += time.perf_counter() - start
+
+    def _encode(self, frame, repeat):
+        start = time.perf_counter()
+        self.encoder.write(frame, repeat)
+        self.busy['encode'] += time.perf_counter() - start
+
+    def _render_loop(self):
+        while True:
+            item = self.snapshots.get()
+            if item is DONE:
+                self.rendered.put(DONE)
+                return
+            # After a failure keep draining, so submit() never blocks forever
+            if not self.error:
+                snapshot, repeat = item
+                frame = self.free.get()
+                try:
+                    self._render(snapshot, None, frame)
+                    self.rendered.put((frame, repeat))
+                except BaseException as e:
+                    self.error = e
+                    self.free.put(frame)
+            self.snapshots.task_done()
+
+    def _encode_loop(self):
+        while True:
+            item = self.rendered.get()
+            if item is DONE:
+                return
+            frame, repeat = item
+            try:
+                if not self.error:
+                    self._encode(frame, repeat)
+            except BaseException as e:
+                self.error = e
+            finally:
+                self.free.put(frame)
+                self.rendered.task_done()
@@ -0,0 +1,81 @@
+import copy
+import uuid
+import sqlite3
+import threading
+import functools
+from collections import OrderedDict
+
+# Dashboard queries are cached until the data changes, not for a fixed time.
+# Whatever writes to the stats database (log_manager's ingest, loading
+# partitions, pipeline runs) stamps a new data version in the meta table when
+# it is done, and the cache drops everything as soon as it sees a different
+# stamp. The stamp is random, so a rebuilt database never repeats an old one.
+# (PRAGMA data_version would need one connection kept open, and does not see
+# the file being replaced.)
+VERSION_KEY = "data_version"
+
+
+def init_meta_table(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+def bump_data_version(conn):
+    init_meta_table(conn)
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (VERSION_KEY, uuid.uuid4().hex))
+    conn.commit()
+
+def read_data_version(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (VERSION_KEY,)).fetchone()
+    except sqlite3.OperationalError:
+        # Database from before the meta table: never changes under us
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+class VersionedCache:
+    """
+    LRU cache of query results, emptied whenever get_version() changes.
+    Results are handed out as copies, so callers can modify them freely.
+    """
+    def __init__(self, get_version, maxsize=512):
+        self.get_version = get_version
+        self.maxsize = maxsize
+        self.version = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def cached(self, func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            version = self.get_version()
+            with self.lock:
+                if version != self.version:
+                    self.entries.clear()
+                    self.version = version
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(self.entries[key])
+                self.misses += 1
+
+            result = func(*args, **kwargs)
+            with self.lock:
+                # The data changed while the query ran: do not keep the result
+                if self.version == version:
+                    self.entries[key] = result
+                    while len(self.entries) > self.maxsize:
+                        self.entries.popitem(last=False)
+            return copy.deepcopy(result)
+        return wrapper
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
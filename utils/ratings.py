@@ -0,0 +1,163 @@
+import numpy as np
+
+# Skill rating of every player, TrueSkill-style: a mean mu and an uncertainty
+# sigma, shown as mu - 3 * sigma (what the player is at least, with high
+# confidence, so one lucky day does not top the table).
+# Ratings move one day at a time with Weng & Lin's Bradley-Terry update (the
+# one behind OpenSkill): every player is compared with the players who
+# finished right before and right after them, and every kill counts as a win
+# of the killer over the victim. Both are linear in the size of the day, and
+# a day only reads and writes the ratings of who played, so ingesting a day
+# costs the same however long the history is. The day's new ratings are kept
+# in rating_history (partitioned with the other daily tables), player_rating
+# holds the latest one of each player.
+MU = 25.0
+SIGMA = MU / 3
+BETA = SIGMA / 2
+TAU = SIGMA / 100   # Uncertainty added every day played, so ratings keep moving
+KAPPA = 1e-4        # Floor of the variance shrink factor
+DECIMALS = 4        # Stored precision: the state is exactly what the partitions hold
+
+
+def init_rating_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS rating_history (
+        date TEXT,
+        player TEXT,
+        mu REAL,
+        sigma REAL,
+        matches INTEGER,
+        PRIMARY KEY (date, player)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rating_history_player ON rating_history (player, date)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS player_rating (
+        player TEXT PRIMARY KEY,
+        mu REAL,
+        sigma REAL,
+        matches INTEGER,
+        last_date TEXT
+    )
+    """)
+
+def conservative(mu, sigma):
+    return mu - 3 * sigma
+
+
+def update_ratings(mu, sigma, winners, losers, beta=BETA, kappa=KAPPA):
+    """
+    One Bradley-Terry step for the (winners[i] beat losers[i]) index pairs,
+    all against the ratings from before the day. Returns the new mu, sigma.
+    """
+    var = sigma ** 2
+    c = np.sqrt(var[winners] + var[losers] + 2 * beta ** 2)
+    p_win = 1 / (1 + np.exp((mu[losers] - mu[winners]) / c))
+
+    # Surprise of each result moves the mean, its information shrinks sigma
+    omega = np.zeros_like(mu)
+    np.add.at(omega, winners, var[winners] / c * (1 - p_win))
+    np.add.at(omega, losers, -var[losers] / c * (1 - p_win))
+    delta = np.zeros_like(mu)
+    info = p_win * (1 - p_win) / c ** 3
+    np.add.at(delta, winners, sigma[winners] * var[winners] * info)
+    np.add.at(delta, losers, sigma[losers] * var[losers] * info)
+
+    # Averaged per player, so a day weighs like one game: summed, the last
+    # survivors (dozens of kills, all against the ratings from before the
+    # day) would jump far and have their sigma collapse in a single day
+    count = np.bincount(np.concatenate([winners, losers]), minlength=len(mu))
+    count = np.maximum(count, 1)
+    return mu + omega / count, sigma * np.sqrt(np.maximum(1 - delta / count, kappa))
+
+
+def rate_day(conn, iso_date):
+    """Update the ratings of everyone in the day's ranking. Returns how many."""
+    cur = conn.cursor()
+    # Finishing order, winner (rank 0) first
+    cur.execute("""
+        SELECT r.player, p.mu, p.sigma, p.matches
+        FROM ranking r LEFT JOIN player_rating p ON p.player = r.player
+        WHERE r.date = ?
+        ORDER BY r.rank = 0 DESC, r.rank
+    """, (iso_date,))
+    rows = cur.fetchall()
+    if len(rows) < 2:
+        return 0
+    players = [r[0] for r in rows]
+    slot = {player: i for i, player in enumerate(players)}
+    mu = np.array([MU if r[1] is None else r[1] for r in rows])
+    sigma = np.array([SIGMA if r[2] is None else r[2] for r in rows])
+    matches = np.array([r[3] or 0 for r in rows]) + 1
+    sigma = np.sqrt(sigma ** 2 + TAU ** 2)
+
+    # Neighbours in the finishing order, then the kills
+    order = np.arange(len(players))
+    winners = [order[:-1]]
+    losers = [order[1:]]
+    cur.execute("SELECT killer, victim, kills FROM daily_head_to_head WHERE date = ?", (iso_date,))
+    kills = [(slot[k], slot[v], n) for k, v, n in cur.fetchall() if k in slot and v in slot]
+    if kills:
+        killer, victim, count = (np.array(col) for col in zip(*kills))
+        winners.append(np.repeat(killer, count))
+        losers.append(np.repeat(victim, count))
+    mu, sigma = update_ratings(mu, sigma, np.concatenate(winners), np.concatenate(losers))
+
+    mu = np.round(mu, DECIMALS).tolist()
+    sigma = np.round(sigma, DECIMALS).tolist()
+    matches = matches.tolist()
+    cur.executemany(
+        "INSERT OR REPLACE INTO rating_history (date, player, mu, sigma, matches) VALUES (?, ?, ?, ?, ?)",
+        [(iso_date, p, m, s, n) for p, m, s, n in zip(players, mu, sigma, matches)]
+    )
+    cur.executemany("""
+        INSERT INTO player_rating (player, mu, sigma, matches, last_date) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(player) DO UPDATE SET
+            mu = excluded.mu, sigma = excluded.sigma, matches = excluded.matches,
+            last_date = MAX(last_date, excluded.last_date)
+    """, [(p, m, s, n, iso_date) for p, m, s, n in zip(players, mu, sigma, matches)])
+    conn.commit()
+    return len(players)
+
+def rate_pending_days(conn, dates=None):
+    """
+    Rate every day (of dates, if given) with a ranking and no ratings yet,
+    oldest first, and return those dates. Normally that is only the days
+    just ingested; a day that shows up after later days were rated goes on
+    top of the current ratings instead of replaying everything after it.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT DISTINCT date FROM ranking
+        WHERE date NOT IN (SELECT DISTINCT date FROM rating_history)
+        ORDER BY date
+    """)
+    pending = [r[0] for r in cur.fetchall() if dates is None or r[0] in dates]
+    return [iso_date for iso_date in pending if rate_day(conn, iso_date)]
+
+def rebuild_ratings(conn):
+    """
+    Rate the whole history again from scratch, oldest day first. This is the
+    one-time backfill of an install that has days from before the ratings
+    (log_manager --rate-history), and a way back to the exact order-by-date
+    ratings after days were ingested out of order. Returns the dates rated.
+    """
+    conn.execute("DELETE FROM rating_history")
+    conn.execute("DELETE FROM player_rating")
+    conn.commit()
+    return rate_pending_days(conn)
+
+def refresh_player_ratings(conn, dates):
+    # After loading partitions: latest rating of everyone who played on those days
+    if not dates:
+        return
+    conn.execute(f"""
+        INSERT OR REPLACE INTO player_rating (player, mu, sigma, matches, last_date)
+        SELECT player, mu, sigma, matches, date FROM (
+            SELECT h.*, ROW_NUMBER() OVER (PARTITION BY player ORDER BY date DESC) AS rn
+            FROM rating_history h
+            WHERE player IN (SELECT player FROM rating_history WHERE date IN ({', '.join('?' * len(dates))}))
+        )
+        WHERE rn = 1
+    """, list(dates))
+    conn.commit()
@@ -0,0 +1,90 @@
+from collections import deque
+
+import numpy as np
+
+# The last few seconds of the match, kept as compact frame state (alive
+# players, positions, HP) in a ring buffer: old frames fall off the end, so
+# memory stays the same however long the match runs. At the end the frames
+# around the final kill are drawn again, slowed down and zoomed on the two
+# players, before the winner screen.
+
+
+class ReplayBuffer:
+    def __init__(self, roster_ids, capacity):
+        # Ids as the compositor knows them, looked up as strings
+        self.roster = list(roster_ids)
+        self.slot = {str(pid): i for i, pid in enumerate(self.roster)}
+        self.frames = deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def record(self, tick, particles, radius, alive_count):
+        alive = [p for p in particles if p.alive]
+        self.frames.append((
+            tick,
+            np.array([self.slot[str(p.id)] for p in alive], dtype=np.int32),
+            np.array([p.pos for p in alive], dtype=np.float32).reshape(-1, 2),
+            np.clip(np.array([p.hp / p.max_hp for p in alive], dtype=np.float16), 0, 1),
+            radius,
+            alive_count,
+        ))
+
+    def _find(self, frame, player):
+        # Where player is in a buffered frame, or None when not alive
+        _, index, pos, _, _, _ = frame
+        found = np.flatnonzero(index == self.slot[str(player)])
+        return pos[found[0]].astype(float) if len(found) else None
+
+    def get_focus(self, killer, victim):
+        """
+        Center and size (w, h) of the box holding both avatars the last time
+        both were alive, else around the killer alone.
+        """
+        for frame in reversed(self.frames):
+            a, b = self._find(frame, killer), self._find(frame, victim)
+            if a is not None and b is not None:
+                return (a + b) / 2, np.abs(a - b) + 4 * frame[4]
+        if self.frames and self._find(self.frames[-1], killer) is not None:
+            return self._find(self.frames[-1], killer), np.full(2, 4.0 * self.frames[-1][4])
+        return None, None
+
+    def replay_snapshots(self, focus, size, width, height, zoom=2.0, slowdown=4, caption="REPLAY"):
+        """
+        The buffered frames as compositor snapshots (see take_snapshot),
+        zoomed on focus and slowed down: slowdown frames are drawn for every
+        buffered one, moving the players in between.
+        """
+        # No closer than what keeps the box of size around focus in view
+        zoom = max(1.0, min(zoom, width / size[0], height / size[1]))
+        # Keep the zoomed view inside the arena
+        half = np.array([width, height]) / (2 * zoom)
+        center = np.clip(focus, half, np.array([width, height]) - half)
+        screen_center = np.array([width, height]) / 2
+
+        frames = list(self.frames)
+        for current, following in zip(frames, frames[1:] + [None]):
+            _, index, pos, hp_ratio, radius, alive_count = current
+            steps = slowdown if following is not None else 1
+            if following is not None:
+                # Players alive in both frames glide towards their next position
+                target = pos.copy()
+                _, next_index, next_pos, _, _, _ = following
+                _, here, there = np.intersect1d(index, next_index, return_indices=True)
+                target[here] = next_pos[there]
+            for step in range(steps):
+                t = step / steps
+                moved = pos if t == 0 else pos + (target - pos) * t
+                zoomed = (moved - center) * zoom + screen_center
+                zoomed_radius = int(round(radius * zoom))
+                # Only who is in view; the compositor keeps avatars inside the frame
+                visible = ((zoomed[:, 0] >= 0) & (zoomed[:, 0] < width)
+                           & (zoomed[:, 1] >= 0) & (zoomed[:, 1] < height))
+                yield {
+                    'ids': [self.roster[i] for i in index[visible]],
+                    'pos': zoomed[visible],
+                    'hp_ratio': hp_ratio[visible].astype(float),
+                    'radius': zoomed_radius,
+                    'alive_count': alive_count,
+                    'caption': caption,
+                }
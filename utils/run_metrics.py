@@ -0,0 +1,174 @@
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+
+from utils.stats_partitions import STATS_DIR
+from utils.query_cache import bump_data_version
+
+# Every stage of execute.sh runs through this wrapper:
+#   python -m utils.run_metrics simulation -- python simulation.py
+# It times the stage and takes its peak RSS, the stage adds what it produced
+# (frames, rows, bytes written) with report(), and the result goes to the
+# pipeline_runs table of the stats database. Runs are also appended to
+# data/stats/pipeline_runs.csv, which is committed with the partitions, so a
+# rebuilt database (and the dashboard) keeps the whole history. The stages
+# that run the commit itself (--local) go to pipeline_runs_local.csv instead,
+# which is not committed: written after the commit, they would leave the tree
+# dirty and only ship with the next day's commit.
+DB_PATH = "data/daily_stats.db"
+RUNS_FILE = "pipeline_runs.csv"
+LOCAL_RUNS_FILE = "pipeline_runs_local.csv"
+RUN_COLUMNS = ['run_id', 'stage', 'started_at', 'wall_time', 'peak_rss_mb', 'frames', 'rows', 'bytes_written', 'exit_code']
+COUNTERS = ['frames', 'rows', 'bytes_written']
+METRICS_ENV = "PIPELINE_METRICS_FILE"
+RUN_ID_ENV = "PIPELINE_RUN_ID"
+
+
+def init_runs_table(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS pipeline_runs (
+        run_id TEXT,
+        stage TEXT,
+        started_at TEXT,
+        wall_time REAL,
+        peak_rss_mb REAL,
+        frames INTEGER,
+        rows INTEGER,
+        bytes_written INTEGER,
+        exit_code INTEGER,
+        PRIMARY KEY (run_id, stage)
+    )
+    """)
+
+
+# ========= STAGE SIDE ========= #
+def report(**counts):
+    """
+    Add to the counters (frames, rows, bytes_written) of the stage running
+    under the wrapper. Does nothing when the stage was started by hand.
+    """
+    path = os.environ.get(METRICS_ENV)
+    if not path:
+        return
+    current = {}
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, 'r') as f:
+            current = json.load(f)
+    for key, value in counts.items():
+        current[key] = current.get(key, 0) + int(value)
+    with open(path, 'w') as f:
+        json.dump(current, f)
+
+def file_size(*paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+def count_csv_rows(path):
+    # Data rows, without the header
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+# ========= WRAPPER SIDE ========= #
+def record_run(run, db_path=DB_PATH, stats_dir=STATS_DIR, runs_file=RUNS_FILE):
+    os.makedirs(stats_dir, exist_ok=True)
+    runs_path = os.path.join(stats_dir, runs_file)
+    write_header = not os.path.exists(runs_path)
+    with open(runs_path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RUN_COLUMNS, lineterminator='\n')
+        if write_header:
+            writer.writeheader()
+        writer.writerow(run)
+
+    conn = sqlite3.connect(db_path)
+    init_runs_table(conn)
+    conn.execute(
+        f"INSERT OR REPLACE INTO pipeline_runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+        [run[c] for c in RUN_COLUMNS]
+    )
+    conn.commit()
+    bump_data_version(conn)
+    conn.close()
+
+def sync_pipeline_runs(conn, stats_dir=STATS_DIR):
+    # Load the runs (committed and local) this database does not have yet; returns how many
+    init_runs_table(conn)
+    rows = []
+    for runs_file in (RUNS_FILE, LOCAL_RUNS_FILE):
+        runs_path = os.path.join(stats_dir, runs_file)
+        if os.path.exists(runs_path):
+            with open(runs_path, 'r', newline='') as f:
+                rows += [[row[c] or None for c in RUN_COLUMNS] for row in csv.DictReader(f)]
+    if not rows:
+        return 0
+    before = conn.total_changes
+    conn.executemany(
+        f"INSERT OR IGNORE INTO pipeline_runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+        rows
+    )
+    conn.commit()
+    added = conn.total_changes - before
+    if added:
+        bump_data_version(conn)
+    return added
+
+def run_stage(stage, command, run_id=None, db_path=DB_PATH, stats_dir=STATS_DIR, local=False):
+    """
+    Run one stage as a child process, record its metrics and return its exit
+    code. local: record it in the uncommitted runs file.
+    """
+    run_id = run_id or os.environ.get(RUN_ID_ENV) or datetime.now().strftime("%Y%m%d_%H%M%S")
+    fd, metrics_path = tempfile.mkstemp(prefix="pipeline_", suffix=".json")
+    os.close(fd)
+    env = dict(os.environ, **{METRICS_ENV: metrics_path, RUN_ID_ENV: run_id})
+
+    started_at = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    try:
+        exit_code = subprocess.run(command, env=env).returncode
+        wall_time = time.perf_counter() - start
+        with open(metrics_path, 'r') as f:
+            content = f.read()
+        counts = json.loads(content) if content else {}
+    finally:
+        os.remove(metrics_path)
+
+    # This process only ever waits for the stage, so the largest resident set
+    # among its children is the stage's (ru_maxrss is in KB on Linux)
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    run = {
+        'run_id': run_id,
+        'stage': stage,
+        'started_at': started_at,
+        'wall_time': round(wall_time, 3),
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        **{c: counts.get(c) for c in COUNTERS},
+        'exit_code': exit_code,
+    }
+    record_run(run, db_path, stats_dir, LOCAL_RUNS_FILE if local else RUNS_FILE)
+    print(f"[{stage}] {run['wall_time']:.1f}s, peak RSS {run['peak_rss_mb']:.0f} MB"
+          + "".join(f", {c} {counts[c]}" for c in COUNTERS if c in counts))
+    return exit_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one pipeline stage and record its metrics in pipeline_runs.")
+    parser.add_argument('--local', action='store_true',
+                        help="Record the run in the uncommitted runs file (stages that run after git add).")
+    parser.add_argument('stage', help="Stage name, e.g. simulation.")
+    parser.add_argument('command', nargs=argparse.REMAINDER, help="Command to run, after --.")
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not command:
+        parser.error("no command to run")
+    sys.exit(run_stage(args.stage, command, local=args.local))
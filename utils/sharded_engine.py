@@ -0,0 +1,439 @@
+import csv
+import math
+import random
+import threading
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+from utils.helpers import get_dynamic_radius, assign_position, get_segment_contact_time
+from utils.match_index import MatchIndex
+
+# Headless engine for arenas with far more players than the per-particle loop
+# can handle. The arena is cut into vertical strips, one worker process each.
+# All particle state lives in one shared memory block, its rows sorted by x:
+# the strip of a worker is one range of rows (bounds), so a worker only ever
+# reads its own rows and those of the next strip, never the whole arena.
+#
+# Every physics step is one message to the workers, who sync among
+# themselves with a barrier between its three phases:
+#   move     every worker moves the particles of its strip and publishes how
+#            far they went and the x range they now cover
+#   collide  even strips resolve the pairs of their strip and of the halo
+#   collide  (rows of the next strip within reach), then odd strips do the
+#            same. Two strips worked on at the same time are never
+#            neighbours, so no particle is touched by two workers at once.
+# Particles drift out of their strip's x range, and strips two apart must
+# stay out of reach of each other: when they get close (or many rows are
+# dead) the coordinator sorts the alive rows again and cuts new strips of
+# about the same number of particles. If a step still finds two such strips
+# in reach, the first worker resolves every pair of that step alone.
+# The coordinator merges the kills of all strips into one collision log.
+
+THR = 0.1  # Same wall threshold as Particle
+
+# Per-particle arrays kept in shared memory, one row per particle (in strip
+# order, not roster order): name -> (dtype, columns)
+FIELDS = {
+    'pid': (np.int64, 1),  # Roster index of the row's particle
+    'pos': (np.float64, 2),
+    'prev': (np.float64, 2),
+    'vel': (np.float64, 2),
+    'hp': (np.float64, 1),
+    'alive': (np.bool_, 1),
+}
+# Per-strip slots, num_shards + 1 each: first row of every strip (the last
+# one ends the rows in use), and what the move phase of the step publishes
+SHARD_FIELDS = {
+    'bounds': np.int64,
+    'max_move': np.float64,
+    'lo': np.float64,      # x range of the strip's alive particles
+    'hi': np.float64,
+    'count': np.int64,     # alive particles in the strip
+}
+REBALANCE_MIN_ROWS = 64   # Fewest alive particles per strip worth a worker
+REBALANCE_MIN_SPAN = 4    # Narrowest strip, in interaction ranges
+
+
+def _layout(num_particles, num_shards):
+    offsets = {}
+    size = 0
+    for name, (dtype, cols) in FIELDS.items():
+        size = (size + 7) // 8 * 8
+        offsets[name] = size
+        size += np.dtype(dtype).itemsize * cols * num_particles
+    for name, dtype in SHARD_FIELDS.items():
+        size = (size + 7) // 8 * 8
+        offsets[name] = size
+        size += np.dtype(dtype).itemsize * (num_shards + 1)
+    return offsets, size
+
+def _attach(buf, num_particles, num_shards):
+    offsets, _ = _layout(num_particles, num_shards)
+    state = {}
+    for name, (dtype, cols) in FIELDS.items():
+        shape = (num_particles, cols) if cols > 1 else (num_particles,)
+        state[name] = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offsets[name])
+    for name, dtype in SHARD_FIELDS.items():
+        state[name] = np.ndarray((num_shards + 1,), dtype=dtype, buffer=buf, offset=offsets[name])
+    return state
+
+def _rows(state, shard):
+    # Row range of a strip (empty past the last one)
+    last = len(state['bounds']) - 1
+    if shard >= last:
+        return slice(0, 0)
+    return slice(int(state['bounds'][shard]), int(state['bounds'][shard + 1]))
+
+def _is_separated(lo, hi, reach):
+    # No two strips that are not neighbours come within reach of each other
+    for s in range(len(lo)):
+        for t in range(s + 2, len(lo)):
+            if lo[s] <= hi[s] and lo[t] <= hi[t] and lo[t] < hi[s] + reach and lo[s] < hi[t] + reach:
+                return False
+    return True
+
+
+# ========= PAIRS ========= #
+def _candidate_pairs(points, cell_size):
+    # Pairs of points in the same or neighbouring grid cells, each pair once
+    n = len(points)
+    if n < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    cx = np.floor(points[:, 0] / cell_size).astype(np.int64)
+    cy = np.floor(points[:, 1] / cell_size).astype(np.int64)
+    rows = int(cy.max()) + 3
+    key = cx * rows + cy + 1
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+    positions = np.arange(n)
+
+    firsts, seconds = [], []
+    # Half of the 3x3 neighbourhood, so every pair shows up once
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        target = (cx[order] + dx) * rows + cy[order] + 1 + dy
+        lo = np.searchsorted(sorted_key, target, side='left')
+        hi = np.searchsorted(sorted_key, target, side='right')
+        if dx == 0 and dy == 0:
+            lo = positions + 1  # Same cell: only the points after this one
+        counts = np.maximum(hi - lo, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        first = np.repeat(positions, counts)
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        second = starts + np.arange(total)
+        firsts.append(order[first])
+        seconds.append(order[second])
+
+    if not firsts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+def _contact_times(prev, pos, a, b, radius):
+    # Vectorized get_segment_contact_time, NaN where the pair does not touch
+    d0 = prev[a] - prev[b]
+    d1 = pos[a] - pos[b]
+    min_dist2 = (radius * 2) ** 2
+    n0 = np.einsum('ij,ij->i', d0, d0)
+    n1 = np.einsum('ij,ij->i', d1, d1)
+    rel = d1 - d0
+    qa = np.einsum('ij,ij->i', rel, rel)
+    qb = 2 * np.einsum('ij,ij->i', d0, rel)
+    qc = n0 - min_dist2
+    disc = qb * qb - 4 * qa * qc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (-qb - np.sqrt(disc)) / (2 * qa)
+    t = np.where((qa > 0) & (disc >= 0) & (t >= 0) & (t <= 1), t, np.nan)
+    t = np.where((n1 < min_dist2) & (n0 < min_dist2), 1.0, t)
+    t = np.where((n1 >= min_dist2) & (n0 < min_dist2), np.nan, t)
+    return t
+
+
+# ========= WORKER PHASES ========= #
+def _move(state, params, rows, radius, dt):
+    # Returns the largest move and the x range and count of the alive particles
+    own = rows.start + np.flatnonzero(state['alive'][rows])
+    if own.size == 0:
+        return 0.0, np.inf, -np.inf, 0
+
+    pos = state['pos'][own]
+    vel = state['vel'][own]
+    state['prev'][own] = pos
+
+    # Same motion as Particle.move: accelerate along the velocity, cap the
+    # speed, move, bounce off the walls
+    speed = np.linalg.norm(vel, axis=1)
+    moving = speed > 0
+    vel[moving] += vel[moving] / speed[moving, None] * (params['acc_magnitude'] * dt)
+    speed = np.linalg.norm(vel, axis=1)
+    fast = speed > params['max_speed']
+    vel[fast] *= (params['max_speed'] / speed[fast])[:, None]
+    new_pos = pos + vel * dt
+
+    low = radius + THR
+    high = np.array([params['width'] - radius - THR, params['height'] - radius - THR])
+    under = new_pos < low
+    over = new_pos > high
+    new_pos = np.where(under, low, np.where(over, high, new_pos))
+    vel = np.where(under | over, -vel, vel)
+
+    state['pos'][own] = new_pos
+    state['vel'][own] = vel
+    max_move = float(np.max(np.linalg.norm(new_pos - pos, axis=1)))
+    return max_move, float(new_pos[:, 0].min()), float(new_pos[:, 0].max()), len(own)
+
+def _resolve(state, i, j, radius):
+    # One pair, exactly as check_collisions does it
+    pos, prev, vel, hp, alive = state['pos'], state['prev'], state['vel'], state['hp'], state['alive']
+    if not (alive[i] and alive[j]):
+        return None
+    t = get_segment_contact_time(prev[i] - prev[j], pos[i] - pos[j], radius)
+    if t is None:
+        return None
+    if t < 1:
+        pos[i] = prev[i] + (pos[i] - prev[i]) * t
+        pos[j] = prev[j] + (pos[j] - prev[j]) * t
+
+    dist_pos = pos[i] - pos[j]
+    dist = np.linalg.norm(dist_pos)
+    direction = dist_pos / dist if dist != 0 else np.array([1.0, 0.0])
+    if dist != 0 and np.dot(vel[i] - vel[j], direction) >= 0:
+        return None
+
+    repel_distance = 0.1 * radius
+    pos[i] += direction * repel_distance
+    pos[j] -= direction * repel_distance
+
+    force_i = np.linalg.norm(vel[i]) * 2
+    force_j = np.linalg.norm(vel[j]) * 2
+    min_hp = min(hp[i], hp[j])
+    for k, force in ((i, force_j), (j, force_i)):
+        hp[k] -= min(force, min_hp)
+        if hp[k] <= 0:
+            alive[k] = False
+            vel[k] = 0.0
+
+    # Equal masses: the velocities along the collision direction are swapped
+    v1 = np.dot(vel[i], direction)
+    v2 = np.dot(vel[j], direction)
+    vel[i] += (v2 - v1) * direction
+    vel[j] += (v1 - v2) * direction
+
+    if not alive[i] or not alive[j]:
+        return (int(i), int(j), not alive[i], not alive[j])
+    return None
+
+def _collide(state, rows, next_rows, radius, reach):
+    alive = state['alive']
+    pos = state['pos']
+    mine = rows.start + np.flatnonzero(alive[rows])
+    if mine.size == 0:
+        return []
+    # Particles of the next strip close enough to meet one of ours
+    x = pos[next_rows, 0]
+    halo = next_rows.start + np.flatnonzero(alive[next_rows] & (x < pos[mine, 0].max() + reach)
+                                            & (x > pos[mine, 0].min() - reach))
+    idx = np.concatenate([mine, halo])
+
+    a, b = _candidate_pairs(pos[idx], reach)
+    # Pairs of two halo particles belong to the next strip
+    keep = (a < len(mine)) | (b < len(mine))
+    a, b = idx[a[keep]], idx[b[keep]]
+
+    t = _contact_times(state['prev'], pos, a, b, radius)
+    hit = ~np.isnan(t)
+    a, b, t = a[hit], b[hit], t[hit]
+    order = np.argsort(t, kind='stable')
+
+    kills = []
+    pid = state['pid']
+    for i, j in zip(a[order], b[order]):
+        result = _resolve(state, i, j, radius)
+        if result is not None:
+            kills.append((int(pid[i]), int(pid[j])) + result[2:])
+    return kills
+
+def _step(shard, state, params, barrier, step, radius, dt):
+    num_shards = len(state['bounds']) - 1
+    rows = _rows(state, shard)
+    state['max_move'][shard], state['lo'][shard], state['hi'][shard], state['count'][shard] = \
+        _move(state, params, rows, radius, dt)
+    barrier.wait()
+
+    # Two particles can meet if they end the step closer than this
+    reach = 2 * radius + 2 * float(state['max_move'][:num_shards].max())
+    split = _is_separated(state['lo'][:num_shards], state['hi'][:num_shards], reach)
+    kills = []
+    if split and shard % 2 == 0:
+        kills = _collide(state, rows, _rows(state, shard + 1), radius, reach)
+    elif not split and shard == 0:
+        # Strips too close this step: every pair in one pass
+        kills = _collide(state, slice(0, int(state['bounds'][num_shards])), slice(0, 0), radius, reach)
+    barrier.wait()
+    if split and shard % 2 == 1:
+        kills = _collide(state, rows, _rows(state, shard + 1), radius, reach)
+    return kills
+
+PHASES = {'step': _step}
+
+def _worker(shard, shm_name, num_particles, num_shards, params, barrier, conn):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    state = _attach(shm.buf, num_particles, num_shards)
+    try:
+        while True:
+            command, *arguments = conn.recv()
+            if command not in PHASES:
+                break
+            conn.send(PHASES[command](shard, state, params, barrier, *arguments))
+    finally:
+        # Views into the block must go before it can be closed
+        state = None
+        shm.close()
+
+# Single shard run in the coordinator itself, behind the same send/recv
+# interface as a worker pipe (used when the caller is already a worker)
+class _InlineShard:
+    def __init__(self, state, params):
+        self.state = state
+        self.params = params
+        self.barrier = threading.Barrier(1)
+        self.result = None
+
+    def send(self, message):
+        command, *arguments = message
+        if command in PHASES:
+            self.result = PHASES[command](0, self.state, self.params, self.barrier, *arguments)
+
+    def recv(self):
+        return self.result
+
+
+# ========= COORDINATOR ========= #
+def _count_active_shards(shards, width, reach):
+    # Strips must be at least as wide as the interaction range, so that pairs
+    # only ever span two neighbouring strips
+    return max(1, min(shards, int(width // max(reach, 1e-9))))
+
+def _rebalance(state, shards, width, reach):
+    """
+    Drop the dead rows, sort the alive ones by x and cut them into strips of
+    about the same number of particles, none narrower than
+    REBALANCE_MIN_SPAN interaction ranges. Only run while the workers wait.
+    """
+    n = int(state['bounds'][shards])
+    alive = np.flatnonzero(state['alive'][:n])
+    order = alive[np.argsort(state['pos'][alive, 0], kind='stable')]
+    for name in FIELDS:
+        state[name][:len(order)] = state[name][order]
+    x = state['pos'][:len(order), 0]
+
+    n_active = min(_count_active_shards(shards, width, reach), max(1, len(order) // REBALANCE_MIN_ROWS))
+    bounds = [0]
+    for k in range(1, n_active):
+        cut = max(len(order) * k // n_active, int(np.searchsorted(x, x[bounds[-1]] + REBALANCE_MIN_SPAN * reach)))
+        if cut >= len(order):
+            break
+        bounds.append(cut)
+    bounds += [len(order)] * (shards + 1 - len(bounds))
+    state['bounds'][:] = bounds
+
+def run_sharded_match(roster_ids, width, height, min_radius, max_radius, max_hp, max_speed, acc_magnitude,
+                      substeps, timestamp, shards, simulations_dir="simulations", stop_at=1):
+    """
+    Run a whole match headless on `shards` worker processes (0 runs it in
+    the calling process) and write the collision log and detailed rankings. The
+    match ends when `stop_at` players are left. Returns the MatchIndex.
+    """
+    num_particles = len(roster_ids)
+    ids = [str(pid) for pid in roster_ids]
+    dt = 1.0 / substeps
+
+    radius = get_dynamic_radius(range(num_particles), width, height, min_radius, max_radius, change_radius=False)
+    positions = np.array(assign_position(radius, width, height, num_particles))
+    angles = np.array([random.uniform(0, 2 * math.pi) for _ in range(num_particles)])
+    speeds = np.array([random.uniform(0.5, 1) for _ in range(num_particles)])
+
+    num_shards = max(shards, 1)
+    _, size = _layout(num_particles, num_shards)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    processes = []
+    conns = []
+    state = None
+    try:
+        state = _attach(shm.buf, num_particles, num_shards)
+        state['pid'][:] = np.arange(num_particles)
+        state['pos'][:] = positions
+        state['prev'][:] = positions
+        state['vel'][:] = np.column_stack([np.cos(angles) * speeds, np.sin(angles) * speeds])
+        state['hp'][:] = max_hp
+        state['alive'][:] = True
+        reach = 2 * radius + 2.0  # Initial speeds are below 1 px/tick
+        state['bounds'][-1] = num_particles
+        _rebalance(state, num_shards, width, reach)
+
+        params = {'width': width, 'height': height, 'max_speed': max_speed, 'acc_magnitude': acc_magnitude}
+        if shards < 1:
+            conns.append(_InlineShard(state, params))
+        barrier = mp.Barrier(num_shards) if not conns else None
+        for shard in range(num_shards - len(conns)):
+            parent_conn, child_conn = mp.Pipe()
+            process = mp.Process(target=_worker, args=(shard, shm.name, num_particles, num_shards, params, barrier,
+                                                       child_conn), daemon=True)
+            process.start()
+            processes.append(process)
+            conns.append(parent_conn)
+
+        match_index = MatchIndex(ids)
+        log_path = f"{simulations_dir}/{timestamp}_collision_log.csv"
+        alive_count = num_particles
+        step = 0
+        with open(log_path, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(['Particle', 'Opponent', 'Frame', 'Killed'])
+
+            while alive_count > stop_at:
+                if step % substeps == 0:
+                    radius = get_dynamic_radius(range(alive_count), width, height, min_radius, max_radius, change_radius=False)
+                for conn in conns:
+                    conn.send(('step', step, radius, dt))
+                kills = []
+                for conn in conns:
+                    kills.extend(conn.recv())
+
+                frame_number = step // substeps
+                for i, j, killed_i, killed_j in kills:
+                    writer.writerow([ids[i], ids[j], frame_number, killed_i])
+                    writer.writerow([ids[j], ids[i], frame_number, killed_j])
+                    if killed_i:
+                        match_index.record_elimination(ids[i], ids[j], frame_number)
+                    if killed_j:
+                        match_index.record_elimination(ids[j], ids[i], frame_number)
+                    alive_count -= killed_i + killed_j
+                step += 1
+
+                # New strips before two of them get within reach, or once
+                # half of the rows are dead
+                reach = 2 * radius + 2 * float(state['max_move'][:num_shards].max())
+                if (not _is_separated(state['lo'][:num_shards], state['hi'][:num_shards], 2 * reach)
+                        or 2 * alive_count < state['bounds'][num_shards]):
+                    _rebalance(state, num_shards, width, reach)
+
+        for conn in conns:
+            conn.send(('stop',))
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        state = None
+        shm.close()
+        shm.unlink()
+
+    match_index.write_detailed_rankings(timestamp, simulations_dir)
+    if stop_at == 1:
+        print(f"Vencedor: {match_index.winner()} ({step // substeps} ticks, {shards} shards)")
+    return match_index
@@ -0,0 +1,109 @@
+import numpy as np
+
+# Uniform grid over an (n, 2) array of positions, for queries about all the
+# particles at once. Points are sorted by cell key (like the collision pass
+# of the sharded engine), so every cell is one slice of the sorted order and
+# looking up a batch of cells is two searchsorted calls.
+
+
+def _ring(r):
+    # Cell offsets at Chebyshev distance exactly r
+    d = np.arange(-r, r + 1)
+    dx, dy = np.meshgrid(d, d, indexing='ij')
+    edge = np.maximum(np.abs(dx), np.abs(dy)) == r
+    return np.stack([dx[edge], dy[edge]], axis=1)
+
+def _window(r):
+    # Cell offsets at Chebyshev distance up to r
+    d = np.arange(-r, r + 1)
+    dx, dy = np.meshgrid(d, d, indexing='ij')
+    return np.stack([dx.ravel(), dy.ravel()], axis=1)
+
+
+class SpatialIndex:
+    def __init__(self, pos, cell_size=None):
+        self.pos = np.asarray(pos, dtype=float).reshape(-1, 2)
+        n = len(self.pos)
+        self.origin = self.pos.min(axis=0) if n else np.zeros(2)
+        if cell_size is None:
+            # About one point per cell
+            extent = np.maximum(self.pos.max(axis=0) - self.origin, 1.0) if n else np.ones(2)
+            cell_size = float(np.sqrt(extent[0] * extent[1] / max(n, 1)))
+        self.cell_size = cell_size
+        self.cells = self._cells(self.pos)
+        self.shape = self.cells.max(axis=0) + 1 if n else np.ones(2, dtype=np.int64)
+        keys = self._keys(self.cells)
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def _cells(self, points):
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def _keys(self, cells):
+        return cells[:, 0] * self.shape[1] + cells[:, 1]
+
+    def _gather(self, queries, offsets):
+        # (query, point) for every point in the cells at `offsets` around the
+        # cell of each query
+        around = self.cells[queries][:, None, :] + offsets[None, :, :]
+        valid = np.all((around >= 0) & (around < self.shape), axis=2)
+        owner = np.broadcast_to(queries[:, None], valid.shape)[valid]
+        keys = self._keys(around[valid])
+        lo = np.searchsorted(self.sorted_keys, keys, side='left')
+        hi = np.searchsorted(self.sorted_keys, keys, side='right')
+        counts = hi - lo
+        total = int(counts.sum())
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        return np.repeat(owner, counts), self.order[starts + np.arange(total)]
+
+    def nearest(self, max_distance=np.inf):
+        """
+        Nearest other point of every point and its distance; -1 and inf when
+        there is none within max_distance. Rings of cells are searched
+        outwards only for the points still unresolved.
+        """
+        n = len(self.pos)
+        best = np.full(n, -1, dtype=np.int64)
+        best_dist = np.full(n, np.inf)
+        pending = np.arange(n)
+        r = 0
+        while len(pending) and r <= int(self.shape.max()):
+            q, j = self._gather(pending, _ring(r))
+            keep = q != j
+            q, j = q[keep], j[keep]
+            if len(q):
+                d = np.hypot(*(self.pos[j] - self.pos[q]).T)
+                # Closest candidate of each query (ties: lowest index)
+                order = np.lexsort((j, d, q))
+                q, j, d = q[order], j[order], d[order]
+                first = np.r_[True, q[1:] != q[:-1]]
+                q, j, d = q[first], j[first], d[first]
+                better = d < best_dist[q]
+                best[q[better]] = j[better]
+                best_dist[q[better]] = d[better]
+            # Points not seen yet are at least r cells away
+            bound = r * self.cell_size
+            pending = pending[(best_dist[pending] > bound) & (bound < max_distance)]
+            r += 1
+
+        too_far = best_dist > max_distance
+        best[too_far] = -1
+        best_dist[too_far] = np.inf
+        return best, best_dist
+
+    def pairs_within(self, radius):
+        """Index pairs (i, j), i < j, of points at most radius apart."""
+        if len(self.pos) < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        rings = int(np.ceil(radius / self.cell_size))
+        i, j = self._gather(np.arange(len(self.pos)), _window(rings))
+        keep = i < j
+        i, j = i[keep], j[keep]
+        close = np.hypot(*(self.pos[i] - self.pos[j]).T) <= radius
+        return i[close], j[close]
+
+    def count_within(self, radius):
+        # Other points at most radius away, per point
+        i, j = self.pairs_within(radius)
+        return np.bincount(i, minlength=len(self.pos)) + np.bincount(j, minlength=len(self.pos))
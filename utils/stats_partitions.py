@@ -0,0 +1,90 @@
+import os
+import gzip
+import json
+import hashlib
+
+# Stats are committed as one small file per day plus a manifest, so each
+# nightly commit only adds a file instead of rewriting one big database.
+# data/daily_stats.db is rebuilt from them (see log_manager.sync_partitions).
+STATS_DIR = "data/stats"
+MANIFEST_FILE = "manifest.json"
+
+# Per-day tables and their columns, without the date column
+PARTITION_TABLES = {
+    'daily_summary': ['num_players', 'winner'],
+    'player_stats': ['player', 'kills', 'deaths', 'nemesis', 'victim'],
+    'ranking': ['player', 'rank', 'time'],
+    'daily_head_to_head': ['killer', 'victim', 'kills'],
+    'rating_history': ['player', 'mu', 'sigma', 'matches'],
+}
+# Only written on days that have rows, so partitions exported before these
+# tables existed come out byte-for-byte the same when exported again
+OPTIONAL_TABLES = {'rating_history'}
+
+
+def get_partition_path(stats_dir, iso_date):
+    return os.path.join(stats_dir, f"{iso_date}.json.gz")
+
+def load_manifest(stats_dir=STATS_DIR):
+    # {date: {"file", "sha1", "rows"}}
+    path = os.path.join(stats_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest, stats_dir=STATS_DIR):
+    os.makedirs(stats_dir, exist_ok=True)
+    path = os.path.join(stats_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        # One line per day, so the daily diff is one added line
+        f.write("{\n")
+        f.write(",\n".join(
+            f"{json.dumps(date)}: {json.dumps(manifest[date], sort_keys=True)}" for date in sorted(manifest)
+        ))
+        f.write("\n}\n")
+    os.replace(tmp_path, path)
+
+
+def write_partition(iso_date, tables, stats_dir=STATS_DIR):
+    """
+    Write one day of stats ({table: rows}) and return its manifest entry.
+    The file is byte-for-byte reproducible, so exporting the same day again
+    leaves it untouched.
+    """
+    payload = {
+        "date": iso_date,
+        "tables": {
+            table: {"columns": PARTITION_TABLES[table], "rows": [list(row) for row in tables.get(table, [])]}
+            for table in PARTITION_TABLES
+            if table not in OPTIONAL_TABLES or tables.get(table)
+        },
+    }
+    data = gzip.compress(json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8'), mtime=0)
+    sha1 = hashlib.sha1(data).hexdigest()
+
+    path = get_partition_path(stats_dir, iso_date)
+    os.makedirs(stats_dir, exist_ok=True)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            unchanged = hashlib.sha1(f.read()).hexdigest() == sha1
+    else:
+        unchanged = False
+    if not unchanged:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    return {
+        "file": os.path.basename(path),
+        "sha1": sha1,
+        "rows": sum(len(t["rows"]) for t in payload["tables"].values()),
+    }
+
+def read_partition(entry, stats_dir=STATS_DIR):
+    # {table: (columns, rows)}
+    with gzip.open(os.path.join(stats_dir, entry["file"]), 'rb') as f:
+        payload = json.loads(f.read().decode('utf-8'))
+    return {table: (data["columns"], data["rows"]) for table, data in payload["tables"].items()}
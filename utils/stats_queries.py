@@ -0,0 +1,368 @@
+import sqlite3
+import pandas as pd
+
+# SQL behind the dashboard, kept apart from the page so the queries can be
+# cached (streamlit_app.py wraps them in the version-aware query cache) and
+# timed on their own (benchmark_history.py). Plain functions: every call
+# opens its own connection to DB_PATH.
+DB_PATH = "data/daily_stats.db"
+
+
+def get_conn():
+    return sqlite3.connect(DB_PATH)
+
+def get_available_dates():
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("SELECT date FROM daily_summary ORDER BY date DESC")
+    dates = [r[0] for r in cursor.fetchall()]
+    conn.close()
+    return ["Todos os Tempos"] + dates 
+
+def get_daily_summary(date_str):
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("SELECT num_players, winner FROM daily_summary WHERE date = ?", (date_str,))
+    row = cursor.fetchone()
+    conn.close()
+    return {"num_players": row[0], "winner": row[1]} if row else None
+
+PLAYER_PAGE_SIZE = 50
+
+def table_exists(conn, name):
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
+
+def search_players(date_str, query="", page=0, page_size=PLAYER_PAGE_SIZE):
+    """
+    One page of player names containing `query`, alphabetical, and whether
+    there is a next page. Uses the trigram index built by log_manager when
+    there is one, so only the matching names are read.
+    """
+    conn = get_conn()
+    cursor = conn.cursor()
+    query = query.strip().lower()
+    limit = (page_size + 1, page * page_size)
+
+    if date_str == "Todos os Tempos":
+        day_filter, day_params = "", ()
+    else:
+        day_filter = "AND EXISTS (SELECT 1 FROM player_stats s WHERE s.date = ? AND s.player = {table}.player)"
+        day_params = (date_str,)
+
+    if not table_exists(conn, "players"):
+        # Database not re-processed yet: plain scan of player_stats
+        sql = "SELECT DISTINCT player FROM player_stats WHERE player LIKE ? ESCAPE '\\'"
+        params = ("%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",)
+        if day_params:
+            sql += " AND date = ?"
+            params += day_params
+        cursor.execute(sql + " ORDER BY player LIMIT ? OFFSET ?", params + limit)
+    elif not query and not day_params:
+        cursor.execute("SELECT player FROM players ORDER BY player LIMIT ? OFFSET ?", limit)
+    elif not query:
+        cursor.execute("SELECT player FROM player_stats WHERE date = ? ORDER BY player LIMIT ? OFFSET ?", day_params + limit)
+    elif len(query) >= 3 and table_exists(conn, "players_fts"):
+        cursor.execute(f"""
+            SELECT player FROM players_fts
+            WHERE players_fts MATCH ? {day_filter.format(table="players_fts")}
+            ORDER BY player
+            LIMIT ? OFFSET ?
+        """, ('"' + query.replace('"', '""') + '"',) + day_params + limit)
+    else:
+        # Too short for trigrams: prefix range on the NOCASE index, so it
+        # matches whatever the case of the name like the trigram search does
+        cursor.execute(f"""
+            SELECT player FROM players
+            WHERE player COLLATE NOCASE >= ? AND player COLLATE NOCASE < ? {day_filter.format(table="players")}
+            ORDER BY player
+            LIMIT ? OFFSET ?
+        """, (query, query + "\U0010ffff") + day_params + limit)
+
+    players = [r[0] for r in cursor.fetchall()]
+    conn.close()
+    return players[:page_size], len(players) > page_size
+
+def get_player_count(date_str):
+    conn = get_conn()
+    cursor = conn.cursor()
+    if date_str == "Todos os Tempos":
+        cursor.execute("SELECT COUNT(DISTINCT player) FROM player_stats")
+    else:
+        cursor.execute("SELECT COUNT(*) FROM player_stats WHERE date = ?", (date_str,))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+def player_played(date_str, player):
+    conn = get_conn()
+    cursor = conn.cursor()
+    if date_str == "Todos os Tempos":
+        cursor.execute("SELECT 1 FROM player_stats WHERE player = ? LIMIT 1", (player,))
+    else:
+        cursor.execute("SELECT 1 FROM player_stats WHERE date = ? AND player = ?", (date_str, player))
+    found = cursor.fetchone() is not None
+    conn.close()
+    return found
+
+
+def get_top_players(date_str, stat="kills", limit=10):
+    conn = get_conn()
+    cursor = conn.cursor()
+
+    if date_str == "Todos os Tempos":
+        cursor.execute(f"""
+            SELECT player, SUM({stat}) as total_{stat}
+            FROM player_stats
+            GROUP BY player
+            ORDER BY total_{stat} DESC
+            LIMIT ?
+        """, (limit,))
+      
+    else:
+        cursor.execute(f"""
+            SELECT player, {stat}
+            FROM player_stats
+            WHERE date = ?
+            ORDER BY {stat} DESC
+            LIMIT ?
+        """, (date_str, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    if stat == "kills":
+        col_name = "Eliminações"
+    else:
+        col_name = stat.capitalize()
+    return pd.DataFrame(rows, columns=["Jogador", col_name])
+
+
+def get_player_stats(date_str, player):
+    conn = get_conn()
+    cursor = conn.cursor()
+    if date_str == "Todos os Tempos":
+        cursor.execute("""
+            SELECT 
+                SUM(kills), SUM(deaths),
+                NULL, NULL
+            FROM player_stats
+            WHERE player = ?
+        """, (player,))
+        row = cursor.fetchone()
+        nemesis = victim = None
+        if table_exists(conn, "head_to_head"):
+            # All-time totals kept by log_manager, one indexed lookup each
+            cursor.execute("""
+                SELECT killer FROM head_to_head WHERE victim = ?
+                ORDER BY kills DESC, killer ASC LIMIT 1
+            """, (player,))
+            nemesis = (cursor.fetchone() or [None])[0]
+            cursor.execute("""
+                SELECT victim FROM head_to_head WHERE killer = ?
+                ORDER BY kills DESC, victim ASC LIMIT 1
+            """, (player,))
+            victim = (cursor.fetchone() or [None])[0]
+        conn.close()
+        if row:
+            return {
+                "kills": row[0] or 0,
+                "deaths": row[1] or 0,
+                "nemesis": nemesis,
+                "victim": victim,
+            }
+        return None
+    else:
+        cursor.execute("""
+            SELECT kills, deaths, nemesis, victim
+            FROM player_stats
+            WHERE date = ? AND player = ?
+        """, (date_str, player))
+        row = cursor.fetchone()
+        conn.close()
+        if row:
+            return {
+                "kills": row[0],
+                "deaths": row[1],
+                "nemesis": row[2],
+                "victim": row[3],
+            }
+        return None
+
+def get_rivals(date_str, player, limit=10):
+    """Opponents a player eliminated or was eliminated by the most."""
+    conn = get_conn()
+    cursor = conn.cursor()
+    if date_str == "Todos os Tempos":
+        table, day_filter, params = "head_to_head", "", ()
+    else:
+        table, day_filter, params = "daily_head_to_head", "AND date = ?", (date_str,)
+    if not table_exists(conn, table):
+        conn.close()
+        return pd.DataFrame(columns=["Oponente", "Eliminações", "Mortes"])
+    cursor.execute(f"""
+        SELECT opponent, SUM(kills) AS kills, SUM(deaths) AS deaths
+        FROM (
+            SELECT victim AS opponent, kills, 0 AS deaths FROM {table} WHERE killer = ? {day_filter}
+            UNION ALL
+            SELECT killer AS opponent, 0 AS kills, kills AS deaths FROM {table} WHERE victim = ? {day_filter}
+        )
+        GROUP BY opponent
+        ORDER BY kills + deaths DESC, opponent ASC
+        LIMIT ?
+    """, (player,) + params + (player,) + params + (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+    return pd.DataFrame(rows, columns=["Oponente", "Eliminações", "Mortes"])
+
+def get_top_rivalries(limit=10):
+    """Pairs of players that eliminated each other the most, all time."""
+    conn = get_conn()
+    cursor = conn.cursor()
+    if not table_exists(conn, "head_to_head"):
+        conn.close()
+        return pd.DataFrame(columns=["Jogador A", "Jogador B", "A eliminou B", "B eliminou A", "Total"])
+    cursor.execute("""
+        SELECT
+            MIN(killer, victim) AS a,
+            MAX(killer, victim) AS b,
+            SUM(CASE WHEN killer < victim THEN kills ELSE 0 END),
+            SUM(CASE WHEN killer > victim THEN kills ELSE 0 END),
+            SUM(kills) AS total
+        FROM head_to_head
+        GROUP BY a, b
+        ORDER BY total DESC, a ASC, b ASC
+        LIMIT ?
+    """, (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+    return pd.DataFrame(rows, columns=["Jogador A", "Jogador B", "A eliminou B", "B eliminou A", "Total"])
+
+def get_pipeline_runs(limit=365):
+    """Metrics of the latest daily runs, one row per stage (see utils/run_metrics.py)."""
+    columns = ["Execução", "Etapa", "Início", "Tempo (s)", "Pico de RAM (MB)", "Frames", "Linhas", "Bytes gravados", "Saída"]
+    conn = get_conn()
+    if not table_exists(conn, "pipeline_runs"):
+        conn.close()
+        return pd.DataFrame(columns=columns)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT run_id, stage, started_at, wall_time, peak_rss_mb, frames, rows, bytes_written, exit_code
+        FROM pipeline_runs
+        WHERE run_id IN (SELECT DISTINCT run_id FROM pipeline_runs ORDER BY run_id DESC LIMIT ?)
+        ORDER BY started_at
+    """, (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+    df = pd.DataFrame(rows, columns=columns)
+    df["Início"] = pd.to_datetime(df["Início"])
+    return df
+
+def get_player_rank(date_str, player):
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT rank FROM ranking WHERE date = ? AND player = ?
+    """, (date_str, player))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+def get_player_time(date_str, player):
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT time FROM ranking WHERE date = ? AND player = ?
+    """, (date_str, player))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+def get_all_winners():
+    """Return all winners per day."""
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("SELECT date, winner FROM daily_summary ORDER BY date DESC")
+    rows = cursor.fetchall()
+    conn.close()
+    return pd.DataFrame(rows, columns=["Data", "Vencedor"])
+
+def get_wins_leaderboard(limit=10):
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT winner AS player, COUNT(*) AS wins
+        FROM daily_summary
+        WHERE winner IS NOT NULL AND winner <> ''
+        GROUP BY winner
+        ORDER BY wins DESC, player ASC
+        LIMIT ?
+        """,
+        (limit,)
+    )
+    rows = cursor.fetchall()
+    conn.close()
+    return pd.DataFrame(rows, columns=["Jogador", "Vitórias"])
+
+def get_wins(player):
+    """Return how many wins a player has (all-time or specific date)."""
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM daily_summary WHERE winner = ?", (player,))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+def get_top_ratings(date_str, limit=10):
+    """
+    Best players by skill rating (mu - 3 sigma, see utils/ratings.py): the
+    current ratings, or the ones as of the end of date_str.
+    """
+    columns = ["Jogador", "Rating", "μ", "σ", "Partidas"]
+    conn = get_conn()
+    if not table_exists(conn, "player_rating"):
+        conn.close()
+        return pd.DataFrame(columns=columns)
+    cursor = conn.cursor()
+    if date_str == "Todos os Tempos":
+        cursor.execute("""
+            SELECT player, mu - 3 * sigma AS rating, mu, sigma, matches
+            FROM player_rating
+            ORDER BY rating DESC, player ASC
+            LIMIT ?
+        """, (limit,))
+    else:
+        cursor.execute("""
+            SELECT player, rating, mu, sigma, matches FROM (
+                SELECT player, mu - 3 * sigma AS rating, mu, sigma, matches,
+                       ROW_NUMBER() OVER (PARTITION BY player ORDER BY date DESC) AS rn
+                FROM rating_history
+                WHERE date <= ?
+            )
+            WHERE rn = 1
+            ORDER BY rating DESC, player ASC
+            LIMIT ?
+        """, (date_str, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    df = pd.DataFrame(rows, columns=columns)
+    return df.round({"Rating": 2, "μ": 2, "σ": 2})
+
+def get_rating_history(player):
+    """Rating of a player after every day they played, for the chart."""
+    columns = ["Data", "Rating", "μ", "σ"]
+    conn = get_conn()
+    if not table_exists(conn, "rating_history"):
+        conn.close()
+        return pd.DataFrame(columns=columns)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT date, mu - 3 * sigma, mu, sigma FROM rating_history
+        WHERE player = ?
+        ORDER BY date
+    """, (player,))
+    rows = cursor.fetchall()
+    conn.close()
+    df = pd.DataFrame(rows, columns=columns)
+    df["Data"] = pd.to_datetime(df["Data"])
+    return df
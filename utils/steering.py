@@ -0,0 +1,44 @@
+import numpy as np
+
+from utils.spatial import SpatialIndex
+
+# Optional steering, applied once per tick before the particles move: every
+# particle turns a little towards its nearest opponent (seek), or away from it
+# while its HP is low (flee). Only the direction changes, never the speed, so
+# the collision code and the fast-forward bounds (which only use speeds) hold
+# as they are.
+
+
+def get_steering_goals(pos, hp_ratio, seek=True, flee_hp=0.0, sight=np.inf):
+    """Unit vector each particle wants to move along, zero when it has none."""
+    goals = np.zeros_like(pos)
+    if len(pos) < 2:
+        return goals
+    nearest, dist = SpatialIndex(pos).nearest(max_distance=sight)
+    found = np.flatnonzero((nearest >= 0) & (dist > 0))
+    towards = (pos[nearest[found]] - pos[found]) / dist[found, None]
+    sign = np.where(hp_ratio[found] < flee_hp, -1.0, 1.0 if seek else 0.0)
+    goals[found] = towards * sign[:, None]
+    return goals
+
+def steer_particles(particles, turn_rate, seek=True, flee_hp=0.0, sight=np.inf):
+    alive = [p for p in particles if p.alive]
+    if len(alive) < 2:
+        return
+    pos = np.array([p.pos for p in alive])
+    vel = np.array([p.vel for p in alive])
+    hp_ratio = np.array([p.hp / p.max_hp for p in alive])
+
+    goals = get_steering_goals(pos, hp_ratio, seek, flee_hp, sight)
+    speed = np.linalg.norm(vel, axis=1)
+    turning = np.flatnonzero(np.any(goals != 0, axis=1) & (speed > 0))
+    if not len(turning):
+        return
+
+    direction = vel[turning] / speed[turning, None] + turn_rate * goals[turning]
+    norm = np.linalg.norm(direction, axis=1)
+    # Exactly opposite and as strong: keep going
+    keep = norm > 1e-12
+    new_vel = direction[keep] / norm[keep, None] * speed[turning[keep], None]
+    for k, v in zip(turning[keep], new_vel):
+        alive[k].vel = v
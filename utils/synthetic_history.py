@@ -0,0 +1,133 @@
+import os
+import csv
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+# Fake but plausible history for load tests, fully offline: follower exports
+# in the IGExportTool format and one collision log per day, laid out like the
+# real repository (followers_info/, simulations/). Every follower has a fixed
+# skill, so the same players keep winning and the same pairs keep meeting,
+# which gives the rankings and head-to-head tables a realistic shape.
+EXPORT_COLUMNS = [
+    "id", "User ID", "Username", "Full Name", "Follower Count", "Following Count", "Media Count",
+    "Public Email", "Phone Number", "City Name", "Biography", "External Url", "Is Verified",
+    "Is Business", "Followed By Viewer", "Profile URL", "Avatar",
+]
+FIRST_NAMES = ["ana", "joao", "maria", "pedro", "lucas", "julia", "gabriel", "beatriz", "rafael", "larissa",
+               "mateus", "camila", "felipe", "leticia", "bruno", "amanda", "gustavo", "carol", "vini", "duda"]
+LAST_NAMES = ["silva", "santos", "oliveira", "souza", "lima", "pereira", "costa", "rodrigues", "almeida", "nunes"]
+SEPARATORS = ["", ".", "_", "__"]
+FRAMES_PER_KILL = 15  # Mean gap between kills with everyone alive
+
+
+def make_usernames(n, rng):
+    # Instagram-looking handles, all different
+    first = rng.choice(FIRST_NAMES, n)
+    last = rng.choice(LAST_NAMES, n)
+    sep = rng.choice(SEPARATORS, n)
+    suffix = rng.integers(0, 10000, n)
+    names = [f"{f}{s}{l}{x if x % 3 else ''}" for f, s, l, x in zip(first, sep, last, suffix)]
+    # Break the remaining collisions with the index
+    seen = set()
+    for i, name in enumerate(names):
+        if name in seen:
+            names[i] = f"{name}.{i}"
+        seen.add(names[i])
+    return names
+
+def write_export(path, usernames, user_ids):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writerow(EXPORT_COLUMNS)
+        for username, user_id in zip(usernames, user_ids):
+            row = dict.fromkeys(EXPORT_COLUMNS, "")
+            row.update({"id": user_id, "Username": username, "Full Name": username.split('.')[0].title(),
+                        "Is Verified": "false", "Followed By Viewer": "false"})
+            writer.writerow(row.values())
+
+def simulate_match(roster, skill, rng):
+    """
+    Kills of one match as (killer, victim, frame), in order: weaker players
+    tend to die first and stronger ones to do the killing.
+    """
+    n = len(roster)
+    # Death order, weakest first (skill plus a lot of luck)
+    order = roster[np.argsort(skill + rng.normal(0, 1.0, n), kind='stable')]
+    victims = order[:-1]
+    t = np.arange(n - 1)
+    # Killer: someone still alive, biased towards the end of the order
+    left = n - 1 - t
+    killers = order[t + 1 + np.minimum((left * rng.random(n - 1) ** 0.5).astype(np.int64), left - 1)]
+    # Kills get rarer as the arena empties
+    gaps = rng.exponential(FRAMES_PER_KILL * np.sqrt(n / (left + 1)))
+    frames = np.cumsum(np.maximum(gaps, 1).astype(np.int64))
+    return killers, victims, frames
+
+def write_collision_log(path, usernames, killers, victims, frames):
+    # Same rows as helpers.create_log: killer first, then the victim
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write("Particle,Opponent,Frame,Killed\n")
+        for k, v, frame in zip(killers, victims, frames):
+            f.write(f"{usernames[k]},{usernames[v]},{frame},False\n{usernames[v]},{usernames[k]},{frame},True\n")
+
+
+def generate_history(out_dir, days, players, start=None, growth=0.5, churn=0.002, export_every=7, seed=0):
+    """
+    Write `days` days of history into out_dir. The audience grows linearly
+    from players * (1 - growth) to players, churn of the followers leave each
+    day, and an export is written every export_every days.
+    Returns the list of collision logs written.
+    """
+    rng = np.random.default_rng(seed)
+    start = start or date(2025, 1, 1)
+    sims_dir = os.path.join(out_dir, "simulations")
+    export_dir = os.path.join(out_dir, "followers_info")
+    os.makedirs(sims_dir, exist_ok=True)
+    os.makedirs(export_dir, exist_ok=True)
+
+    usernames = np.array(make_usernames(players, rng), dtype=object)
+    user_ids = rng.integers(10 ** 9, 10 ** 11, players)
+    skill = rng.normal(0, 1, players)
+    joined = np.zeros(players, dtype=bool)
+    joined[:max(2, int(players * (1 - growth)))] = True
+    active = joined.copy()
+    left = np.zeros(players, dtype=bool)
+
+    logs = []
+    for day in range(days):
+        today = start + timedelta(days=day)
+        # New followers arrive, a few leave
+        target = int(players * (1 - growth + growth * (day + 1) / days))
+        joined[:target] = True
+        active |= joined & ~left
+        leaving = active & (rng.random(players) < churn)
+        active &= ~leaving
+        left |= leaving
+        roster = np.flatnonzero(active)
+        if len(roster) < 2:
+            continue
+
+        if day % export_every == 0:
+            stamp = f"{today.isoformat()}-10-00"
+            write_export(os.path.join(export_dir, f"IGExportTool_All{stamp}.csv"), usernames[roster], user_ids[roster])
+
+        killers, victims, frames = simulate_match(roster, skill[roster], rng)
+        path = os.path.join(sims_dir, f"{today.strftime('%Y%m%d')}_120000_collision_log.csv")
+        write_collision_log(path, usernames, killers, victims, frames)
+        logs.append(path)
+    return logs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic match history (exports and collision logs) for load tests.")
+    parser.add_argument('out_dir', help="Directory to write followers_info/ and simulations/ into.")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--players', type=int, default=10000, help="Followers at the end of the history.")
+    parser.add_argument('--start', type=date.fromisoformat, default=None, help="First day (default 2025-01-01).")
+    parser.add_argument('--export-every', type=int, default=7, help="Days between follower exports.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logs = generate_history(args.out_dir, args.days, args.players, args.start, export_every=args.export_every, seed=args.seed)
+    print(f"Wrote {len(logs)} collision logs to {os.path.join(args.out_dir, 'simulations')}")
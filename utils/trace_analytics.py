@@ -0,0 +1,116 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from utils.match_trace import TRACES_DIR, MatchTrace, get_trace_path
+
+# Heatmaps and movement stats of a match, from its trace (simulation.py
+# --trace). Everything is computed over the whole array of rows at once, so a
+# full match takes a fraction of a second whatever the roster size.
+#   python -m utils.trace_analytics --timestamp 20250101_120000
+WALL_MARGIN = 20    # px between the avatar and the wall that still counts as "near the wall"
+HEATMAP_CELL = 20   # px
+
+
+def heatmap(trace, cell=HEATMAP_CELL, players=None):
+    """
+    Seconds spent in every cell x cell square of the arena by the given
+    players (None: everyone), as a (rows, columns) array.
+    """
+    rows = trace.rows_mask(players)
+    nx = -(-trace.width // cell)
+    ny = -(-trace.height // cell)
+    pos = trace.pos[rows]
+    x = np.clip((pos[:, 0] // cell).astype(np.int64), 0, nx - 1)
+    y = np.clip((pos[:, 1] // cell).astype(np.int64), 0, ny - 1)
+    seconds = trace.frame_seconds[trace.frame[rows]]
+    return np.bincount(y * nx + x, weights=seconds, minlength=nx * ny).reshape(ny, nx)
+
+def movement_stats(trace, wall_margin=WALL_MARGIN):
+    """
+    One row per player who was traced: seconds alive, distance travelled
+    (px), mean and top speed (px/s), seconds near the wall and which share of
+    their time that is, and the HP fraction they had last.
+    """
+    n = len(trace.roster)
+    player = trace.player
+    seconds = trace.frame_seconds[trace.frame]
+    has_rows = trace.count > 0
+    starts = trace.offsets[:-1][has_rows]
+    ends = trace.offsets[1:][has_rows] - 1
+
+    # Straight line between consecutive rows of the same player
+    step = np.zeros(len(player))
+    step[1:] = np.linalg.norm(np.diff(trace.pos, axis=0), axis=1)
+    step[starts] = 0
+
+    speed = np.linalg.norm(trace.vel, axis=1) * trace.tick_rate
+    top_speed = np.zeros(n)
+    if len(starts):
+        top_speed[has_rows] = np.maximum.reduceat(speed, starts)
+
+    # Gap between the avatar's edge and the closest wall
+    x, y = trace.pos[:, 0], trace.pos[:, 1]
+    gap = np.minimum(np.minimum(x, trace.width - x), np.minimum(y, trace.height - y)) - trace.radius[trace.frame]
+    near_wall = gap <= wall_margin
+
+    alive = np.bincount(player, weights=seconds, minlength=n)
+    near_wall_seconds = np.bincount(player, weights=seconds * near_wall, minlength=n)
+    last_hp = np.full(n, np.nan)
+    last_hp[has_rows] = trace.hp_ratio[ends]
+    stats = pd.DataFrame({
+        'player': trace.roster,
+        'seconds': alive,
+        'distance': np.bincount(player, weights=step, minlength=n),
+        'mean_speed': np.bincount(player, weights=speed * seconds, minlength=n) / np.maximum(alive, 1e-9),
+        'top_speed': top_speed,
+        'near_wall_seconds': near_wall_seconds,
+        'near_wall_share': near_wall_seconds / np.maximum(alive, 1e-9),
+        'last_hp': last_hp,
+    })
+    return stats[has_rows].reset_index(drop=True)
+
+def heatmap_colors(counts):
+    # Black -> red -> yellow -> white, on a log scale so the quiet areas still show
+    level = np.log1p(counts)
+    level = level / level.max() if level.max() > 0 else level
+    rgb = np.stack([np.clip(3 * level, 0, 1), np.clip(3 * level - 1, 0, 1), np.clip(3 * level - 2, 0, 1)], axis=-1)
+    return (rgb * 255).astype(np.uint8)
+
+def save_heatmap(counts, path, width, height):
+    import pygame
+    # Plain surfaces, no display needed
+    surface = pygame.surfarray.make_surface(heatmap_colors(counts).transpose(1, 0, 2))
+    pygame.image.save(pygame.transform.scale(surface, (width, height)), path)
+
+
+def latest_timestamp(traces_dir=TRACES_DIR):
+    names = sorted(f for f in os.listdir(traces_dir) if f.endswith(".npz"))
+    if not names:
+        raise FileNotFoundError(f"No traces in {traces_dir}, run simulation.py --trace first")
+    return names[-1][:-len(".npz")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arena heatmap and per-player movement stats of a traced match.")
+    parser.add_argument('--timestamp', default=None, help="Match to read (default: the latest trace).")
+    parser.add_argument('--players', default=None, help="Heatmap of these players only (comma separated).")
+    parser.add_argument('--cell', type=int, default=HEATMAP_CELL, help="Heatmap cell size in pixels.")
+    parser.add_argument('--wall-margin', type=float, default=WALL_MARGIN,
+                        help="Pixels from the wall that still count as near it.")
+    args = parser.parse_args()
+
+    timestamp = args.timestamp or latest_timestamp()
+    trace = MatchTrace(get_trace_path(timestamp))
+    stats = movement_stats(trace, args.wall_margin)
+    stats_path = os.path.join(TRACES_DIR, f"{timestamp}_movement.csv")
+    stats.to_csv(stats_path, index=False, float_format="%.3f")
+
+    players = args.players.split(",") if args.players else None
+    heatmap_path = os.path.join(TRACES_DIR, f"{timestamp}_heatmap.png")
+    save_heatmap(heatmap(trace, args.cell, players), heatmap_path, trace.width, trace.height)
+
+    print(stats.sort_values('distance', ascending=False).head(10).to_string(index=False))
+    print(f"Movement stats written to {stats_path}, heatmap to {heatmap_path}")